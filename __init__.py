@@ -16,7 +16,6 @@
 
 
 from . import node_io
-import bpy
 bl_info = {
     "name": "blender-Node IO",
     "description": "Import Export of Material Node Trees",
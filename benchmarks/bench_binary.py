@@ -0,0 +1,72 @@
+"""Compare size and parse time of the json and binary node tree formats
+
+Run with plain python, using the bpy stand-in from fake_bpy, or inside blender:
+    python benchmarks/bench_binary.py --nodes 2000 --repeat 5
+    blender -b --python benchmarks/bench_binary.py -- --nodes 2000 --repeat 5
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import fake_bpy
+FAKE_BPY = fake_bpy.install()
+
+from node_io.nodeFile import readDocument, writeNodeTree
+from node_io.nodeTree import NodeTree
+from bench_encoder import makeTree
+
+FORMATS = [
+    ("PRETTY", "NONE"),
+    ("COMPACT", "NONE"),
+    ("COLUMNAR", "NONE"),
+    ("BINARY", "NONE"),
+    ("BINARY", "ZLIB"),
+    ("BINARY", "LZMA"),
+]
+
+
+def timeParse(filepath, repeat):
+    """best times to read the file into a document, and to read it and turn it into a NodeTree"""
+    bestRead = bestParse = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        document = readDocument(filepath)
+        read = time.perf_counter()
+        NodeTree.de_Serialize_Json(document)
+        end = time.perf_counter()
+        bestRead = min(bestRead, read - start)
+        bestParse = min(bestParse, end - start)
+    return bestRead, bestParse
+
+
+def main(argv):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--nodes", type=int, nargs="+", default=[200, 2000, 10000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as directory:
+        for nodeCount in args.nodes:
+            tree = makeTree(nodeCount)
+            print(f"\n{nodeCount} nodes")
+            print(f"{'format':>16} {'size [kB]':>10} {'read [ms]':>10} {'parse [ms]':>11}")
+            for fileFormat, compression in FORMATS:
+                filepath = os.path.join(directory, f"{fileFormat}_{compression}.nodetree")
+                writeNodeTree(filepath, tree, fileFormat, compression)
+                size = os.path.getsize(filepath) / 1024
+                read, parse = timeParse(filepath, args.repeat)
+                print(f"{fileFormat + '/' + compression:>16} {size:>10.1f} {read * 1000:>10.1f} {parse * 1000:>11.1f}")
+
+
+if __name__ == "__main__":
+    # blender passes its own arguments before "--"
+    if "--" in sys.argv:
+        argv = sys.argv[sys.argv.index("--") + 1:]
+    else:
+        argv = sys.argv[1:] if FAKE_BPY else []
+    main(argv)
@@ -0,0 +1,153 @@
+"""Compare the NodeTreeEncoder and the streaming NodeTreeWriter with the export path they replaced
+
+The previous path is rebuilt here, since NodeTree.toJson now runs the encoder itself:
+every node property went through the is_jsonable trial encoding, then json.dump called
+a toJson callback for every tree, node, socket and link. It writes the same file.
+
+Run with plain python, using the bpy stand-in from fake_bpy, or inside blender:
+    python benchmarks/bench_encoder.py --nodes 2000 --repeat 5
+    blender -b --python benchmarks/bench_encoder.py -- --nodes 2000 --repeat 5
+"""
+from array import array
+import argparse
+import io
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import fake_bpy
+FAKE_BPY = fake_bpy.install()
+
+
+from node_io.node import Node
+from node_io.nodeSocket import NodeSocket
+from node_io.nodelink import NodeLink
+from node_io.nodeTree import NodeTree
+from node_io.encoder import NodeTreeEncoder, NodeTreeWriter, VERSION
+
+
+def makeTree(nodeCount):
+    """A material-like tree where every node has a few float, color and vector sockets"""
+    tree = NodeTree()
+    tree.name = "benchmark"
+    for i in range(nodeCount):
+        node = Node()
+        node.name = f"Node.{i:04d}"
+        node.type = "ShaderNodeMix"
+        node.location = (float(i), float(i % 40))
+        node.inputs = [
+            NodeSocket("NodeSocketFloatFactor", "Factor", 0.5),
+            NodeSocket("NodeSocketFloat", "A", 0.0),
+            NodeSocket("NodeSocketColor", "A", [0.5, 0.5, 0.5, 1.0]),
+            NodeSocket("NodeSocketVector", "A", [0.0, 0.0, 0.0]),
+        ]
+        node.outputs = [NodeSocket("NodeSocketColor", "Result", [0.0, 0.0, 0.0, 1.0])]
+        node.data = {
+            "data_type": "RGBA",
+            "blend_type": "MIX",
+            "clamp_factor": True,
+            "width": 140.0,
+            "color": [0.608, 0.608, 0.608],
+            "label": "",
+        }
+        tree.nodes.append(node)
+        if i > 0:
+            link = NodeLink()
+            link.from_node = f"Node.{i - 1:04d}"
+            link.from_socket = "Result"
+            link.to_node = node.name
+            link.to_socket = "A"
+            tree.links.append(link)
+    return tree
+
+
+def is_jsonable(x):
+    """the trial encoding the exporter ran on every node property before NodeSchema"""
+    try:
+        json.dumps(x)
+        return True
+    except (TypeError, OverflowError):
+        return False
+
+
+def previousToJson(o, isGroup=False):
+    """the toJson methods of the model before the encoder, called back by json for every object"""
+    if isinstance(o, NodeTree):
+        result = {} if isGroup else {"file_version": VERSION}
+        result.update({"node_tree": o.name, "nodes": o.nodes, "links": o.links})
+        if not isGroup:
+            result["groups"] = [previousToJson(group, isGroup=True) for group in o.subtrees]
+        return result
+    if isinstance(o, Node):
+        return {"name": o.name, "type": o.type, "location": list(o.location),
+                "inputs": o.inputs, "outputs": o.outputs, "data": o.data}
+    if isinstance(o, NodeSocket):
+        return {"type": o.type, "name": o.name, "value": o.value, "identifier": o.identifier}
+    if isinstance(o, NodeLink):
+        return {"from_node": o.from_node, "from_socket": o.from_socket, "to_node": o.to_node,
+                "to_socket": o.to_socket, "from_socket_index": o.from_socket_index,
+                "to_socket_index": o.to_socket_index}
+    if isinstance(o, array):
+        return o.tolist()
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+
+def previousDump(tree, fp):
+    for node in [node for group in [tree] + tree.subtrees for node in group.nodes]:
+        for value in node.data.values():
+            is_jsonable(value)
+    json.dump(tree, fp, indent=2, default=previousToJson)
+
+
+def encoderDump(tree, fp):
+    NodeTreeEncoder().dump(tree, fp)
+
+
+def writerDump(tree, fp):
+    NodeTreeWriter(fp).write(tree)
+
+
+def timeit(function, tree, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        fp = io.StringIO()
+        start = time.perf_counter()
+        function(tree, fp)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(argv):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--nodes", type=int, nargs="+", default=[200, 2000, 10000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    print(f"{'nodes':>8} {'previous [ms]':>14} {'encoder [ms]':>13} {'speedup':>8} {'writer [ms]':>12} {'speedup':>8}")
+    for nodeCount in args.nodes:
+        tree = makeTree(nodeCount)
+        outputs = []
+        for function in (previousDump, encoderDump, writerDump):
+            fp = io.StringIO()
+            function(tree, fp)
+            outputs.append(fp.getvalue())
+        if outputs[1] != outputs[0] or outputs[2] != outputs[0]:
+            raise RuntimeError("The paths do not write the same file")
+
+        previous = timeit(previousDump, tree, args.repeat)
+        encoder = timeit(encoderDump, tree, args.repeat)
+        writer = timeit(writerDump, tree, args.repeat)
+        print(f"{nodeCount:>8} {previous * 1000:>14.1f} {encoder * 1000:>13.1f} {previous / encoder:>7.2f}x"
+              f" {writer * 1000:>12.1f} {previous / writer:>7.2f}x")
+
+if __name__ == "__main__":
+    # blender passes its own arguments before "--"
+    if "--" in sys.argv:
+        argv = sys.argv[sys.argv.index("--") + 1:]
+    else:
+        argv = sys.argv[1:] if FAKE_BPY else []
+    main(argv)
@@ -0,0 +1,148 @@
+"""Time the whole export and import pipeline on generated materials
+
+Runs under plain python with the bpy stand-in from fake_bpy, or inside blender for real numbers:
+    python benchmarks/bench_pipeline.py --nodes 200 2000 --depth 2 --output results.json
+    blender -b --python benchmarks/bench_pipeline.py -- --nodes 200 2000 --output results.json
+
+Pass --compare with an earlier results file to print how much each phase changed.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import fake_bpy
+FAKE_BPY = fake_bpy.install()
+
+import bpy
+from node_io.encoder import VERSION
+from node_io.nodeFile import readDocument
+from node_io.nodeTree import NodeTree
+from node_io.export_nodes import save_data_to_file
+from node_io.import_nodes import parse_node_file
+from generator import GraphSpec, buildMaterial, countNodes
+
+PHASES = ["serialize", "save", "read", "deserialize", "parse", "createMaterial"]
+
+
+def measure(function, repeat):
+    """best and mean time of a function over some runs, and the result of the last run"""
+    times = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        times.append(time.perf_counter() - start)
+    return {"best": min(times), "mean": sum(times) / len(times)}, result
+
+
+def runCase(spec: GraphSpec, fileFormat, compression, repeat, directory, sparse=False) -> dict:
+    if FAKE_BPY:
+        fake_bpy.reset()
+    material = buildMaterial(spec)
+    filepath = os.path.join(directory, f"{material.name}.nodetree")
+    phases = {}
+
+    phases["serialize"], tree = measure(
+        lambda: NodeTree.serialize_bpy_NodeTree(material.node_tree, material.name, sparse=sparse), repeat)
+    phases["save"], _ = measure(
+        lambda: save_data_to_file(filepath, tree, fileFormat, compression), repeat)
+    phases["read"], document = measure(lambda: readDocument(filepath), repeat)
+    phases["deserialize"], _ = measure(lambda: NodeTree.de_Serialize_Json(document), repeat)
+    phases["parse"], parsed = measure(lambda: parse_node_file(filepath), repeat)
+    phases["createMaterial"], _ = measure(lambda: parsed.createMaterial(), repeat)
+
+    return {
+        "spec": spec.toJson(),
+        "format": fileFormat,
+        "compression": compression,
+        "sparse": sparse,
+        "totalNodes": countNodes(material),
+        "groups": len(tree.subtrees),
+        "fileSize": os.path.getsize(filepath),
+        "phases": phases,
+    }
+
+
+def printCase(case, baseline=None):
+    spec = case["spec"]
+    print(f"\n{spec['nodes']} nodes, depth {spec['depth']}, {spec['groups']} groups x{spec['reuse']}, "
+          f"links {spec['linkDensity']}: {case['totalNodes']} nodes total, "
+          f"{case['fileSize'] / 1024:.1f} kB {case['format']}/{case['compression']}"
+          f"{' sparse' if case.get('sparse') else ''}")
+    for phase in PHASES:
+        best = case["phases"][phase]["best"]
+        line = f"{phase:>16} {best * 1000:>10.2f} ms"
+        if baseline is not None:
+            before = baseline["phases"][phase]["best"]
+            line += f" {(best - before) / before * 100:>+8.1f}%"
+        print(line)
+
+
+def findBaseline(baselineCases, case):
+    for baselineCase in baselineCases:
+        if (baselineCase["spec"] == case["spec"] and baselineCase["format"] == case["format"]
+                and baselineCase["compression"] == case["compression"]
+                and baselineCase.get("sparse", False) == case["sparse"]):
+            return baselineCase
+    return None
+
+
+def main(argv):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--nodes", type=int, nargs="+", default=[200, 2000])
+    parser.add_argument("--link-density", type=float, default=0.5)
+    parser.add_argument("--depth", type=int, default=2)
+    parser.add_argument("--groups", type=int, default=2)
+    parser.add_argument("--group-nodes", type=int, default=20)
+    parser.add_argument("--reuse", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--format", default="PRETTY")
+    parser.add_argument("--compression", default="NONE")
+    parser.add_argument("--sparse", action="store_true", help="leave out values at their defaults")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="write the results to this json file")
+    parser.add_argument("--compare", help="results json of an earlier run to compare with")
+    args = parser.parse_args(argv)
+
+    baselineCases = []
+    if args.compare:
+        with open(args.compare, "r", encoding="utf8") as f:
+            baselineCases = json.load(f)["cases"]
+
+    cases = []
+    with tempfile.TemporaryDirectory() as directory:
+        for nodeCount in args.nodes:
+            spec = GraphSpec(nodeCount, args.link_density, args.depth, args.groups,
+                             args.group_nodes, args.reuse, args.seed)
+            case = runCase(spec, args.format, args.compression, args.repeat, directory, args.sparse)
+            printCase(case, findBaseline(baselineCases, case))
+            cases.append(case)
+
+    if args.output:
+        results = {
+            "fileVersion": VERSION,
+            "blender": list(bpy.app.version),
+            "fakeBpy": FAKE_BPY,
+            "python": platform.python_version(),
+            "date": datetime.datetime.now().isoformat(timespec="seconds"),
+            "cases": cases,
+        }
+        with open(args.output, "w", encoding="utf8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    # blender passes its own arguments before "--"
+    if "--" in sys.argv:
+        argv = sys.argv[sys.argv.index("--") + 1:]
+    else:
+        argv = sys.argv[1:] if FAKE_BPY else []
+    main(argv)
@@ -0,0 +1,783 @@
+"""Lightweight in-memory stand-in for the parts of bpy and mathutils used by node_io
+
+Only meant to run the benchmarks under plain python, for example on CI.
+Call install() before importing node_io, inside blender it does nothing.
+"""
+import os
+import sys
+import types
+
+BLENDER_VERSION = (3, 3, 0)
+
+
+# --------------------------------------------------------------------------
+# mathutils
+# --------------------------------------------------------------------------
+class Vector:
+    __slots__ = ("_values",)
+
+    def __init__(self, values=(0.0, 0.0, 0.0)):
+        self._values = [float(v) for v in values]
+
+    def __len__(self):
+        return len(self._values)
+
+    def __iter__(self):
+        return iter(self._values)
+
+    def __getitem__(self, index):
+        return self._values[index]
+
+    def __setitem__(self, index, value):
+        self._values[index] = value
+
+    def __eq__(self, other):
+        try:
+            return list(self) == list(other)
+        except TypeError:
+            return False
+
+    def __repr__(self):
+        return f"Vector({tuple(self._values)})"
+
+
+class Color(Vector):
+    def __repr__(self):
+        return f"Color({tuple(self._values)})"
+
+
+class Euler(Vector):
+    pass
+
+
+# --------------------------------------------------------------------------
+# RNA metadata
+# --------------------------------------------------------------------------
+class FakeProperty:
+    def __init__(self, identifier, type, default=None, array_length=0,
+                 is_readonly=False, is_enum_flag=False, subtype="NONE"):
+        self.identifier = identifier
+        self.type = type
+        self.array_length = array_length
+        self.is_readonly = is_readonly
+        self.is_enum_flag = is_enum_flag
+        self.subtype = subtype
+        if array_length:
+            self.default_array = list(default) if default is not None else [0.0] * array_length
+            self.default = self.default_array[0]
+        else:
+            self.default = default
+
+
+class FakePropertyCollection(list):
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            for prop in self:
+                if prop.identifier == key:
+                    return prop
+            raise KeyError(key)
+        return list.__getitem__(self, key)
+
+    def get(self, key, default=None):
+        for prop in self:
+            if prop.identifier == key:
+                return prop
+        return default
+
+
+class FakeStruct:
+    def __init__(self, identifier, properties):
+        self.identifier = identifier
+        self.properties = FakePropertyCollection(properties)
+
+
+# --------------------------------------------------------------------------
+# Collections
+# --------------------------------------------------------------------------
+class FakeCollection:
+    """Ordered, name-addressable collection mimicking bpy_prop_collection"""
+
+    def __init__(self):
+        self._items = []
+
+    def __len__(self):
+        return len(self._items)
+
+    def __iter__(self):
+        return iter(list(self._items))
+
+    def __contains__(self, key):
+        return self.find(key) != -1
+
+    def __getitem__(self, key):
+        if isinstance(key, int):
+            return self._items[key]
+        index = self.find(key)
+        if index == -1:
+            raise KeyError(f"bpy_prop_collection[key]: key \"{key}\" not found")
+        return self._items[index]
+
+    def find(self, key):
+        for i, item in enumerate(self._items):
+            if item.name == key:
+                return i
+        return -1
+
+    def get(self, key, default=None):
+        index = self.find(key)
+        return default if index == -1 else self._items[index]
+
+    def keys(self):
+        return [item.name for item in self._items]
+
+    def values(self):
+        return list(self._items)
+
+    def items(self):
+        return [(item.name, item) for item in self._items]
+
+    def clear(self):
+        self._items.clear()
+
+    def _uniqueName(self, name):
+        names = {item.name for item in self._items}
+        if name not in names:
+            return name
+        i = 1
+        while f"{name}.{i:03d}" in names:
+            i += 1
+        return f"{name}.{i:03d}"
+
+
+class FakeNamedCollection(FakeCollection):
+    """Collection of uniquely named items, indexed by name so large node trees stay fast
+
+    Items rename themselves through _rename, which keeps the names unique like blender does.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._byName = {}
+        # next suffix to try for a base name
+        self._suffixes = {}
+
+    def __getitem__(self, key):
+        if isinstance(key, int):
+            return self._items[key]
+        try:
+            return self._byName[key]
+        except KeyError:
+            raise KeyError(f"bpy_prop_collection[key]: key \"{key}\" not found") from None
+
+    def __contains__(self, key):
+        return key in self._byName
+
+    def find(self, key):
+        item = self._byName.get(key)
+        return -1 if item is None else self._items.index(item)
+
+    def get(self, key, default=None):
+        return self._byName.get(key, default)
+
+    def clear(self):
+        super().clear()
+        self._byName.clear()
+        self._suffixes.clear()
+
+    def _append(self, item):
+        self._items.append(item)
+        self._byName[item.name] = item
+        return item
+
+    def _remove(self, item):
+        self._items.remove(item)
+        if self._byName.get(item.name) is item:
+            del self._byName[item.name]
+
+    def _rename(self, item, name):
+        """register the new name of an item, returns the name it actually gets"""
+        if self._byName.get(name) is item:
+            return name
+        name = self._uniqueName(name)
+        if self._byName.get(item.name) is item:
+            del self._byName[item.name]
+        self._byName[name] = item
+        return name
+
+    def _uniqueName(self, name):
+        if name not in self._byName:
+            return name
+        i = self._suffixes.get(name, 1)
+        while f"{name}.{i:03d}" in self._byName:
+            i += 1
+        self._suffixes[name] = i + 1
+        return f"{name}.{i:03d}"
+
+
+# --------------------------------------------------------------------------
+# Sockets
+# --------------------------------------------------------------------------
+SOCKET_TYPES = {
+    "NodeSocketFloat": ("VALUE", 0.0),
+    "NodeSocketFloatFactor": ("VALUE", 0.5),
+    "NodeSocketInt": ("INT", 0),
+    "NodeSocketBool": ("BOOLEAN", False),
+    "NodeSocketVector": ("VECTOR", (0.0, 0.0, 0.0)),
+    "NodeSocketColor": ("RGBA", (0.8, 0.8, 0.8, 1.0)),
+    "NodeSocketShader": ("SHADER", None),
+    "NodeSocketString": ("STRING", ""),
+    "NodeSocketVirtual": ("CUSTOM", None),
+}
+
+
+class FakeSocket:
+    def __init__(self, bl_idname, name, identifier=None, default=None, is_output=False):
+        self.bl_idname = bl_idname
+        self.name = name
+        self.identifier = identifier or name
+        self.is_output = is_output
+        self.type, typeDefault = SOCKET_TYPES[bl_idname]
+        value = typeDefault if default is None else default
+        if isinstance(value, tuple):
+            value = Color(value) if self.type == "RGBA" else Vector(value)
+        if value is not None:
+            self.default_value = value
+
+    def as_pointer(self):
+        return id(self)
+
+    def __setattr__(self, key, value):
+        if key == "default_value" and isinstance(value, (list, tuple)):
+            value = Color(value) if self.type == "RGBA" else Vector(value)
+        object.__setattr__(self, key, value)
+
+
+class FakeSocketCollection(FakeCollection):
+    def __init__(self, node, is_output):
+        super().__init__()
+        self._node = node
+        self._is_output = is_output
+
+    def new(self, type, name, identifier=""):
+        socket = FakeSocket(type, name, identifier or self._uniqueIdentifier(name), is_output=self._is_output)
+        socket.node = self._node
+        virtual = self._items and self._items[-1].bl_idname == "NodeSocketVirtual"
+        if virtual:
+            self._items.insert(len(self._items) - 1, socket)
+        else:
+            self._items.append(socket)
+        return socket
+
+    def _uniqueIdentifier(self, name):
+        identifiers = {s.identifier for s in self._items}
+        if name not in identifiers:
+            return name
+        i = 1
+        while f"{name}_{i:03d}" in identifiers:
+            i += 1
+        return f"{name}_{i:03d}"
+
+    def _add(self, socket):
+        socket.node = self._node
+        self._items.append(socket)
+        return socket
+
+
+class FakeInterfaceCollection(FakeSocketCollection):
+    """Inputs or outputs of a node group, new sockets also appear on its existing group input or output nodes"""
+
+    def new(self, type, name, identifier=""):
+        socket = super().new(type, name, identifier)
+        socket.bl_socket_idname = type
+        ioType = "NodeGroupOutput" if self._is_output else "NodeGroupInput"
+        for node in self._node.nodes:
+            if node.bl_idname == ioType:
+                sockets = node.inputs if self._is_output else node.outputs
+                sockets.new(type, name, socket.identifier)
+        return socket
+
+
+# --------------------------------------------------------------------------
+# Nodes
+# --------------------------------------------------------------------------
+def _commonProperties():
+    return [
+        FakeProperty("rna_type", "POINTER", is_readonly=True),
+        FakeProperty("type", "ENUM", "CUSTOM", is_readonly=True),
+        FakeProperty("location", "FLOAT", (0.0, 0.0), array_length=2),
+        FakeProperty("width", "FLOAT", 140.0),
+        FakeProperty("width_hidden", "FLOAT", 42.0),
+        FakeProperty("height", "FLOAT", 100.0),
+        FakeProperty("dimensions", "FLOAT", (0.0, 0.0), array_length=2, is_readonly=True),
+        FakeProperty("name", "STRING", ""),
+        FakeProperty("label", "STRING", ""),
+        FakeProperty("inputs", "COLLECTION", is_readonly=True),
+        FakeProperty("outputs", "COLLECTION", is_readonly=True),
+        FakeProperty("internal_links", "COLLECTION", is_readonly=True),
+        FakeProperty("parent", "POINTER"),
+        FakeProperty("use_custom_color", "BOOLEAN", False),
+        FakeProperty("color", "FLOAT", (0.608, 0.608, 0.608), array_length=3, subtype="COLOR"),
+        FakeProperty("select", "BOOLEAN", True),
+        FakeProperty("show_options", "BOOLEAN", True),
+        FakeProperty("show_preview", "BOOLEAN", False),
+        FakeProperty("hide", "BOOLEAN", False),
+        FakeProperty("mute", "BOOLEAN", False),
+        FakeProperty("show_texture", "BOOLEAN", False),
+        FakeProperty("bl_idname", "STRING", ""),
+        FakeProperty("bl_label", "STRING", ""),
+        FakeProperty("bl_description", "STRING", ""),
+        FakeProperty("bl_icon", "ENUM", "NODE"),
+        FakeProperty("bl_static_type", "ENUM", "CUSTOM", is_readonly=True),
+        FakeProperty("bl_width_default", "FLOAT", 140.0, is_readonly=True),
+    ]
+
+
+# bl_idname: (static type, extra RNA properties, inputs, outputs)
+# sockets are (bl_idname, name, identifier, default)
+NODE_TYPES = {
+    "ShaderNodeBsdfPrincipled": (
+        "BSDF_PRINCIPLED",
+        [FakeProperty("distribution", "ENUM", "GGX"),
+         FakeProperty("subsurface_method", "ENUM", "RANDOM_WALK")],
+        [("NodeSocketColor", "Base Color", "Base Color", (0.8, 0.8, 0.8, 1.0)),
+         ("NodeSocketFloatFactor", "Metallic", "Metallic", 0.0),
+         ("NodeSocketFloatFactor", "Roughness", "Roughness", 0.5),
+         ("NodeSocketFloat", "IOR", "IOR", 1.45),
+         ("NodeSocketFloatFactor", "Alpha", "Alpha", 1.0),
+         ("NodeSocketVector", "Normal", "Normal", (0.0, 0.0, 0.0))],
+        [("NodeSocketShader", "BSDF", "BSDF", None)],
+    ),
+    "ShaderNodeMix": (
+        "MIX",
+        [FakeProperty("data_type", "ENUM", "FLOAT"),
+         FakeProperty("blend_type", "ENUM", "MIX"),
+         FakeProperty("clamp_factor", "BOOLEAN", True),
+         FakeProperty("clamp_result", "BOOLEAN", False)],
+        [("NodeSocketFloatFactor", "Factor", "Factor_Float", 0.5),
+         ("NodeSocketFloat", "A", "A_Float", 0.0),
+         ("NodeSocketFloat", "B", "B_Float", 0.0),
+         ("NodeSocketVector", "A", "A_Vector", (0.0, 0.0, 0.0)),
+         ("NodeSocketVector", "B", "B_Vector", (0.0, 0.0, 0.0)),
+         ("NodeSocketColor", "A", "A_Color", (0.5, 0.5, 0.5, 1.0)),
+         ("NodeSocketColor", "B", "B_Color", (0.5, 0.5, 0.5, 1.0))],
+        [("NodeSocketFloat", "Result", "Result_Float", 0.0),
+         ("NodeSocketVector", "Result", "Result_Vector", (0.0, 0.0, 0.0)),
+         ("NodeSocketColor", "Result", "Result_Color", (0.0, 0.0, 0.0, 1.0))],
+    ),
+    "ShaderNodeMath": (
+        "MATH",
+        [FakeProperty("operation", "ENUM", "ADD"),
+         FakeProperty("use_clamp", "BOOLEAN", False)],
+        [("NodeSocketFloat", "Value", "Value", 0.5),
+         ("NodeSocketFloat", "Value", "Value_001", 0.5),
+         ("NodeSocketFloat", "Value", "Value_002", 0.5)],
+        [("NodeSocketFloat", "Value", "Value", 0.0)],
+    ),
+    "ShaderNodeTexImage": (
+        "TEX_IMAGE",
+        [FakeProperty("image", "POINTER"),
+         FakeProperty("interpolation", "ENUM", "Linear"),
+         FakeProperty("projection", "ENUM", "FLAT"),
+         FakeProperty("extension", "ENUM", "REPEAT")],
+        [("NodeSocketVector", "Vector", "Vector", (0.0, 0.0, 0.0))],
+        [("NodeSocketColor", "Color", "Color", (0.0, 0.0, 0.0, 1.0)),
+         ("NodeSocketFloat", "Alpha", "Alpha", 0.0)],
+    ),
+    "ShaderNodeOutputMaterial": (
+        "OUTPUT_MATERIAL",
+        [FakeProperty("target", "ENUM", "ALL"),
+         FakeProperty("is_active_output", "BOOLEAN", True)],
+        [("NodeSocketShader", "Surface", "Surface", None),
+         ("NodeSocketShader", "Volume", "Volume", None),
+         ("NodeSocketVector", "Displacement", "Displacement", (0.0, 0.0, 0.0)),
+         ("NodeSocketFloat", "Thickness", "Thickness", 0.0)],
+        [],
+    ),
+    "ShaderNodeGroup": (
+        "GROUP",
+        [FakeProperty("node_tree", "POINTER")],
+        [],
+        [],
+    ),
+    "NodeGroupInput": ("GROUP_INPUT", [], [], [("NodeSocketVirtual", "", "__extend__", None)]),
+    "NodeGroupOutput": (
+        "GROUP_OUTPUT",
+        [FakeProperty("is_active_output", "BOOLEAN", True)],
+        [("NodeSocketVirtual", "", "__extend__", None)],
+        [],
+    ),
+}
+
+_structs = {}
+
+
+def _struct(bl_idname):
+    if bl_idname not in _structs:
+        _structs[bl_idname] = FakeStruct(bl_idname, _commonProperties() + NODE_TYPES[bl_idname][1])
+    return _structs[bl_idname]
+
+
+class FakeNode:
+    def __init__(self, bl_idname, id_data):
+        if bl_idname not in NODE_TYPES:
+            raise RuntimeError(f"Node type {bl_idname} undefined")
+        staticType, properties, inputs, outputs = NODE_TYPES[bl_idname]
+        object.__setattr__(self, "id_data", id_data)
+        object.__setattr__(self, "bl_rna", _struct(bl_idname))
+        object.__setattr__(self, "inputs", FakeSocketCollection(self, False))
+        object.__setattr__(self, "outputs", FakeSocketCollection(self, True))
+        object.__setattr__(self, "node_tree", None)
+        for prop in self.bl_rna.properties:
+            if prop.type == "COLLECTION":
+                if prop.identifier not in ("inputs", "outputs"):
+                    object.__setattr__(self, prop.identifier, [])
+                continue
+            if prop.type == "POINTER":
+                object.__setattr__(self, prop.identifier, None)
+                continue
+            value = prop.default
+            if prop.array_length:
+                value = Color(prop.default_array) if prop.subtype == "COLOR" else Vector(prop.default_array)
+            object.__setattr__(self, prop.identifier, value)
+        object.__setattr__(self, "bl_idname", bl_idname)
+        object.__setattr__(self, "type", staticType)
+        object.__setattr__(self, "bl_static_type", staticType)
+        object.__setattr__(self, "rna_type", self.bl_rna)
+        object.__setattr__(self, "image", None)
+        object.__setattr__(self, "parent", None)
+        for socket in inputs:
+            self.inputs._add(FakeSocket(socket[0], socket[1], socket[2], socket[3]))
+        for socket in outputs:
+            self.outputs._add(FakeSocket(socket[0], socket[1], socket[2], socket[3], True))
+
+    def __setattr__(self, key, value):
+        prop = self.bl_rna.properties.get(key)
+        if prop is not None and prop.is_readonly:
+            raise AttributeError(f"bpy_struct: attribute \"{key}\" from \"{self.bl_idname}\" is read-only")
+        if key == "name":
+            value = self.id_data.nodes._rename(self, value)
+        elif key == "location":
+            value = Vector(value)
+        elif key == "node_tree" and value is not None:
+            self._syncGroupSockets(value)
+        object.__setattr__(self, key, value)
+
+    def _syncGroupSockets(self, tree):
+        self.inputs.clear()
+        self.outputs.clear()
+        for socket in tree.inputs:
+            self.inputs._add(FakeSocket(socket.bl_idname, socket.name, socket.identifier))
+        for socket in tree.outputs:
+            self.outputs._add(FakeSocket(socket.bl_idname, socket.name, socket.identifier, is_output=True))
+
+    def __dir__(self):
+        names = set(object.__dir__(self))
+        names.update(prop.identifier for prop in self.bl_rna.properties)
+        return sorted(names)
+
+
+class FakeNodes(FakeNamedCollection):
+    def __init__(self, tree):
+        super().__init__()
+        self._tree = tree
+
+    def new(self, type):
+        node = FakeNode(type, self._tree)
+        staticName = type.replace("ShaderNode", "")
+        object.__setattr__(node, "name", self._uniqueName(staticName))
+        return self._append(node)
+
+    def remove(self, node):
+        self._remove(node)
+        self._tree.links._removeNode(node)
+
+    def clear(self):
+        super().clear()
+        self._tree.links.clear()
+
+
+class FakeLink:
+    def __init__(self, from_socket, to_socket, from_node, to_node):
+        self.from_socket = from_socket
+        self.to_socket = to_socket
+        self.from_node = from_node
+        self.to_node = to_node
+        self.is_valid = True
+
+
+class FakeLinks(FakeCollection):
+    def __init__(self, tree):
+        super().__init__()
+        self._tree = tree
+        # links by the id of their input socket
+        self._byTarget = {}
+
+    def new(self, from_socket, to_socket):
+        fromNode = getattr(from_socket, "node", None)
+        toNode = getattr(to_socket, "node", None)
+        if fromNode is None or toNode is None or fromNode.id_data is not self._tree or toNode.id_data is not self._tree:
+            raise RuntimeError("sockets not found in node tree")
+        if not from_socket.is_output or to_socket.is_output:
+            raise RuntimeError("links go from an output to an input socket")
+        # an input socket only takes one link
+        existing = self._byTarget.get(id(to_socket))
+        if existing is not None:
+            self._items.remove(existing)
+        link = FakeLink(from_socket, to_socket, fromNode, toNode)
+        self._items.append(link)
+        self._byTarget[id(to_socket)] = link
+        return link
+
+    def remove(self, link):
+        self._items.remove(link)
+        del self._byTarget[id(link.to_socket)]
+
+    def clear(self):
+        super().clear()
+        self._byTarget.clear()
+
+    def _removeNode(self, node):
+        self._items = [l for l in self._items if l.from_node is not node and l.to_node is not node]
+        self._byTarget = {id(l.to_socket): l for l in self._items}
+
+
+# --------------------------------------------------------------------------
+# ID datablocks
+# --------------------------------------------------------------------------
+class FakeID:
+    def __init__(self, name):
+        self._collection = None
+        self.name = name
+        self.users = 0
+        self.use_fake_user = False
+        self.library = None
+
+    def __setattr__(self, key, value):
+        if key == "name" and self._collection is not None:
+            value = self._collection._rename(self, value)
+        object.__setattr__(self, key, value)
+
+    def user_remap(self, new):
+        for obj in data.objects:
+            for slot in obj.material_slots:
+                if slot.material is self:
+                    slot.material = new
+        for collection in (data.materials, data.node_groups):
+            for owner in collection:
+                tree = owner.node_tree if isinstance(owner, FakeMaterial) else owner
+                if tree is None:
+                    continue
+                for node in tree.nodes:
+                    if node.node_tree is self:
+                        object.__setattr__(node, "node_tree", new)
+
+
+class FakeNodeTree(FakeID):
+    def __init__(self, name, bl_idname="ShaderNodeTree"):
+        super().__init__(name)
+        self.bl_idname = bl_idname
+        self.nodes = FakeNodes(self)
+        self.links = FakeLinks(self)
+        self.inputs = FakeInterfaceCollection(self, False)
+        self.outputs = FakeInterfaceCollection(self, True)
+
+
+class FakeMaterial(FakeID):
+    def __init__(self, name):
+        super().__init__(name)
+        self.node_tree = None
+        self.is_grease_pencil = False
+        self._use_nodes = False
+
+    @property
+    def use_nodes(self):
+        return self._use_nodes
+
+    @use_nodes.setter
+    def use_nodes(self, value):
+        self._use_nodes = value
+        if value and self.node_tree is None:
+            self.node_tree = FakeNodeTree("Shader Nodetree")
+            self.node_tree.nodes.new("ShaderNodeBsdfPrincipled")
+            self.node_tree.nodes.new("ShaderNodeOutputMaterial")
+
+
+class FakePackedFile:
+    def __init__(self, data):
+        self.data = data
+        self.size = len(data)
+
+
+class FakeImage(FakeID):
+    def __init__(self, name, filepath=""):
+        super().__init__(name)
+        self.filepath = filepath
+        self.filepath_raw = filepath
+        self.source = "FILE"
+        self.is_dirty = False
+        self.packed_file = None
+        self.file_format = "PNG"
+
+    def save_render(self, filepath, scene=None):
+        fileFormat = scene.render.image_settings.file_format if scene is not None else "PNG"
+        with open(filepath, "wb") as f:
+            f.write(f"{self.name}:{fileFormat}".encode("utf8"))
+
+    def pack(self):
+        with open(self.filepath, "rb") as f:
+            self.packed_file = FakePackedFile(f.read())
+
+
+class FakeIDCollection(FakeNamedCollection):
+    def __init__(self, factory):
+        super().__init__()
+        self._factory = factory
+
+    def new(self, name, *args):
+        item = self._factory(self._uniqueName(name), *args)
+        item._collection = self
+        return self._append(item)
+
+    def remove(self, item, do_unlink=True):
+        self._remove(item)
+        item._collection = None
+
+
+class FakeImages(FakeIDCollection):
+    def __init__(self):
+        super().__init__(FakeImage)
+        self.load_calls = 0
+
+    def load(self, filepath, check_existing=False):
+        self.load_calls += 1
+        if check_existing:
+            for image in self._items:
+                if image.filepath == filepath:
+                    return image
+        if not os.path.isfile(filepath):
+            raise RuntimeError(f"Error: Cannot read image file \"{filepath}\"")
+        image = FakeImage(self._uniqueName(os.path.basename(filepath)), filepath)
+        image._collection = self
+        return self._append(image)
+
+
+class FakeMaterialSlot:
+    def __init__(self, material):
+        self.material = material
+
+
+class FakeObject(FakeID):
+    def __init__(self, name):
+        super().__init__(name)
+        self.material_slots = []
+        self.active_material_index = 0
+        self.select = False
+
+    @property
+    def active_material(self):
+        if not self.material_slots:
+            return None
+        return self.material_slots[self.active_material_index].material
+
+    def select_get(self):
+        return self.select
+
+
+class FakeData:
+    def __init__(self):
+        self.materials = FakeIDCollection(FakeMaterial)
+        self.node_groups = FakeIDCollection(FakeNodeTree)
+        self.images = FakeImages()
+        self.objects = FakeIDCollection(FakeObject)
+        self.filepath = ""
+
+
+data = FakeData()
+
+
+def reset():
+    """Drop every datablock, like opening an empty .blend file"""
+    global data
+    data = FakeData()
+    sys.modules["bpy"].data = data
+
+
+# --------------------------------------------------------------------------
+# module assembly
+# --------------------------------------------------------------------------
+class _Registrable:
+    bl_idname = ""
+
+    def report(self, type, message):
+        print(f"[{'/'.join(sorted(type))}] {message}")
+
+
+def _prop(**kwargs):
+    return ("_PropertyDeferred", kwargs)
+
+
+def _makeBpy():
+    bpy = types.ModuleType("bpy")
+    bpy.__fake__ = True
+    bpy.data = data
+
+    bpy.types = types.ModuleType("bpy.types")
+    for name in ("Operator", "Panel", "PropertyGroup", "UIList", "Menu"):
+        setattr(bpy.types, name, type(name, (_Registrable,), {}))
+    for name in ("ShaderNode", "Node", "NodeTree", "NodeLink", "NodeGroup", "Material",
+                 "Object", "Image", "Scene", "OperatorFileListElement", "ID", "Context"):
+        setattr(bpy.types, name, type(name, (), {}))
+    bpy.types.ShaderNode = FakeNode
+    bpy.types.NodeTree = FakeNodeTree
+    bpy.types.Material = FakeMaterial
+    bpy.types.Image = FakeImage
+
+    bpy.props = types.ModuleType("bpy.props")
+    for name in ("BoolProperty", "CollectionProperty", "EnumProperty", "FloatProperty",
+                 "IntProperty", "PointerProperty", "StringProperty", "FloatVectorProperty",
+                 "IntVectorProperty", "BoolVectorProperty"):
+        setattr(bpy.props, name, _prop)
+
+    bpy.path = types.ModuleType("bpy.path")
+    bpy.path.abspath = lambda path, **kwargs: os.path.abspath(path[2:] if path.startswith("//") else path)
+    bpy.path.basename = os.path.basename
+    bpy.path.clean_name = lambda name, replace="_": "".join(c if c.isalnum() or c in "-._" else replace for c in name)
+
+    bpy.app = types.SimpleNamespace(version=BLENDER_VERSION, tempdir="/tmp/", background=True)
+    bpy.utils = types.SimpleNamespace(register_class=lambda cls: None, unregister_class=lambda cls: None)
+    scene = types.SimpleNamespace(render=types.SimpleNamespace(image_settings=types.SimpleNamespace(file_format="PNG")))
+    bpy.context = types.SimpleNamespace(window_manager=None, object=None, scene=scene)
+    bpy.ops = types.SimpleNamespace()
+
+    bpy_extras = types.ModuleType("bpy_extras")
+    bpy_extras.io_utils = types.ModuleType("bpy_extras.io_utils")
+    bpy_extras.io_utils.ImportHelper = type("ImportHelper", (), {"filepath": ""})
+    bpy_extras.io_utils.ExportHelper = type("ExportHelper", (), {"filepath": ""})
+
+    mathutils = types.ModuleType("mathutils")
+    mathutils.Vector = Vector
+    mathutils.Color = Color
+    mathutils.Euler = Euler
+    return bpy, bpy_extras, mathutils
+
+
+def install():
+    """Register the stand-in modules unless the real ``bpy`` is importable
+
+    Returns:
+        bool: True when the stand-in is active
+    """
+    try:
+        import bpy
+        return getattr(bpy, "__fake__", False)
+    except ImportError:
+        pass
+    bpy, bpy_extras, mathutils = _makeBpy()
+    sys.modules["bpy"] = bpy
+    sys.modules["bpy.types"] = bpy.types
+    sys.modules["bpy.props"] = bpy.props
+    sys.modules["bpy.path"] = bpy.path
+    sys.modules["bpy_extras"] = bpy_extras
+    sys.modules["bpy_extras.io_utils"] = bpy_extras.io_utils
+    sys.modules["mathutils"] = mathutils
+    return True
@@ -0,0 +1,137 @@
+"""Synthetic shader graphs for the benchmarks
+
+The graphs are built through the bpy api, so they work with the real bpy inside blender
+and with the stand-in from fake_bpy under plain python.
+"""
+from dataclasses import dataclass, asdict
+import random
+import bpy
+
+# node types the regular nodes cycle through
+NODE_TYPES = ["ShaderNodeMath", "ShaderNodeMix"]
+MATH_OPERATIONS = ["ADD", "MULTIPLY", "SUBTRACT", "POWER"]
+MIX_DATA_TYPES = ["FLOAT", "VECTOR", "RGBA"]
+
+
+@dataclass
+class GraphSpec:
+    """Shape of a generated material"""
+    # regular nodes in the material, not counting node group instances
+    nodes: int = 200
+    # chance for each input socket to be linked to an earlier node
+    linkDensity: float = 0.5
+    # levels of nested node groups, 0 for none
+    depth: int = 2
+    # distinct node groups on each level
+    groups: int = 2
+    # regular nodes inside each node group
+    groupNodes: int = 20
+    # instances of each group in every tree that uses the level below it
+    reuse: int = 2
+    seed: int = 0
+
+    def toJson(self):
+        return asdict(self)
+
+
+def isVirtual(socket) -> bool:
+    return socket.bl_idname == "NodeSocketVirtual"
+
+
+def randomizeNode(node, rng: random.Random):
+    """give a node some non default values, so the files are not all defaults"""
+    if node.bl_idname == "ShaderNodeMath":
+        node.operation = rng.choice(MATH_OPERATIONS)
+    elif node.bl_idname == "ShaderNodeMix":
+        node.data_type = rng.choice(MIX_DATA_TYPES)
+    for socket in node.inputs:
+        if socket.type == "VALUE" and rng.random() < 0.5:
+            socket.default_value = round(rng.random(), 3)
+
+
+def linkNodes(node_tree, nodes: list, linkDensity: float, rng: random.Random):
+    """link inputs to outputs of earlier nodes, so the graph has no cycles"""
+    for index, node in enumerate(nodes):
+        if index == 0:
+            continue
+        for socket in node.inputs:
+            if isVirtual(socket) or rng.random() >= linkDensity:
+                continue
+            source = nodes[rng.randrange(index)]
+            outputs = [output for output in source.outputs if not isVirtual(output)]
+            if len(outputs) > 0:
+                node_tree.links.new(rng.choice(outputs), socket)
+
+
+def fillTree(node_tree, nodeCount: int, childGroups: list, spec: GraphSpec, rng: random.Random) -> list:
+    """add regular nodes and group instances to a tree and link them
+
+    Returns:
+        list: the added nodes, in link order
+    """
+    nodes = []
+    for groupTree in childGroups:
+        for _ in range(spec.reuse):
+            groupNode = node_tree.nodes.new("ShaderNodeGroup")
+            groupNode.node_tree = groupTree
+            nodes.append(groupNode)
+
+    for i in range(nodeCount):
+        node = node_tree.nodes.new(NODE_TYPES[i % len(NODE_TYPES)])
+        randomizeNode(node, rng)
+        nodes.append(node)
+
+    for i, node in enumerate(nodes):
+        node.location = (200.0 * (i // 20), -150.0 * (i % 20))
+    return nodes
+
+
+def buildGroup(name: str, childGroups: list, spec: GraphSpec, rng: random.Random):
+    """a node group with one float input and output around generated nodes"""
+    node_tree = bpy.data.node_groups.new(name, "ShaderNodeTree")
+    groupInput = node_tree.nodes.new("NodeGroupInput")
+    groupOutput = node_tree.nodes.new("NodeGroupOutput")
+    node_tree.inputs.new("NodeSocketFloat", "In")
+    node_tree.outputs.new("NodeSocketFloat", "Out")
+    nodes = fillTree(node_tree, spec.groupNodes, childGroups, spec, rng)
+    linkNodes(node_tree, [groupInput] + nodes + [groupOutput], spec.linkDensity, rng)
+    return node_tree
+
+
+def buildMaterial(spec: GraphSpec, name="Benchmark"):
+    """Generate a material and its nested node groups
+
+    Returns:
+        bpy.types.Material: the material
+    """
+    rng = random.Random(spec.seed)
+
+    # build the innermost level first, every level uses all groups of the level below
+    childGroups = []
+    for level in range(spec.depth):
+        childGroups = [
+            buildGroup(f"{name}.L{level}.G{index}", childGroups, spec, rng)
+            for index in range(spec.groups)
+        ]
+
+    material = bpy.data.materials.new(name)
+    material.use_nodes = True
+    node_tree = material.node_tree
+    nodes = list(node_tree.nodes) + fillTree(node_tree, spec.nodes, childGroups, spec, rng)
+    linkNodes(node_tree, nodes, spec.linkDensity, rng)
+    return material
+
+
+def countNodes(material) -> int:
+    """number of nodes in the material and in each distinct node group it uses"""
+    count = 0
+    visited = set()
+    toCheck = [material.node_tree]
+    while len(toCheck) > 0:
+        node_tree = toCheck.pop()
+        count += len(node_tree.nodes)
+        for node in node_tree.nodes:
+            if node.bl_idname == "ShaderNodeGroup" and node.node_tree.name not in visited:
+                visited.add(node.node_tree.name)
+                toCheck.append(node.node_tree)
+    return count
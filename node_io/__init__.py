@@ -1,8 +1,16 @@
-from . import node
-from . import ui
-from . import properties
-from . import import_nodes
-from . import export_nodes
+try:
+    import bpy
+except ImportError:
+    # outside of blender only the modules that do not need bpy can be imported, like nodeFile
+    bpy = None
+
+if bpy is not None:
+    from . import node
+    from . import ui
+    from . import properties
+    from . import import_nodes
+    from . import export_nodes
+    from . import library
 
 
 def register():
@@ -10,6 +18,7 @@ def register():
     ui.register()
     import_nodes.register()
     export_nodes.register()
+    library.register()
     properties.register()
 
 
@@ -19,4 +28,5 @@ def unregister():
     ui.unregister()
     import_nodes.unregister()
     export_nodes.unregister()
+    library.unregister()
     properties.unregister()
@@ -0,0 +1,332 @@
+import lzma
+import struct
+import zlib
+from .errors import VersionError
+
+# Binary container for our Node Tree Format
+#
+# header: magic, container version, compression
+# payload, compressed as a whole:
+#   string table: count, then length prefixed utf8 strings, referenced everywhere else by index
+#   file version, then the material tree followed by its node group table
+#
+# Floats are stored as 32 bit floats, which is the precision blender stores them in.
+# This module does not import bpy, so it can also run outside of blender.
+
+MAGIC = b"NIOB"
+# 2: socket identifiers and link socket indices
+CONTAINER_VERSION = 2
+
+COMPRESSION_NONE = 0
+COMPRESSION_ZLIB = 1
+COMPRESSION_LZMA = 2
+COMPRESSIONS = {"NONE": COMPRESSION_NONE, "ZLIB": COMPRESSION_ZLIB, "LZMA": COMPRESSION_LZMA}
+
+HEADER = struct.Struct("<4sBB")
+U8 = struct.Struct("<B")
+U16 = struct.Struct("<H")
+U32 = struct.Struct("<I")
+I64 = struct.Struct("<q")
+F32 = struct.Struct("<f")
+NODE_HEADER = struct.Struct("<IIB")
+SOCKET = struct.Struct("<III")
+LINK = struct.Struct("<IIIIii")
+SOCKET_V1 = struct.Struct("<II")
+LINK_V1 = struct.Struct("<IIII")
+
+# stands in for a missing string or index
+NO_STRING = 0xFFFFFFFF
+NO_INDEX = -1
+
+# value tags
+TAG_NONE = 0
+TAG_FALSE = 1
+TAG_TRUE = 2
+TAG_FLOAT = 3
+TAG_INT = 4
+TAG_STRING = 5
+TAG_FLOATS = 6
+TAG_LIST = 7
+TAG_DICT = 8
+
+
+def isBinary(data: bytes) -> bool:
+    """check if the start of a file is a binary node tree container"""
+    return data[:len(MAGIC)] == MAGIC
+
+
+class BinaryWriter:
+    """Packs a Node Tree document, as made by NodeTreeEncoder.encodeTree, into bytes"""
+
+    def __init__(self) -> None:
+        self.strings: dict[str, int] = {}
+        self.buffer = bytearray()
+
+    def string(self, value: str) -> int:
+        if value is None:
+            return NO_STRING
+        index = self.strings.get(value)
+        if index is None:
+            index = len(self.strings)
+            self.strings[value] = index
+        return index
+
+    def writeDocument(self, document: dict):
+        self.buffer += U32.pack(self.string(document["file_version"]))
+        self.writeTree(document)
+        groups = document.get("groups", [])
+        self.buffer += U32.pack(len(groups))
+        for group in groups:
+            self.writeTree(group)
+
+    def writeTree(self, tree: dict):
+        buffer = self.buffer
+        buffer += U32.pack(self.string(tree["node_tree"]))
+        buffer += U32.pack(len(tree["nodes"]))
+        for node in tree["nodes"]:
+            self.writeNode(node)
+        buffer += U32.pack(len(tree["links"]))
+        for link in tree["links"]:
+            fromIndex = link.get("from_socket_index")
+            toIndex = link.get("to_socket_index")
+            buffer += LINK.pack(
+                self.string(link["from_node"]),
+                self.string(link["from_socket"]),
+                self.string(link["to_node"]),
+                self.string(link["to_socket"]),
+                NO_INDEX if fromIndex is None else fromIndex,
+                NO_INDEX if toIndex is None else toIndex)
+
+    def writeNode(self, node: dict):
+        buffer = self.buffer
+        location = node["location"]
+        buffer += NODE_HEADER.pack(self.string(node["name"]), self.string(node["type"]), len(location))
+        buffer += struct.pack(f"<{len(location)}f", *location)
+        for sockets in (node["inputs"], node["outputs"]):
+            buffer += U16.pack(len(sockets))
+            for socket in sockets:
+                buffer += SOCKET.pack(
+                    self.string(socket["type"]),
+                    self.string(socket["name"]),
+                    self.string(socket.get("identifier")))
+                self.writeValue(socket["value"])
+        buffer += U16.pack(len(node["data"]))
+        for key, value in node["data"].items():
+            buffer += U32.pack(self.string(key))
+            self.writeValue(value)
+
+    def writeValue(self, value):
+        buffer = self.buffer
+        valueType = type(value)
+        if value is None:
+            buffer += U8.pack(TAG_NONE)
+        elif valueType is bool:
+            buffer += U8.pack(TAG_TRUE if value else TAG_FALSE)
+        elif valueType is float:
+            buffer += U8.pack(TAG_FLOAT) + F32.pack(value)
+        elif valueType is int:
+            buffer += U8.pack(TAG_INT) + I64.pack(value)
+        elif valueType is str:
+            buffer += U8.pack(TAG_STRING) + U32.pack(self.string(value))
+        elif valueType is list and 0 < len(value) < 256 and all(type(v) is float for v in value):
+            buffer += U8.pack(TAG_FLOATS) + U8.pack(len(value)) + struct.pack(f"<{len(value)}f", *value)
+        elif valueType is list:
+            buffer += U8.pack(TAG_LIST) + U32.pack(len(value))
+            for v in value:
+                self.writeValue(v)
+        elif valueType is dict:
+            buffer += U8.pack(TAG_DICT) + U32.pack(len(value))
+            for key, v in value.items():
+                buffer += U32.pack(self.string(key))
+                self.writeValue(v)
+        else:
+            raise TypeError(f"Object of type {valueType.__name__} can not be stored in a binary node tree file")
+
+    def getPayload(self) -> bytes:
+        table = bytearray(U32.pack(len(self.strings)))
+        for value in self.strings:
+            encoded = value.encode("utf8")
+            table += U32.pack(len(encoded))
+            table += encoded
+        return bytes(table + self.buffer)
+
+
+class BinaryReader:
+    """Unpacks a binary payload back into a Node Tree document"""
+
+    def __init__(self, payload: bytes, version: int = CONTAINER_VERSION) -> None:
+        self.data = memoryview(payload)
+        self.offset = 0
+        self.strings: list[str] = []
+        self.version = version
+
+    def readStrings(self):
+        data = self.data
+        count, = U32.unpack_from(data, self.offset)
+        offset = self.offset + U32.size
+        strings = []
+        for _ in range(count):
+            length, = U32.unpack_from(data, offset)
+            offset += U32.size
+            strings.append(str(data[offset:offset + length], "utf8"))
+            offset += length
+        self.strings = strings
+        self.offset = offset
+
+    def readU32(self) -> int:
+        value, = U32.unpack_from(self.data, self.offset)
+        self.offset += U32.size
+        return value
+
+    def readDocument(self) -> dict:
+        self.readStrings()
+        fileVersion = self.strings[self.readU32()]
+        document = self.readTree()
+        document["file_version"] = fileVersion
+        document["groups"] = [self.readTree() for _ in range(self.readU32())]
+        return document
+
+    def readTree(self) -> dict:
+        strings = self.strings
+        name = strings[self.readU32()]
+        nodes = [self.readNode() for _ in range(self.readU32())]
+        links = []
+        for _ in range(self.readU32()):
+            if self.version == 1:
+                fromNode, fromSocket, toNode, toSocket = LINK_V1.unpack_from(self.data, self.offset)
+                fromIndex = toIndex = NO_INDEX
+                self.offset += LINK_V1.size
+            else:
+                fromNode, fromSocket, toNode, toSocket, fromIndex, toIndex = LINK.unpack_from(self.data, self.offset)
+                self.offset += LINK.size
+            links.append({
+                "from_node": strings[fromNode],
+                "from_socket": strings[fromSocket],
+                "to_node": strings[toNode],
+                "to_socket": strings[toSocket],
+                "from_socket_index": None if fromIndex == NO_INDEX else fromIndex,
+                "to_socket_index": None if toIndex == NO_INDEX else toIndex
+            })
+        return {"node_tree": name, "nodes": nodes, "links": links}
+
+    def readNode(self) -> dict:
+        data = self.data
+        strings = self.strings
+        name, type, locationLength = NODE_HEADER.unpack_from(data, self.offset)
+        self.offset += NODE_HEADER.size
+        location = list(struct.unpack_from(f"<{locationLength}f", data, self.offset))
+        self.offset += 4 * locationLength
+
+        socketLists = []
+        for _ in range(2):
+            count, = U16.unpack_from(data, self.offset)
+            self.offset += U16.size
+            sockets = []
+            for _ in range(count):
+                if self.version == 1:
+                    socketType, socketName = SOCKET_V1.unpack_from(data, self.offset)
+                    identifier = NO_STRING
+                    self.offset += SOCKET_V1.size
+                else:
+                    socketType, socketName, identifier = SOCKET.unpack_from(data, self.offset)
+                    self.offset += SOCKET.size
+                sockets.append({
+                    "type": strings[socketType],
+                    "name": strings[socketName],
+                    "value": self.readValue(),
+                    "identifier": None if identifier == NO_STRING else strings[identifier]
+                })
+            socketLists.append(sockets)
+
+        count, = U16.unpack_from(data, self.offset)
+        self.offset += U16.size
+        nodeData = {}
+        for _ in range(count):
+            key = strings[self.readU32()]
+            nodeData[key] = self.readValue()
+
+        return {
+            "name": strings[name],
+            "type": strings[type],
+            "location": location,
+            "inputs": socketLists[0],
+            "outputs": socketLists[1],
+            "data": nodeData,
+        }
+
+    def readValue(self):
+        data = self.data
+        tag = data[self.offset]
+        self.offset += 1
+        if tag == TAG_NONE:
+            return None
+        if tag == TAG_FALSE:
+            return False
+        if tag == TAG_TRUE:
+            return True
+        if tag == TAG_FLOAT:
+            value, = F32.unpack_from(data, self.offset)
+            self.offset += F32.size
+            return value
+        if tag == TAG_INT:
+            value, = I64.unpack_from(data, self.offset)
+            self.offset += I64.size
+            return value
+        if tag == TAG_STRING:
+            return self.strings[self.readU32()]
+        if tag == TAG_FLOATS:
+            count = data[self.offset]
+            value = list(struct.unpack_from(f"<{count}f", data, self.offset + 1))
+            self.offset += 1 + 4 * count
+            return value
+        if tag == TAG_LIST:
+            return [self.readValue() for _ in range(self.readU32())]
+        if tag == TAG_DICT:
+            value = {}
+            for _ in range(self.readU32()):
+                key = self.strings[self.readU32()]
+                value[key] = self.readValue()
+            return value
+        raise ValueError(f"Unknown value tag {tag} at offset {self.offset - 1}")
+
+
+def dumps(document: dict, compression: str = "NONE") -> bytes:
+    """Pack a Node Tree document into a binary container
+
+    Args:
+        document (dict): the tree as made by NodeTreeEncoder.encodeTree
+        compression (str): one of "NONE", "ZLIB" or "LZMA"
+    """
+    writer = BinaryWriter()
+    writer.writeDocument(document)
+    payload = writer.getPayload()
+
+    method = COMPRESSIONS[compression]
+    if method == COMPRESSION_ZLIB:
+        payload = zlib.compress(payload, 6)
+    elif method == COMPRESSION_LZMA:
+        payload = lzma.compress(payload)
+    return HEADER.pack(MAGIC, CONTAINER_VERSION, method) + payload
+
+
+def loads(data: bytes) -> dict:
+    """Unpack a binary container into a Node Tree document
+
+    Raises:
+        VersionError: when the container was written by a newer version
+        ValueError: when the data is not a binary node tree container
+    """
+    magic, version, method = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError("Not a binary node tree file")
+    if version > CONTAINER_VERSION:
+        raise VersionError(f"Binary container version {version} is newer than the supported version {CONTAINER_VERSION}")
+
+    payload = memoryview(data)[HEADER.size:]
+    if method == COMPRESSION_ZLIB:
+        payload = zlib.decompress(payload)
+    elif method == COMPRESSION_LZMA:
+        payload = lzma.decompress(payload)
+    elif method != COMPRESSION_NONE:
+        raise ValueError(f"Unknown compression {method}")
+    return BinaryReader(payload, version).readDocument()
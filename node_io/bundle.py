@@ -0,0 +1,193 @@
+import fnmatch
+import json
+import lzma
+import struct
+import zlib
+from .binaryFormat import COMPRESSIONS, COMPRESSION_NONE, COMPRESSION_ZLIB, COMPRESSION_LZMA
+from .encoder import NodeTreeEncoder, VERSION
+from .errors import NodeFormatError, VersionError
+
+# Bundle of several materials that share one node group table
+#
+# header: magic, bundle version, compression, size of the index
+# index: json with the file version, and the name, offset and size of every material and node group entry.
+#   materials also list the names of the node groups they use, dependencies first.
+#   every entry lists the groups its own group nodes use, so groups that are not needed can be left unread
+# entries: the json records of the materials and node groups, each one compressed on its own
+#
+# Every node group is stored once, however many materials use it. Reading a material only reads
+# and parses its own entry and the entries of its groups.
+# This module does not import bpy, so it can also run outside of blender.
+
+BUNDLE_MAGIC = b"NIOK"
+BUNDLE_VERSION = 1
+BUNDLE_EXTENSION = ".nodebundle"
+
+BUNDLE_HEADER = struct.Struct("<4sBBI")
+
+
+def compressEntry(data: bytes, method: int) -> bytes:
+    if method == COMPRESSION_ZLIB:
+        return zlib.compress(data, 6)
+    if method == COMPRESSION_LZMA:
+        return lzma.compress(data)
+    return data
+
+
+def decompressEntry(data: bytes, method: int) -> bytes:
+    if method == COMPRESSION_ZLIB:
+        return zlib.decompress(data)
+    if method == COMPRESSION_LZMA:
+        return lzma.decompress(data)
+    if method != COMPRESSION_NONE:
+        raise NodeFormatError(f"Unknown bundle compression {method}")
+    return data
+
+
+def writeBundle(filepath, trees: list, compression="ZLIB") -> int:
+    """Write several NodeTrees into one bundle file
+
+    Node groups are matched by name, a group used by several trees is written once.
+
+    Args:
+        trees (list[NodeTree]): the material trees, with their node group tables in subtrees
+        compression (str): one of "NONE", "ZLIB" or "LZMA"
+
+    Returns:
+        int: number of node groups written
+    """
+    method = COMPRESSIONS[compression]
+    encoder = NodeTreeEncoder()
+    entries = []
+    offset = 0
+
+    def addEntry(tree) -> dict:
+        nonlocal offset
+        data = compressEntry(json.dumps(encoder.encodeGroup(tree), separators=(",", ":")).encode("utf8"), method)
+        entries.append(data)
+        entry = {"name": tree.name, "offset": offset, "size": len(data), "dependencies": tree.getGroupDependencies()}
+        offset += len(data)
+        return entry
+
+    # each table is already ordered dependencies first, so their union is too
+    groups = {}
+    for tree in trees:
+        for group in tree.subtrees:
+            if group.name not in groups:
+                groups[group.name] = addEntry(group)
+
+    materials = []
+    for tree in trees:
+        entry = addEntry(tree)
+        entry["groups"] = [group.name for group in tree.subtrees]
+        materials.append(entry)
+
+    index = json.dumps({
+        "file_version": VERSION,
+        "materials": materials,
+        "groups": list(groups.values()),
+    }, separators=(",", ":")).encode("utf8")
+
+    with open(filepath, "wb") as f:
+        f.write(BUNDLE_HEADER.pack(BUNDLE_MAGIC, BUNDLE_VERSION, method, len(index)))
+        f.write(index)
+        for data in entries:
+            f.write(data)
+    return len(groups)
+
+
+class BundleReader:
+    """Reads the materials of a bundle file, only the entries that are asked for are read
+
+    Raises:
+        VersionError: when the bundle was written by a newer version
+        NodeFormatError: when the file is not a bundle
+    """
+
+    def __init__(self, filepath) -> None:
+        self.filepath = filepath
+        with open(filepath, "rb") as f:
+            header = f.read(BUNDLE_HEADER.size)
+            if len(header) < BUNDLE_HEADER.size:
+                raise NodeFormatError("The file is too short to be a node bundle")
+            magic, version, self.compression, indexSize = BUNDLE_HEADER.unpack(header)
+            if magic != BUNDLE_MAGIC:
+                raise NodeFormatError("Not a node bundle file")
+            if version > BUNDLE_VERSION:
+                raise VersionError(f"Bundle version {version} is newer than the supported version {BUNDLE_VERSION}")
+            try:
+                index = json.loads(f.read(indexSize))
+            except ValueError as e:
+                raise NodeFormatError(f"The index of the bundle is malformed: {e}")
+        self.dataStart = BUNDLE_HEADER.size + indexSize
+        try:
+            self.fileVersion: str = index["file_version"]
+            self.materials: dict[str, dict] = {entry["name"]: entry for entry in index["materials"]}
+            self.groups: dict[str, dict] = {entry["name"]: entry for entry in index["groups"]}
+        except (KeyError, TypeError) as e:
+            raise NodeFormatError(f"The index of the bundle is malformed: {e!r}")
+
+    def materialNames(self, pattern="") -> list[str]:
+        """names of the materials in the bundle, in the order they were written
+
+        Args:
+            pattern (str): fnmatch pattern the names have to match, empty for all
+        """
+        return [name for name in self.materials if not pattern or fnmatch.fnmatchcase(name, pattern)]
+
+    def read(self, names: list[str], existingGroups=frozenset()) -> tuple[list[tuple], dict[str, dict]]:
+        """Read the records of some materials and of the node groups they use
+
+        Args:
+            names (list[str]): the materials to read
+            existingGroups (set[str]): groups that are kept as they are, their entries are not read,
+                nor the entries of groups only they use
+
+        Returns:
+            tuple: the material records in the order of names, each with the names of the groups it uses,
+                and the group records by name, each group once, dependencies first
+
+        Raises:
+            KeyError: when a name is not a material of the bundle
+            NodeFormatError: when an entry is malformed
+        """
+        materialEntries = [self.materials[name] for name in names]
+        needed = self.findNeededGroups(materialEntries, existingGroups)
+        groupNames = {}
+        for entry in materialEntries:
+            for groupName in entry.get("groups", []):
+                if groupName in needed:
+                    groupNames[groupName] = None
+
+        with open(self.filepath, "rb") as f:
+            materials = [(self.readEntry(f, entry), entry.get("groups", [])) for entry in materialEntries]
+            groups = {}
+            for groupName in groupNames:
+                if groupName not in self.groups:
+                    raise NodeFormatError(f"Node group '{groupName}' is missing from the bundle")
+                groups[groupName] = self.readEntry(f, self.groups[groupName])
+        return materials, groups
+
+    def findNeededGroups(self, materialEntries: list[dict], existingGroups) -> set[str]:
+        """names of the groups these materials need that are not in existingGroups"""
+        if any("dependencies" not in entry for entry in materialEntries):
+            # written without dependencies, every group except the existing ones is read
+            return {name for entry in materialEntries for name in entry.get("groups", []) if name not in existingGroups}
+
+        needed = set()
+        toCheck = [name for entry in materialEntries for name in entry["dependencies"]]
+        while len(toCheck) > 0:
+            name = toCheck.pop()
+            if name in needed or name in existingGroups:
+                continue
+            needed.add(name)
+            toCheck.extend(self.groups.get(name, {}).get("dependencies", []))
+        return needed
+
+    def readEntry(self, f, entry: dict) -> dict:
+        f.seek(self.dataStart + entry["offset"])
+        data = f.read(entry["size"])
+        try:
+            return json.loads(decompressEntry(data, self.compression))
+        except (ValueError, zlib.error, lzma.LZMAError) as e:
+            raise NodeFormatError(f"The bundle entry of '{entry['name']}' is malformed: {e}")
@@ -0,0 +1,172 @@
+import hashlib
+import json
+import os
+from .nodeFile import READ_ERRORS, parseDocument
+from .encoder import expandCompactDocument, expandColumnarDocument
+from .nodePack import NodePack, PACK_EXTENSION
+
+# Index of the node tree files in a library folder, so they can be browsed without parsing them.
+# This module does not import bpy, so it can also run outside of blender.
+
+CATALOG_FILENAME = ".nodeio_catalog.json"
+CATALOG_VERSION = 1
+NODETREE_EXTENSION = ".nodetree"
+
+
+def describeDocument(document: dict) -> dict:
+    """Summarize a Node Tree document: node count, node types, node groups and images
+
+    Args:
+        document (dict): as read by nodeFile.readDocument
+    """
+    if document.get("compact", False):
+        document = expandCompactDocument(document)
+    elif document.get("columnar", False):
+        document = expandColumnarDocument(document)
+    if "groups" in document:
+        groups = document["groups"]
+    else:
+        # files before 0.1.0 nest the groups, their names are enough here
+        groups = []
+        toCheck = list(document.get("subtrees", []))
+        while len(toCheck) > 0:
+            group = toCheck.pop()
+            groups.append(group)
+            toCheck += group.get("subtrees", [])
+
+    nodeCount = 0
+    nodeTypes = set()
+    images = set()
+    for tree in [document] + groups:
+        for node in tree["nodes"]:
+            nodeCount += 1
+            nodeTypes.add(node["type"])
+            image = node.get("data", {}).get("image")
+            if image:
+                images.add(image)
+
+    return {
+        "nodeCount": nodeCount,
+        "nodeTypes": sorted(nodeTypes),
+        "groups": sorted({group["node_tree"] for group in groups}),
+        "images": sorted(images),
+    }
+
+
+class LibraryCatalog:
+    """The catalog of a library folder, stored next to the node tree files
+
+    Files are only read again when their modification time or size changed.
+    """
+
+    def __init__(self, folder: str) -> None:
+        self.folder = folder
+        # entries by file name
+        self.entries: dict[str, dict] = {}
+        # modification time and size of files that are not node tree files, so they are not read again
+        self.unreadable: dict[str, list[int]] = {}
+        self.modified = False
+
+    @classmethod
+    def load(cls, folder: str) -> "LibraryCatalog":
+        """Read the catalog of a folder. A missing or unreadable catalog gives an empty one"""
+        catalog = LibraryCatalog(folder)
+        try:
+            with open(catalog.getPath(), "r", encoding="utf8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return catalog
+        if data.get("version") != CATALOG_VERSION:
+            return catalog
+        catalog.entries = data.get("entries", {})
+        catalog.unreadable = data.get("unreadable", {})
+        return catalog
+
+    def getPath(self) -> str:
+        return os.path.join(self.folder, CATALOG_FILENAME)
+
+    def update(self) -> tuple[int, int]:
+        """Index new and changed files and drop the entries of deleted files
+
+        Files that can not be read are left out of the catalog, and only tried again when they change.
+
+        Returns:
+            tuple[int, int]: number of files indexed, and number of entries removed
+        """
+        found = set()
+        indexed = 0
+        with os.scandir(self.folder) as scan:
+            for entry in scan:
+                if not entry.is_file() or not entry.name.endswith((NODETREE_EXTENSION, PACK_EXTENSION)):
+                    continue
+                found.add(entry.name)
+                stat = entry.stat()
+                known = self.entries.get(entry.name)
+                if known is not None and known["mtime"] == stat.st_mtime_ns and known["size"] == stat.st_size:
+                    continue
+                if self.unreadable.get(entry.name) == [stat.st_mtime_ns, stat.st_size]:
+                    continue
+                catalogEntry = self.indexFile(entry.path, stat)
+                if catalogEntry is None:
+                    self.entries.pop(entry.name, None)
+                    self.unreadable[entry.name] = [stat.st_mtime_ns, stat.st_size]
+                else:
+                    self.entries[entry.name] = catalogEntry
+                    self.unreadable.pop(entry.name, None)
+                    indexed += 1
+                self.modified = True
+
+        removed = [filename for filename in self.entries if filename not in found]
+        for filename in removed:
+            del self.entries[filename]
+        for filename in [filename for filename in self.unreadable if filename not in found]:
+            del self.unreadable[filename]
+            self.modified = True
+        if len(removed) > 0:
+            self.modified = True
+        return indexed, len(removed)
+
+    def indexFile(self, filepath: str, stat: os.stat_result) -> dict:
+        """the catalog entry of a file, or None if it is not a node tree file"""
+        try:
+            if filepath.endswith(PACK_EXTENSION):
+                # only the tree member of a pack is read, its textures are left in the archive
+                pack = NodePack(filepath)
+                entry = describeDocument(pack.readDocument(extractTextures=False))
+                contentHash = pack.contentHash()
+            else:
+                with open(filepath, "rb") as f:
+                    data = f.read()
+                entry = describeDocument(parseDocument(data))
+                contentHash = hashlib.sha1(data).hexdigest()
+        except READ_ERRORS + (AttributeError,):
+            # describeDocument reads json that is not a document, like a list, as attributes that are missing
+            return None
+        entry["name"] = os.path.splitext(os.path.basename(filepath))[0]
+        entry["hash"] = contentHash
+        entry["mtime"] = stat.st_mtime_ns
+        entry["size"] = stat.st_size
+        return entry
+
+    def search(self, text="") -> list[tuple[str, dict]]:
+        """File names and entries whose material name or node types contain the text, sorted by name"""
+        text = text.lower()
+        results = []
+        for filename, entry in self.entries.items():
+            if (text in entry["name"].lower()
+                    or any(text in nodeType.lower() for nodeType in entry["nodeTypes"])):
+                results.append((filename, entry))
+        results.sort(key=lambda result: result[1]["name"].lower())
+        return results
+
+    def save(self):
+        """Write the catalog, only if it changed since it was loaded"""
+        if not self.modified:
+            return
+        with open(self.getPath(), "w", encoding="utf8") as f:
+            json.dump({
+                "version": CATALOG_VERSION,
+                "entries": self.entries,
+                "unreadable": self.unreadable,
+            }, f, indent=2, sort_keys=True)
+        self.modified = False
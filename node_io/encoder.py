@@ -0,0 +1,359 @@
+import json
+
+# version of our Node Tree Format, written to every file.
+# Raise it with every layout older readers can not parse, so they fail with a VersionError
+# instead of on a missing key. 0.2.0: the compact layout, 0.3.0: the columnar layout
+VERSION = "0.3.0"
+
+# value types that json can write as they are
+PRIMITIVE_TYPES = {str, int, float, bool, type(None)}
+
+
+def encodeValue(value):
+    """Convert a socket value or node property into json primitives
+
+    Handles the concrete types our model holds: json primitives, lists and dicts of them,
+    mathutils Vector/Color/Euler and bpy_prop_array (anything iterable becomes a list),
+    and sets (enum flags), which become sorted lists.
+    """
+    valueType = type(value)
+    if valueType in PRIMITIVE_TYPES:
+        return value
+    if valueType is list or valueType is tuple:
+        return [v if type(v) in PRIMITIVE_TYPES else encodeValue(v) for v in value]
+    if valueType is dict:
+        return {key: encodeValue(v) for key, v in value.items()}
+    if valueType is set or valueType is frozenset:
+        return sorted(value)
+    try:
+        return [encodeValue(v) for v in value]
+    except TypeError:
+        raise TypeError(f"Object of type {valueType.__name__} can not be stored in a node tree file")
+
+
+class NodeTreeEncoder:
+    """Writes our Node Tree Format to json
+
+    The encoder knows the shape of NodeTree, Node, NodeSocket and NodeLink, so it turns
+    a tree into json primitives in a single walk instead of going through a toJson
+    callback for every object, and never needs a trial encoding to find out whether
+    a value can be stored.
+    This module does not import bpy, so it can also run outside of blender.
+    """
+
+    def __init__(self, indent: int = 2) -> None:
+        self.indent = indent
+
+    def encodeTree(self, tree) -> dict:
+        return {
+            "file_version": VERSION,
+            "node_tree": tree.name,
+            "nodes": [self.encodeNode(n) for n in tree.nodes],
+            "links": [self.encodeLink(l) for l in tree.links],
+            "groups": [self.encodeGroup(st) for st in tree.subtrees],
+        }
+
+    def encodeGroup(self, tree) -> dict:
+        """Encode an entry of the node group table, which is shared by the whole file"""
+        return {
+            "node_tree": tree.name,
+            "nodes": [self.encodeNode(n) for n in tree.nodes],
+            "links": [self.encodeLink(l) for l in tree.links],
+        }
+
+    def encodeNode(self, node) -> dict:
+        return {
+            "name": node.name,
+            "type": node.type,
+            "location": [float(v) for v in node.location],
+            "inputs": [self.encodeSocket(s) for s in node.inputs],
+            "outputs": [self.encodeSocket(s) for s in node.outputs],
+            "data": {key: encodeValue(value) for key, value in node.data.items()},
+        }
+
+    def encodeSocket(self, socket) -> dict:
+        value = socket.value
+        return {
+            "type": socket.type,
+            "name": socket.name,
+            "value": value if type(value) in PRIMITIVE_TYPES else encodeValue(value),
+            "identifier": socket.identifier
+        }
+
+    def encodeLink(self, link) -> dict:
+        return {
+            "from_node": link.from_node,
+            "from_socket": link.from_socket,
+            "to_node": link.to_node,
+            "to_socket": link.to_socket,
+            "from_socket_index": link.from_socket_index,
+            "to_socket_index": link.to_socket_index
+        }
+
+    def dumps(self, tree) -> str:
+        return json.dumps(self.encodeTree(tree), indent=self.indent)
+
+    def dump(self, tree, fp):
+        # one write of the whole string is faster than json.dump's many small writes
+        fp.write(self.dumps(tree))
+
+
+# short keys of the compact format, by the key they stand for
+COMPACT_TREE_KEYS = {"node_tree": "t", "nodes": "n", "links": "l", "groups": "g"}
+COMPACT_NODE_KEYS = {"name": "n", "type": "t", "location": "p", "inputs": "i", "outputs": "o", "data": "d"}
+COMPACT_SOCKET_KEYS = {"type": "t", "name": "n", "value": "v", "identifier": "k"}
+COMPACT_LINK_KEYS = {"from_node": "a", "from_socket": "b", "to_node": "c", "to_socket": "d",
+                     "from_socket_index": "e", "to_socket_index": "f"}
+
+
+def renameKeys(jsonObject: dict, keys: dict) -> dict:
+    """Rename the keys of a dict, keys without a new name are kept"""
+    return {keys.get(key, key): value for key, value in jsonObject.items()}
+
+
+def compactNode(node: dict) -> dict:
+    node = renameKeys(node, COMPACT_NODE_KEYS)
+    for key in ("i", "o"):
+        node[key] = [renameKeys(socket, COMPACT_SOCKET_KEYS) for socket in node[key]]
+    return node
+
+
+def compactDocument(document: dict) -> dict:
+    """Turn a Node Tree document into the compact format, as NodeTreeWriter writes it in compact mode"""
+    def compactTree(tree, isGroup):
+        compact = {}
+        if not isGroup:
+            compact["file_version"] = tree["file_version"]
+            compact["compact"] = True
+        compact["t"] = tree["node_tree"]
+        compact["n"] = [compactNode(node) for node in tree["nodes"]]
+        compact["l"] = [renameKeys(link, COMPACT_LINK_KEYS) for link in tree["links"]]
+        if not isGroup:
+            compact["g"] = [compactTree(group, True) for group in tree["groups"]]
+        return compact
+
+    return compactTree(document, False)
+
+
+def expandCompactDocument(document: dict) -> dict:
+    """Turn a file written in compact mode back into the regular Node Tree Format
+
+    Only the structural keys are renamed, the property names in node data are stored as they are.
+    """
+    treeKeys = {short: key for key, short in COMPACT_TREE_KEYS.items()}
+    nodeKeys = {short: key for key, short in COMPACT_NODE_KEYS.items()}
+    socketKeys = {short: key for key, short in COMPACT_SOCKET_KEYS.items()}
+    linkKeys = {short: key for key, short in COMPACT_LINK_KEYS.items()}
+
+    def expandTree(tree):
+        tree = renameKeys(tree, treeKeys)
+        tree.pop("compact", None)
+        nodes = []
+        for node in tree["nodes"]:
+            node = renameKeys(node, nodeKeys)
+            node["inputs"] = [renameKeys(socket, socketKeys) for socket in node["inputs"]]
+            node["outputs"] = [renameKeys(socket, socketKeys) for socket in node["outputs"]]
+            nodes.append(node)
+        tree["nodes"] = nodes
+        tree["links"] = [renameKeys(link, linkKeys) for link in tree["links"]]
+        if "groups" in tree:
+            tree["groups"] = [expandTree(group) for group in tree["groups"]]
+        return tree
+
+    return expandTree(document)
+
+
+# columns of the columnar layout that hold indices into its string table
+COLUMNAR_SOCKET_STRINGS = ["type", "name", "identifier"]
+COLUMNAR_LINK_STRINGS = ["from_socket", "to_socket"]
+
+
+def columnarDocument(document: dict) -> dict:
+    """Turn a Node Tree document into the columnar layout
+
+    Every string is stored once in the string table and referenced by its index.
+    Each tree holds its nodes, sockets and links as tables of columns:
+    nodes have a flat location column with two values per node, and the number of
+    inputs and outputs they own in the socket table, which lists the inputs and
+    then the outputs of each node in node order. Links reference their nodes by index.
+    """
+    strings: dict[str, int] = {}
+
+    def string(value):
+        if value is None:
+            return None
+        index = strings.get(value)
+        if index is None:
+            index = len(strings)
+            strings[value] = index
+        return index
+
+    def columnarTree(tree):
+        nodes = tree["nodes"]
+        links = tree["links"]
+        nodeIndices = {node["name"]: index for index, node in enumerate(nodes)}
+        sockets = [socket for node in nodes for socket in node["inputs"] + node["outputs"]]
+        socketColumns = {key: [string(socket.get(key)) for socket in sockets] for key in COLUMNAR_SOCKET_STRINGS}
+        socketColumns["value"] = [socket["value"] for socket in sockets]
+        linkColumns = {key: [string(link[key]) for link in links] for key in COLUMNAR_LINK_STRINGS}
+        return {
+            "node_tree": string(tree["node_tree"]),
+            "nodes": {
+                "name": [string(node["name"]) for node in nodes],
+                "type": [string(node["type"]) for node in nodes],
+                "location": [value for node in nodes for value in node["location"][:2]],
+                "inputs": [len(node["inputs"]) for node in nodes],
+                "outputs": [len(node["outputs"]) for node in nodes],
+                "data": [node["data"] for node in nodes],
+            },
+            "sockets": socketColumns,
+            "links": {
+                "from_node": [nodeIndices[link["from_node"]] for link in links],
+                "from_socket": linkColumns["from_socket"],
+                "to_node": [nodeIndices[link["to_node"]] for link in links],
+                "to_socket": linkColumns["to_socket"],
+                "from_socket_index": [link.get("from_socket_index") for link in links],
+                "to_socket_index": [link.get("to_socket_index") for link in links],
+            },
+        }
+
+    columnar = {"file_version": document["file_version"], "columnar": True, "strings": None}
+    columnar.update(columnarTree(document))
+    columnar["groups"] = [columnarTree(group) for group in document["groups"]]
+    columnar["strings"] = list(strings)
+    return columnar
+
+
+def expandColumnarDocument(document: dict) -> dict:
+    """Turn a file written in the columnar layout back into the regular Node Tree Format"""
+    strings = document["strings"]
+
+    def lookup(column):
+        return [None if index is None else strings[index] for index in column]
+
+    def expandTree(table):
+        nodeColumns = table["nodes"]
+        socketColumns = {key: lookup(table["sockets"][key]) for key in COLUMNAR_SOCKET_STRINGS}
+        socketColumns["value"] = table["sockets"]["value"]
+        sockets = [
+            {"type": type, "name": name, "value": value, "identifier": identifier}
+            for type, name, identifier, value in zip(*(socketColumns[key] for key in COLUMNAR_SOCKET_STRINGS + ["value"]))
+        ]
+
+        names = lookup(nodeColumns["name"])
+        location = nodeColumns["location"]
+        nodes = []
+        start = 0
+        for index, (name, type, inputCount, outputCount, data) in enumerate(zip(
+                names, lookup(nodeColumns["type"]), nodeColumns["inputs"], nodeColumns["outputs"], nodeColumns["data"])):
+            nodes.append({
+                "name": name,
+                "type": type,
+                "location": location[index * 2:index * 2 + 2],
+                "inputs": sockets[start:start + inputCount],
+                "outputs": sockets[start + inputCount:start + inputCount + outputCount],
+                "data": data,
+            })
+            start += inputCount + outputCount
+
+        linkColumns = table["links"]
+        links = [
+            {
+                "from_node": names[fromNode],
+                "from_socket": strings[fromSocket],
+                "to_node": names[toNode],
+                "to_socket": strings[toSocket],
+                "from_socket_index": fromIndex,
+                "to_socket_index": toIndex,
+            }
+            for fromNode, fromSocket, toNode, toSocket, fromIndex, toIndex in zip(
+                linkColumns["from_node"], linkColumns["from_socket"], linkColumns["to_node"],
+                linkColumns["to_socket"], linkColumns["from_socket_index"], linkColumns["to_socket_index"])
+        ]
+        return {"node_tree": strings[table["node_tree"]], "nodes": nodes, "links": links}
+
+    expanded = {"file_version": document["file_version"]}
+    expanded.update(expandTree(document))
+    expanded["groups"] = [expandTree(group) for group in document["groups"]]
+    return expanded
+
+
+class NodeTreeWriter:
+    """Streams a NodeTree to a file handle
+
+    Nodes, links and groups are encoded and written one at a time, so the json for the
+    whole tree is never held in memory.
+    The pretty output is the same as NodeTreeEncoder.dumps. The compact output has no
+    indentation or whitespace and uses short keys, see expandCompactDocument.
+    """
+
+    def __init__(self, fp, compact: bool = False, indent: int = 2) -> None:
+        self.fp = fp
+        self.compact = compact
+        self.indent = None if compact else indent
+        self.separators = (",", ":") if compact else (",", ": ")
+        self.encoder = NodeTreeEncoder()
+
+    def write(self, tree):
+        self.writeTree(tree, 0, isGroup=False)
+
+    def writeTree(self, tree, level: int, isGroup: bool):
+        keys = COMPACT_TREE_KEYS if self.compact else {}
+        fields = []
+        if not isGroup:
+            fields.append(("file_version", VERSION))
+            if self.compact:
+                fields.append(("compact", True))
+        fields += [
+            (keys.get("node_tree", "node_tree"), tree.name),
+            (keys.get("nodes", "nodes"), lambda level: self.writeArray(tree.nodes, self.writeNode, level)),
+            (keys.get("links", "links"), lambda level: self.writeArray(tree.links, self.writeLink, level)),
+        ]
+        if not isGroup:
+            writeGroup = lambda group, level: self.writeTree(group, level, isGroup=True)
+            fields.append((keys.get("groups", "groups"), lambda level: self.writeArray(tree.subtrees, writeGroup, level)))
+        self.writeObject(fields, level)
+
+    def writeNode(self, node, level: int):
+        encoded = self.encoder.encodeNode(node)
+        self.writeValue(compactNode(encoded) if self.compact else encoded, level)
+
+    def writeLink(self, link, level: int):
+        encoded = self.encoder.encodeLink(link)
+        self.writeValue(renameKeys(encoded, COMPACT_LINK_KEYS) if self.compact else encoded, level)
+
+    def newline(self, level: int) -> str:
+        return "" if self.indent is None else "\n" + " " * (self.indent * level)
+
+    def writeValue(self, value, level: int):
+        text = json.dumps(value, indent=self.indent, separators=self.separators)
+        if self.indent is not None:
+            # json strings never contain raw newlines, so this only shifts the indentation
+            text = text.replace("\n", self.newline(level))
+        self.fp.write(text)
+
+    def writeObject(self, fields: list, level: int):
+        """Write a json object, values that are callables write themselves"""
+        self.fp.write("{")
+        for i, (key, value) in enumerate(fields):
+            if i > 0:
+                self.fp.write(self.separators[0])
+            self.fp.write(self.newline(level + 1) + json.dumps(key) + self.separators[1])
+            if callable(value):
+                value(level + 1)
+            else:
+                self.writeValue(value, level + 1)
+        self.fp.write(self.newline(level) + "}")
+
+    def writeArray(self, items, writeItem, level: int):
+        self.fp.write("[")
+        empty = True
+        for item in items:
+            if not empty:
+                self.fp.write(self.separators[0])
+            self.fp.write(self.newline(level + 1))
+            writeItem(item, level + 1)
+            empty = False
+        if not empty:
+            self.fp.write(self.newline(level))
+        self.fp.write("]")
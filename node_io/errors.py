@@ -5,3 +5,21 @@ class VersionError(RuntimeError):
         RuntimeError (object): message or object to print
     """
     pass
+
+
+class NodeGroupCycleError(RuntimeError):
+    """Error For Node Groups that contain themselves, directly or through other Node Groups
+
+    Args:
+        RuntimeError (object): message or object to print
+    """
+    pass
+
+
+class NodeFormatError(RuntimeError):
+    """Error For node tree files whose records do not have the shape of their file version
+
+    Args:
+        RuntimeError (object): message or object to print
+    """
+    pass
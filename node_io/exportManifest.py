@@ -0,0 +1,102 @@
+import hashlib
+import json
+import os
+from .encoder import NodeTreeEncoder
+
+# Remembers what was exported to a folder, so unchanged node trees are not written again.
+# This module does not import bpy, so it can also run outside of blender.
+
+MANIFEST_FILENAME = ".nodeio_manifest.json"
+MANIFEST_VERSION = 1
+
+
+def hashJson(jsonObject) -> str:
+    """structural hash of json primitives, independent of key order and formatting"""
+    text = json.dumps(jsonObject, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha1(text.encode("utf8")).hexdigest()
+
+
+class ExportManifest:
+    """Content hashes of the node trees exported to a folder
+
+    The hashes are computed from the serialized model, not from file bytes, so they only
+    change when the material, one of its node groups, or the output settings change.
+    """
+
+    def __init__(self, folder: str) -> None:
+        self.folder = folder
+        self.materials: dict[str, dict] = {}
+        self.groups: dict[str, str] = {}
+        self.modified = False
+        self.encoder = NodeTreeEncoder()
+
+    @classmethod
+    def load(cls, folder: str) -> "ExportManifest":
+        """Read the manifest of a folder. A missing or unreadable manifest gives an empty one"""
+        manifest = ExportManifest(folder)
+        try:
+            with open(manifest.getPath(), "r", encoding="utf8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return manifest
+        if data.get("version") != MANIFEST_VERSION:
+            return manifest
+        manifest.materials = data.get("materials", {})
+        manifest.groups = data.get("groups", {})
+        return manifest
+
+    def getPath(self) -> str:
+        return os.path.join(self.folder, MANIFEST_FILENAME)
+
+    def hashNodeTree(self, tree, groupHashes: dict, settings="") -> str:
+        """Hash a material tree together with its node group table
+
+        Args:
+            tree (NodeTree): the serialized material
+            groupHashes (dict[str, str]): hashes of groups already hashed during this export, updated in place
+            settings (str): output settings that change the written file, like the format or the textures of a pack
+        """
+        return self.hashDocument(self.encoder.encodeTree(tree), groupHashes, settings)
+
+    def hashDocument(self, document: dict, groupHashes: dict, settings="") -> str:
+        """Hash an encoded material tree, see hashNodeTree"""
+        tree = {key: document[key] for key in ("node_tree", "nodes", "links")}
+        hasher = hashlib.sha1(hashJson(tree).encode("utf8"))
+        for group in document["groups"]:
+            name = group["node_tree"]
+            if name not in groupHashes:
+                groupHashes[name] = hashJson(group)
+            hasher.update(groupHashes[name].encode("utf8"))
+        # files written by an older format version are written again
+        hasher.update(f"{document['file_version']}/{settings}".encode("utf8"))
+        return hasher.hexdigest()
+
+    def isUnchanged(self, filename: str, contentHash: str) -> bool:
+        """check if the file was written with the same content and still exists"""
+        entry = self.materials.get(filename)
+        if entry is None or entry["hash"] != contentHash:
+            return False
+        return os.path.isfile(os.path.join(self.folder, filename))
+
+    def record(self, filename: str, contentHash: str, tree, groupHashes: dict):
+        """Remember the hash of a written material and of its node groups"""
+        entry = {"hash": contentHash, "groups": [group.name for group in tree.subtrees]}
+        if self.materials.get(filename) != entry:
+            self.materials[filename] = entry
+            self.modified = True
+        for group in tree.subtrees:
+            if self.groups.get(group.name) != groupHashes[group.name]:
+                self.groups[group.name] = groupHashes[group.name]
+                self.modified = True
+
+    def save(self):
+        """Write the manifest, only if anything was recorded since it was loaded"""
+        if not self.modified:
+            return
+        with open(self.getPath(), "w", encoding="utf8") as f:
+            json.dump({
+                "version": MANIFEST_VERSION,
+                "materials": self.materials,
+                "groups": self.groups,
+            }, f, indent=2, sort_keys=True)
+        self.modified = False
@@ -1,6 +1,8 @@
+import fnmatch
 import itertools
 import json
 from queue import SimpleQueue
+import tempfile
 import uuid
 import bpy
 import os
@@ -9,6 +11,13 @@ from bpy_extras.io_utils import ExportHelper
 from bpy.props import *
 from dataclasses import dataclass
 from .nodeTree import NodeTree
+from .nodeFile import writeNodeTree, writeDocument, countTreeNodes
+from .encoder import NodeTreeEncoder
+from .bundle import writeBundle, BUNDLE_EXTENSION
+from .exportManifest import ExportManifest
+from .textures import exportTextures, packTextures
+from .nodePack import writePack, hashTextures, PACK_EXTENSION
+from .profiling import PhaseTimer
 
 
 @dataclass
@@ -34,15 +43,103 @@ class ExportMaterialNode(bpy.types.Operator):
     #     default=True,
     # )
 
-    export_all_materials: BoolProperty(
-        name="Export all Materials",
-        description="Enabled: Export all materials on this Object\nDisabled: Export active Material on this Object",
+    export_scope: EnumProperty(
+        name="Export",
+        description="Which materials to export",
+        items=[
+            ("ACTIVE", "Active Material", "Export the active material on this Object"),
+            ("OBJECT", "Object Materials", "Export all materials on this Object"),
+            ("SELECTED", "Selected Objects", "Export all materials on the selected Objects"),
+            ("FILE", "All Materials in File", "Export every material in the blend file"),
+        ],
+        default="OBJECT"
+    )
+
+    material_filter: StringProperty(
+        name="Filter",
+        description="Only export materials whose name matches this pattern, for example 'Wood*'. "
+                    "Used when exporting all materials in the file",
+        default=""
+    )
+
+    file_format: EnumProperty(
+        name="Format",
+        description="How the node tree files are written",
+        items=[
+            ("PRETTY", "Pretty", "Indented json, easy to read and diff"),
+            ("COMPACT", "Compact", "Json without indentation and with short keys. "
+                                   "Smaller and faster to read, but harder to diff"),
+            ("COLUMNAR", "Columnar", "Json tables of nodes, sockets and links that share one table of strings. "
+                                     "Much smaller than compact and the fastest json to read"),
+            ("BINARY", "Binary", "Packed binary container, the smallest files, most of all with compression. "
+                                 "Reads about as fast as pretty json, columnar reads faster"),
+            ("PACK", "Pack", "Zip archive of the node tree in the columnar layout and the textures it uses. "
+                             "Can be imported on other machines without copying the textures"),
+        ],
+        default="PRETTY"
+    )
+
+    bundle: BoolProperty(
+        name="Bundle",
+        description="Write all exported materials into one bundle file, that stores node groups shared "
+                    "between them once. Any of the materials can be imported from it on their own",
+        default=False
+    )
+
+    bundle_name: StringProperty(
+        name="Bundle Name",
+        description="Name of the bundle file",
+        default="Bundle"
+    )
+
+    compression: EnumProperty(
+        name="Compression",
+        description="Compression of the binary format and of bundles",
+        items=[
+            ("NONE", "None", "Do not compress"),
+            ("ZLIB", "zlib", "Fast compression"),
+            ("LZMA", "lzma", "Smallest files, slower to write"),
+        ],
+        default="ZLIB"
+    )
+
+    sparse: BoolProperty(
+        name="Skip Default Values",
+        description="Leave out socket values and node properties that are still at their defaults. "
+                    "Files get much smaller and import faster, missing values are imported as defaults",
+        default=False
+    )
+
+    skip_unchanged: BoolProperty(
+        name="Skip Unchanged",
+        description="Do not write node trees that have not changed since the last export to this folder",
         default=True
     )
 
+    export_textures: BoolProperty(
+        name="Export Textures",
+        description="Write the images used by the exported materials to a textures folder next to the node trees",
+        default=False
+    )
+
+    texture_workers: IntProperty(
+        name="Texture Threads",
+        description="Number of threads that hash and write textures",
+        default=4,
+        min=1,
+        max=32
+    )
+
+    timing_trace: StringProperty(
+        name="Timing Trace",
+        description="Write the time spent in each phase of the export to this json file. Leave empty to skip",
+        subtype='FILE_PATH',
+        default=""
+    )
+
     @classmethod
     def poll(cls, context):
-        return context.active_object is not None
+        return context.active_object is not None or len(bpy.data.materials) > 0
 
     def invoke(self, context, event):
         return bpy.context.window_manager.invoke_props_dialog(self)
@@ -51,20 +148,104 @@ class ExportMaterialNode(bpy.types.Operator):
 
     def execute(self, context):
         print("exporting Nodes")
-
-        exportJobs = gather_node_trees(
-            context.object,
-            self.export_all_materials
-        )
-
-        for exportjob in exportJobs:
-            save_node_graph_to_file(
-                exportjob.nodetree,
-                bpy.path.abspath(self.nodes_path),
-                exportjob.name
-            )
+        timer = PhaseTimer(trace=bool(self.timing_trace))
+
+        with timer.phase("serialize"):
+            if self.export_scope == "FILE":
+                exportJobs = gather_file_node_trees(self.material_filter, self.sparse)
+            elif self.export_scope == "SELECTED":
+                exportJobs = gather_selected_node_trees(context.selected_objects, self.sparse)
+            elif context.object is None:
+                self.report({"ERROR"}, "No active Object to export materials from")
+                return {'CANCELLED'}
+            else:
+                exportJobs = gather_node_trees(
+                    context.object,
+                    self.export_scope == "OBJECT",
+                    self.sparse
+                )
+            timer.count("materials", len(exportJobs))
+
+        output_folder = bpy.path.abspath(self.nodes_path)
+        if self.bundle:
+            message = self.writeBundle(output_folder, exportJobs, timer)
+        else:
+            message = self.writeFiles(output_folder, exportJobs, timer)
+
+        if self.export_textures:
+            with timer.phase("textures"):
+                materials = [bpy.data.materials[exportjob.name] for exportjob in exportJobs]
+                texturesWritten, texturesSkipped = exportTextures(
+                    materials,
+                    os.path.join(output_folder, "textures"),
+                    self.texture_workers
+                )
+                timer.count("textures", texturesWritten)
+            message += f", {texturesWritten} textures written, {texturesSkipped} unchanged"
+
+        if self.timing_trace:
+            timer.writeTrace(bpy.path.abspath(self.timing_trace))
+        self.report({"INFO"}, f"{message} in {timer.summary()}")
         return {'FINISHED'}
 
+    def writeBundle(self, output_folder, exportJobs: list[ExportJob], timer: PhaseTimer) -> str:
+        """write all materials into one bundle file, see bundle.writeBundle"""
+        filepath = os.path.join(output_folder, f"{self.bundle_name}{BUNDLE_EXTENSION}")
+        with timer.phase("write"):
+            if not os.path.exists(output_folder):
+                os.makedirs(output_folder)
+            groupCount = writeBundle(filepath, [exportjob.nodetree for exportjob in exportJobs], self.compression)
+            timer.count("files")
+        return f"Exported {len(exportJobs)} materials and {groupCount} node groups to {filepath}"
+
+    def writeFiles(self, output_folder, exportJobs: list[ExportJob], timer: PhaseTimer) -> str:
+        """write a file per material, leaving out the ones that did not change since the last export"""
+        manifest = ExportManifest.load(output_folder)
+        settings = self.file_format + (f"/{self.compression}" if self.file_format == "BINARY" else "")
+        if self.sparse:
+            settings += "/sparse"
+        encoder = NodeTreeEncoder()
+        groupHashes = {}
+        written = []
+        skipped = 0
+
+        if not os.path.exists(output_folder):
+            os.makedirs(output_folder)
+        with tempfile.TemporaryDirectory() as renderDir:
+            for exportjob in exportJobs:
+                extension = PACK_EXTENSION if self.file_format == "PACK" else self.filename_ext_nodetree
+                filename = f"{exportjob.name}{extension}"
+                filepath = os.path.join(output_folder, filename)
+                fileSettings = settings
+                if self.file_format == "PACK":
+                    # a pack holds the textures, so a changed texture changes the file
+                    with timer.phase("textures"):
+                        textures = packTextures(bpy.data.materials[exportjob.name], renderDir)
+                    with timer.phase("hash"):
+                        fileSettings += "/" + hashTextures(textures)
+                # each tree is encoded once, for its hash, and that document is written
+                with timer.phase("encode"):
+                    document = encoder.encodeTree(exportjob.nodetree)
+                with timer.phase("hash"):
+                    contentHash = manifest.hashDocument(document, groupHashes, fileSettings)
+                if self.skip_unchanged and manifest.isUnchanged(filename, contentHash):
+                    skipped += 1
+                    continue
+                written.append((filename, contentHash, exportjob.nodetree))
+                with timer.phase("write"):
+                    if self.file_format == "PACK":
+                        writePack(filepath, document, textures)
+                    else:
+                        writeDocument(filepath, document, self.file_format, self.compression)
+                    timer.count("files")
+                    timer.count("nodes", countTreeNodes(exportjob.nodetree))
+
+        with timer.phase("manifest"):
+            for filename, contentHash, nodetree in written:
+                manifest.record(filename, contentHash, nodetree, groupHashes)
+            manifest.save()
+        return f"Exported {len(written)} materials to {output_folder}, skipped {skipped} unchanged"
+
 
 def getNodeGroupsInMaterial(material: bpy.types.Material) -> list[bpy.types.NodeGroup]:
     # gather node groups,nested
@@ -88,61 +269,90 @@ def getNodeGroupsInMaterial(material: bpy.types.Material) -> list[bpy.types.Node
     return discoveredNodeGroups
 
 
-def exportImagesInMaterialSlot(object: bpy.types.Object, materialSlot, exportDir):
-    material = object.material_slots[materialSlot].material
-
-    for node in material.node_tree.nodes:
-        if node.type == "TEX_IMAGE":
-            image = node.image
-            if image is not None:
-                newImagePath = os.path.join(exportDir, image.name)
-            image.save_render(newImagePath)
-
-
-def gather_node_trees(object: bpy.types.Object, do_all_materials=False) -> list[ExportJob]:
+def gather_node_trees(object: bpy.types.Object, do_all_materials=False, sparse=False) -> list[ExportJob]:
     """ gather all the node trees either from the objects active material, or all object materials"""
     materials_to_check = []
-    materialJobs = []
-    nodeGroupJobs = []
 
     if do_all_materials:
         for slot in object.material_slots:
             materials_to_check.append(slot.material)
-        materials_to_check = list(set(materials_to_check))
     else:
         materials_to_check.append(object.active_material)
 
-    for material in materials_to_check:
-        mj = ExportJob(material.name, NodeTree.serialize_bpy_NodeTree(material.node_tree, material.name), "material")
-        if mj.name not in [i.name for i in materialJobs]:
-            materialJobs.append(mj)
+    return gather_material_node_trees(materials_to_check, sparse)
+
+
+def gather_selected_node_trees(objects: list[bpy.types.Object], sparse=False) -> list[ExportJob]:
+    """ gather the node trees of all materials on these objects, each material once"""
+    materials_to_check = []
+    for object in objects:
+        for slot in object.material_slots:
+            materials_to_check.append(slot.material)
+
+    return gather_material_node_trees(materials_to_check, sparse)
+
+
+def gather_file_node_trees(name_filter="", sparse=False) -> list[ExportJob]:
+    """ gather the node trees of all materials in the blend file
+
+    Args:
+        name_filter (str): fnmatch pattern the material names have to match, empty to export all
+        sparse (bool): leave out values that are still at their defaults
+    """
+    materials_to_check = []
+    for material in bpy.data.materials:
+        if name_filter and not fnmatch.fnmatchcase(material.name, name_filter):
+            continue
+        materials_to_check.append(material)
+
+    return gather_material_node_trees(materials_to_check, sparse)
+
+
+def gather_material_node_trees(materials: list[bpy.types.Material], sparse=False) -> list[ExportJob]:
+    """ serialize the node trees of these materials
+
+    Node groups shared between the materials are serialized only once.
+    Empty slots, duplicates and materials without nodes are skipped.
+    """
+    materialJobs = []
+    exported = set()
+    groupCache = {}
+
+    for material in materials:
+        if material is None or material.name in exported:
+            continue
+        if not material.use_nodes or material.node_tree is None:
+            continue
+        exported.add(material.name)
+        nodetree = NodeTree.serialize_bpy_NodeTree(material.node_tree, material.name, groupCache, sparse)
+        materialJobs.append(ExportJob(material.name, nodetree, "material"))
 
     return materialJobs
 
 
-def save_node_graph_to_file(material_data, output_folder, mat_name):
+def save_node_graph_to_file(material_data, output_folder, mat_name, file_format="PRETTY", compression="NONE"):
     # Create the output folder for the material, if it doesn't exist
     material_folder = f'{output_folder}'
     if not os.path.exists(material_folder):
         os.makedirs(material_folder)
 
     # Save the data to a file
-    save_data_to_file(f'{material_folder}\\{mat_name}.nodetree', material_data)
+    save_data_to_file(os.path.join(material_folder, f'{mat_name}.nodetree'), material_data, file_format, compression)
 
 
-def save_subgraph_to_file(material_data, output_folder, mat_name):
+def save_subgraph_to_file(material_data, output_folder, mat_name, file_format="PRETTY", compression="NONE"):
     # Create the output folder for the material, if it doesn't exist
     material_folder = f'{output_folder}'
     if not os.path.exists(material_folder):
         os.makedirs(material_folder)
 
     # Save the data to a file
-    save_data_to_file(f'{material_folder}\\{mat_name}.subtree', material_data)
+    save_data_to_file(os.path.join(material_folder, f'{mat_name}.subtree'), material_data, file_format, compression)
 
 
-def save_data_to_file(filepath, data):
-    with open(rf'{filepath}', 'w') as f:
-        json.dump(data, f, indent=2, default=lambda o: o.toJson())
+def save_data_to_file(filepath, data, file_format="PRETTY", compression="NONE"):
+    """ write the node tree to the file in one of the formats of nodeFile.FILE_FORMATS"""
+    writeNodeTree(rf'{filepath}', data, file_format, compression)
 
 
 def register():
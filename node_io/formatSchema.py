@@ -0,0 +1,212 @@
+from .errors import NodeFormatError
+
+# What the records of each version of our Node Tree Format must hold, checked once when a file is parsed.
+# This module does not import bpy, so it can also run outside of blender.
+
+# json types of record fields, None allows a missing or null value
+STRING = (str,)
+OPTIONAL_STRING = (str, type(None))
+NUMBER = (int, float)
+OPTIONAL_INT = (int, type(None))
+LIST = (list,)
+# socket values are json primitives, or lists of numbers for colors and vectors
+SOCKET_VALUE = (str, int, float, bool, list, type(None))
+
+
+class FormatSchema:
+    """The fields of the node, socket and link records of one file version"""
+
+    def __init__(self, version: tuple, nodeFields: dict, socketFields: dict, linkFields: dict) -> None:
+        self.version = version
+        # pairs of field name and allowed types, tuples are the fastest to walk for every record
+        self.nodeFields = tuple(nodeFields.items())
+        self.socketFields = tuple(socketFields.items())
+        self.linkFields = tuple(linkFields.items())
+
+    # the locations of errors are only formatted when a record is malformed, checks run for every socket
+
+    def checkTree(self, record, index: int = None):
+        """check a material tree, or the entry at index of the node group table"""
+        problem = recordProblem(record, TREE_FIELDS)
+        if problem is not None:
+            where = "The node tree" if index is None else f"Node group {index}"
+            raise NodeFormatError(f"{where}: {problem}")
+
+    def checkNode(self, record, tree: str, index: int):
+        """check a node record, the location is checked when it is packed, see Node.fromJson"""
+        problem = recordProblem(record, self.nodeFields)
+        if problem is None and type(record.get("data", {})) is not dict:
+            problem = "data is not an object"
+        if problem is not None:
+            raise NodeFormatError(f"{describeNode(record, tree, index)}: {problem}")
+
+    def checkSocket(self, record, node: dict, tree: str, index: int, side: str, socketIndex: int):
+        """check a socket record, lists of numbers are checked when they are packed, see loadSockets"""
+        problem = recordProblem(record, self.socketFields)
+        if problem is None and type(record.get("value")) not in SOCKET_VALUE:
+            problem = f"value is a {type(record['value']).__name__}"
+        if problem is not None:
+            raise NodeFormatError(f"{describeNode(node, tree, index)}, {side} {socketIndex}: {problem}")
+
+    def checkLink(self, record, tree: str, index: int):
+        problem = recordProblem(record, self.linkFields)
+        if problem is not None:
+            raise NodeFormatError(f"Link {index} of '{tree}': {problem}")
+
+
+def describeNode(record, tree: str, index: int) -> str:
+    name = record.get("name") if type(record) is dict else None
+    return f"Node {index} '{name}' of '{tree}'" if name else f"Node {index} of '{tree}'"
+
+
+def recordProblem(record, fields) -> str:
+    """what is wrong with a record: not an object, a missing field or a value of the wrong type. None if nothing
+
+    Args:
+        fields (tuple | dict): pairs of field name and allowed types
+    """
+    if type(record) is not dict:
+        return f"expected an object, found {type(record).__name__}"
+    if type(fields) is dict:
+        fields = fields.items()
+    for key, types in fields:
+        value = record.get(key)
+        if type(value) not in types:
+            if value is None:
+                return f"missing '{key}'"
+            return f"'{key}' is a {type(value).__name__}"
+    return None
+
+
+def guessSocketType(value) -> str:
+    """the socket type of a record from before socket types were stored, from its value
+
+    Args:
+        value: the value as read, or packed into an array
+    """
+    if isinstance(value, str) or value is None:
+        return "NodeSocketShader"
+    if type(value) in NUMBER:
+        return "NodeSocketFloat"
+    if hasattr(value, "__len__"):
+        return "NodeSocketVector" if len(value) <= 3 else "NodeSocketColor"
+    return None
+
+
+TREE_FIELDS = {"node_tree": STRING, "nodes": LIST, "links": LIST}
+NODE_FIELDS = {"name": STRING, "type": STRING, "location": LIST, "inputs": LIST, "outputs": LIST}
+LINK_FIELDS = {"from_node": STRING, "from_socket": STRING, "to_node": STRING, "to_socket": STRING}
+IDENTIFIED_SOCKET_FIELDS = {"name": OPTIONAL_STRING, "type": STRING, "identifier": OPTIONAL_STRING}
+INDEXED_LINK_FIELDS = {**LINK_FIELDS, "from_socket_index": OPTIONAL_INT, "to_socket_index": OPTIONAL_INT}
+
+SCHEMAS = [
+    # 0.0.1: files from before the version was stored, socket types may be missing
+    FormatSchema((0, 0, 1), NODE_FIELDS, {"name": OPTIONAL_STRING, "type": OPTIONAL_STRING}, LINK_FIELDS),
+    # 0.1.0: node group table, socket identifiers and link socket indices
+    FormatSchema((0, 1, 0), NODE_FIELDS, IDENTIFIED_SOCKET_FIELDS, INDEXED_LINK_FIELDS),
+    # 0.2.0: the compact layout with short keys, its records are the same once expanded
+    FormatSchema((0, 2, 0), NODE_FIELDS, IDENTIFIED_SOCKET_FIELDS, INDEXED_LINK_FIELDS),
+    # 0.3.0: the columnar layout, checked by checkColumnarTree, the other layouts are unchanged
+    FormatSchema((0, 3, 0), NODE_FIELDS, IDENTIFIED_SOCKET_FIELDS, INDEXED_LINK_FIELDS),
+]
+
+
+def getSchema(version: tuple) -> FormatSchema:
+    """the schema of the newest format version that is not newer than the file version"""
+    for schema in reversed(SCHEMAS):
+        if schema.version <= version:
+            return schema
+    return SCHEMAS[0]
+
+
+COLUMNAR_COLUMNS = {
+    "nodes": ["name", "type", "location", "inputs", "outputs", "data"],
+    "sockets": ["type", "name", "identifier", "value"],
+    "links": ["from_node", "from_socket", "to_node", "to_socket", "from_socket_index", "to_socket_index"],
+}
+
+
+def checkColumnarTree(table, strings: list, index: int = None):
+    """Check that the columns of a tree of the columnar layout fit together
+
+    The columns must have matching lengths, and indices must point into the string table and the node columns.
+    """
+    where = "The node tree" if index is None else f"Node group {index}"
+    if type(table) is not dict or type(table.get("node_tree")) is not int:
+        raise NodeFormatError(f"{where}: missing 'node_tree'")
+    for tableName, columns in COLUMNAR_COLUMNS.items():
+        problem = recordProblem(table.get(tableName), {column: LIST for column in columns})
+        if problem is not None:
+            raise NodeFormatError(f"{where}, {tableName}: {problem}")
+
+    nodes, sockets, links = table["nodes"], table["sockets"], table["links"]
+    nodeCount = len(nodes["name"])
+    socketCount = len(sockets["type"])
+    problem = None
+    if any(len(nodes[column]) != nodeCount for column in ("type", "inputs", "outputs", "data")):
+        problem = "the node columns differ in length"
+    elif len(nodes["location"]) != nodeCount * 2:
+        problem = "the location column does not hold two values for each node"
+    elif any(len(sockets[column]) != socketCount for column in COLUMNAR_COLUMNS["sockets"]):
+        problem = "the socket columns differ in length"
+    elif not all(type(count) is int and count >= 0 for count in nodes["inputs"] + nodes["outputs"]):
+        problem = "a socket count is not a whole number"
+    elif not all(type(value) in NUMBER for value in nodes["location"]):
+        problem = "the location column holds a value that is not a number"
+    elif sum(nodes["inputs"]) + sum(nodes["outputs"]) != socketCount:
+        problem = "the socket counts of the nodes do not add up to the socket columns"
+    elif any(len(links[column]) != len(links["from_node"]) for column in COLUMNAR_COLUMNS["links"]):
+        problem = "the link columns differ in length"
+    elif not indicesInRange(links["from_node"] + links["to_node"], nodeCount):
+        problem = "a link points to a node that does not exist"
+    elif not all(type(i) in OPTIONAL_INT for i in links["from_socket_index"] + links["to_socket_index"]):
+        problem = "a link socket index is not a whole number"
+    elif not indicesInRange([table["node_tree"]] + nodes["name"] + nodes["type"] + links["from_socket"]
+                            + links["to_socket"], len(strings)):
+        problem = "a string index is outside of the string table"
+    elif not indicesInRange([i for column in ("type", "name", "identifier") for i in sockets[column] if i is not None],
+                            len(strings)):
+        problem = "a socket string index is outside of the string table"
+    elif None in sockets["type"]:
+        problem = "a socket has no type"
+    if problem is not None:
+        raise NodeFormatError(f"{where}: {problem}")
+
+    # the same checks as the records of the other layouts get, see FormatSchema.checkNode and checkSocket
+    if not (all(type(data) is dict for data in nodes["data"])
+            and all(type(value) in SOCKET_VALUE and (type(value) is not list or isNumberList(value))
+                    for value in sockets["value"])):
+        raise NodeFormatError(findColumnarValueProblem(table, strings))
+
+
+def findColumnarValueProblem(table: dict, strings: list) -> str:
+    """the location of the first node data or socket value of a columnar tree with the wrong type, and what is wrong"""
+    nodes, values = table["nodes"], table["sockets"]["value"]
+    tree = strings[table["node_tree"]]
+    socketIndex = 0
+    for index, (name, data) in enumerate(zip(nodes["name"], nodes["data"])):
+        where = describeNode({"name": strings[name]}, tree, index)
+        if type(data) is not dict:
+            return f"{where}: data is not an object"
+        for side, count in (("input", nodes["inputs"][index]), ("output", nodes["outputs"][index])):
+            for sideIndex in range(count):
+                value = values[socketIndex]
+                socketIndex += 1
+                if type(value) not in SOCKET_VALUE:
+                    return f"{where}, {side} {sideIndex}: value is a {type(value).__name__}"
+                if type(value) is list and not isNumberList(value):
+                    return f"{where}, {side} {sideIndex}: value is not a list of numbers"
+    return None
+
+
+def isNumberList(value: list) -> bool:
+    """check if a list can be packed into an array of doubles, see nodeSocket.packValue"""
+    return all(type(v) in NUMBER or type(v) is bool for v in value)
+
+
+def indicesInRange(indices: list, count: int) -> bool:
+    if len(indices) == 0:
+        return True
+    if not all(type(i) is int for i in indices):
+        return False
+    return min(indices) >= 0 and max(indices) < count
@@ -0,0 +1,45 @@
+from concurrent.futures import ThreadPoolExecutor
+import os
+import bpy
+
+
+class ImageCache:
+    """Loads the images referenced by an imported file, each distinct path once
+
+    Checking which files exist runs on a pool of threads, loading the images
+    into blender happens on this thread.
+    """
+
+    def __init__(self) -> None:
+        self.images: dict[str, bpy.types.Image] = {}
+        # paths that could not be found or loaded
+        self.missing: list[str] = []
+
+    def preload(self, paths, workers=8):
+        """Load the images of these paths that are not cached yet
+
+        Args:
+            paths (iterable[str]): image paths as stored in the file, None or empty entries are ignored
+            workers (int): number of threads that check if the files exist
+        """
+        newPaths = [path for path in dict.fromkeys(paths) if path and path not in self.images and path not in self.missing]
+        if len(newPaths) == 0:
+            return
+
+        absolutePaths = [bpy.path.abspath(path) for path in newPaths]
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(absolutePaths)))) as executor:
+            found = list(executor.map(os.path.isfile, absolutePaths))
+
+        for path, absolutePath, exists in zip(newPaths, absolutePaths, found):
+            if not exists:
+                self.missing.append(path)
+                continue
+            try:
+                # find image in blend file or load from path if not found
+                self.images[path] = bpy.data.images.load(absolutePath, check_existing=True)
+            except RuntimeError:
+                self.missing.append(path)
+
+    def get(self, path: str) -> bpy.types.Image:
+        """the loaded image of a path, or None if it is missing"""
+        return self.images.get(path)
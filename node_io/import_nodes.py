@@ -1,14 +1,27 @@
 import json
+import time
 from queue import SimpleQueue
 from typing import Tuple
 import bpy
 import os
 from .node import Node
 from .nodelink import NodeLink
-from .nodeTree import NodeTree
+from .nodeTree import NodeTree, ImportContext, commitStagedImport, rollbackStagedImport
+from .errors import NodeGroupCycleError, NodeFormatError
+from .nodeFile import READ_ERRORS, readDocument, readDocuments
+from .bundle import BundleReader
+from .nodePack import PACK_EXTENSION
+from .imageCache import ImageCache
+from .profiling import PhaseTimer
 
 from bpy_extras.io_utils import ImportHelper
-from bpy.props import StringProperty, BoolProperty, CollectionProperty
+from bpy.props import StringProperty, BoolProperty, IntProperty, CollectionProperty
+
+# how long a background import may block blender on each timer tick
+CHUNK_SECONDS = 0.02
+
+# files that are imported when a folder is chosen
+NODE_FILE_EXTENSIONS = (".nodetree", PACK_EXTENSION)
 
 
 class ImporttMaterialNodes(bpy.types.Operator, ImportHelper):
@@ -18,7 +31,7 @@ class ImporttMaterialNodes(bpy.types.Operator, ImportHelper):
     bl_options = {'REGISTER', 'UNDO'}
 
     filter_glob: StringProperty(
-        default='*.nodetree',
+        default='*.nodetree;*.nodepack',
         options={'HIDDEN'}
     )
     # some_boolean: BoolProperty(
@@ -27,7 +40,53 @@ class ImporttMaterialNodes(bpy.types.Operator, ImportHelper):
     #     default=True,
     # )
 
-    directory = StringProperty(subtype='DIR_PATH')
+    files: CollectionProperty(
+        type=bpy.types.OperatorFileListElement,
+        options={'HIDDEN', 'SKIP_SAVE'}
+    )
+
+    directory: StringProperty(
+        subtype='DIR_PATH',
+        options={'HIDDEN', 'SKIP_SAVE'}
+    )
+
+    reuse_existing_groups: BoolProperty(
+        name="Keep Existing Node Groups",
+        description="Use node groups that already exist in the blend file instead of replacing them "
+                    "with the groups from the file. Groups that are kept are not read from the file",
+        default=False,
+    )
+
+    update_existing: BoolProperty(
+        name="Update Existing Material",
+        description="Change only what differs from the existing material and its node groups, instead of "
+                    "replacing them. Nodes, links and values that are not in the file are removed",
+        default=False,
+    )
+
+    background_import: BoolProperty(
+        name="Import in Background",
+        description="Build the material a few nodes at a time, so blender stays responsive during large "
+                    "imports. Press Esc to cancel, nothing is changed until the import is complete. "
+                    "Only used when a single file is imported",
+        default=False,
+    )
+
+    read_workers: IntProperty(
+        name="Read Threads",
+        description="Number of threads that read and decompress the files when several files are imported. "
+                    "Parsing the files does not run in parallel, only one thread parses at a time",
+        default=4,
+        min=1,
+        max=32
+    )
+
+    timing_trace: StringProperty(
+        name="Timing Trace",
+        description="Write the time spent in each phase of the import to this json file. Leave empty to skip",
+        subtype='FILE_PATH',
+        default="",
+    )
 
     @classmethod
     def poll(cls, context):
@@ -35,42 +94,323 @@ class ImporttMaterialNodes(bpy.types.Operator, ImportHelper):
 
     def execute(self, context):
         object = context.object
-        node_tree, material, report = importNodeTree(self.filepath)
+        timer = PhaseTimer(trace=bool(self.timing_trace))
+        filepaths = self.getFilepaths()
+        if len(filepaths) != 1:
+            return self.importFiles(filepaths, timer)
+        if self.background_import and not self.update_existing:
+            return self.startBackgroundImport(context, filepaths[0], timer)
+        # filepath may be a folder that holds this one file
+        node_tree, material, report = importNodeTree(
+            filepaths[0], self.reuse_existing_groups, timer, self.update_existing)
+        self.finishTiming(timer)
+        self.report(report[0], report[1])
+        return {'FINISHED'}
+
+    def getFilepaths(self) -> list[str]:
+        """the files selected in the file browser, or the node tree files of the chosen folder"""
+        names = [file.name for file in self.files if file.name]
+        if len(names) > 0:
+            return [os.path.join(self.directory, name) for name in names]
+        if os.path.isdir(self.filepath):
+            return sorted(
+                os.path.join(self.filepath, name) for name in os.listdir(self.filepath)
+                if name.endswith(NODE_FILE_EXTENSIONS)
+            )
+        return [self.filepath]
+
+    def importFiles(self, filepaths: list[str], timer: PhaseTimer):
+        """import several files in this one operator run, so they are a single undo step"""
+        if len(filepaths) == 0:
+            self.report({"WARNING"}, "No node tree files selected")
+            return {'CANCELLED'}
+        results, images = importNodeTrees(
+            filepaths, self.reuse_existing_groups, timer, self.update_existing, self.read_workers)
+        self.finishTiming(timer)
+
+        failed = []
+        for filepath, material, message in results:
+            if material is None:
+                self.report({"ERROR"}, f"{os.path.basename(filepath)}: {message}")
+                failed.append(filepath)
+
+        message = f"Imported {len(results) - len(failed)} of {len(results)} files in {timer.summary()}"
+        if len(failed) > 0:
+            shown = ", ".join(os.path.basename(path) for path in failed[:3])
+            more = f" and {len(failed) - 3} more" if len(failed) > 3 else ""
+            self.report({"WARNING"}, f"{message}, failed: {shown}{more}")
+        elif len(images.missing) > 0:
+            shown = ", ".join(os.path.basename(path) for path in images.missing[:3])
+            more = f" and {len(images.missing) - 3} more" if len(images.missing) > 3 else ""
+            self.report({"WARNING"}, f"{message}, {len(images.missing)} images not found: {shown}{more}")
+        else:
+            self.report({"INFO"}, message)
+        return {'FINISHED'} if len(failed) < len(results) else {'CANCELLED'}
+
+    def finishTiming(self, timer: PhaseTimer):
+        """write the timing trace, if one was asked for. The operator report holds the summary"""
+        if self.timing_trace:
+            timer.writeTrace(bpy.path.abspath(self.timing_trace))
+
+    def startBackgroundImport(self, context, filepath, timer: PhaseTimer):
+        """parse the file, then build the material from timer events in modal"""
+        try:
+            node_tree = parse_node_file(filepath, lazy=self.reuse_existing_groups, timer=timer)
+        except READ_ERRORS as e:
+            self.report({"ERROR"}, str(e))
+            return {'CANCELLED'}
+
+        self._node_tree = node_tree
+        self._import = ImportContext(timer=timer)
+        self._steps = node_tree.createMaterialSteps(self.reuse_existing_groups, self._import)
+        try:
+            _, self._total = next(self._steps)
+        except (NodeGroupCycleError, NodeFormatError) as e:
+            self.report({"ERROR"}, str(e))
+            return {'CANCELLED'}
+
+        wm = context.window_manager
+        wm.progress_begin(0, max(self._total, 1))
+        self._timer = wm.event_timer_add(0.01, window=context.window)
+        wm.modal_handler_add(self)
+        return {'RUNNING_MODAL'}
+
+    def modal(self, context, event):
+        if event.type == 'ESC':
+            rollbackStagedImport(self._import)
+            self.endBackgroundImport(context)
+            self.report({"INFO"}, f"Import of {self._node_tree.name} cancelled")
+            return {'CANCELLED'}
+        if event.type != 'TIMER':
+            return {'PASS_THROUGH'}
+
+        deadline = time.perf_counter() + CHUNK_SECONDS
+        done = 0
+        try:
+            while time.perf_counter() < deadline:
+                done, _ = next(self._steps)
+        except StopIteration:
+            commitStagedImport(self._import)
+            self.endBackgroundImport(context)
+            self.finishTiming(self._import.timer)
+            report = importReport(self._node_tree, self._import)
+            self.report(report[0], report[1])
+            return {'FINISHED'}
+        except NodeFormatError as e:
+            # a node group that is read lazily was malformed
+            rollbackStagedImport(self._import)
+            self.endBackgroundImport(context)
+            self.report({"ERROR"}, str(e))
+            return {'CANCELLED'}
+        except Exception:
+            # leave the blend file as it was, the error still shows up in the console
+            rollbackStagedImport(self._import)
+            self.endBackgroundImport(context)
+            raise
+        context.window_manager.progress_update(done)
+        return {'RUNNING_MODAL'}
+
+    def endBackgroundImport(self, context):
+        wm = context.window_manager
+        wm.event_timer_remove(self._timer)
+        wm.progress_end()
+
+
+class ImportNodeBundle(bpy.types.Operator, ImportHelper):
+    """Import materials from a bundle file, only the chosen materials and their node groups are read"""
+    bl_idname = "smitty.import_node_bundle"
+    bl_label = "Import Materials from Bundle"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    filename_ext = ".nodebundle"
+
+    filter_glob: StringProperty(
+        default='*.nodebundle',
+        options={'HIDDEN'}
+    )
+
+    material_filter: StringProperty(
+        name="Filter",
+        description="Only import materials whose name matches this pattern, for example 'Wood*'. "
+                    "Leave empty to import all materials of the bundle",
+        default=""
+    )
+
+    reuse_existing_groups: BoolProperty(
+        name="Keep Existing Node Groups",
+        description="Use node groups that already exist in the blend file instead of replacing them "
+                    "with the groups from the bundle. Groups that are kept are not read from the bundle",
+        default=False,
+    )
+
+    def execute(self, context):
+        timer = PhaseTimer()
+        try:
+            with timer.phase("read"):
+                reader = BundleReader(self.filepath)
+                names = reader.materialNames(self.material_filter)
+                existingGroups = {group.name for group in bpy.data.node_groups} if self.reuse_existing_groups else set()
+                materials, groups = reader.read(names, existingGroups)
+            with timer.phase("parse"):
+                node_trees = NodeTree.fromBundle(reader.fileVersion, materials, groups)
+        except READ_ERRORS as e:
+            self.report({"ERROR"}, f"Selected File is Invalid: {e}")
+            return {'CANCELLED'}
+        if len(node_trees) == 0:
+            self.report({"WARNING"}, "No material of the bundle matches the filter")
+            return {'CANCELLED'}
+
+        # one context for all materials, so the groups they share are built once
+        importContext = ImportContext(timer=timer)
+        try:
+            for node_tree in node_trees:
+                node_tree.createMaterial(self.reuse_existing_groups, importContext)
+        except (NodeGroupCycleError, NodeFormatError) as e:
+            self.report({"ERROR"}, str(e))
+            return {'CANCELLED'}
+
+        report = importReport(node_trees[0], importContext)
+        if report[0] == {"INFO"}:
+            report = ({"INFO"}, f"Imported {len(node_trees)} materials and "
+                                f"{len(importContext.nodeGroups)} node groups in {timer.summary()}")
         self.report(report[0], report[1])
         return {'FINISHED'}
 
 
-def importNodeTree(filepath):
-    report = ({"INFO"}, "No Errors")
+def importNodeTree(filepath, reuseExistingGroups=False, timer: PhaseTimer = None, updateExisting=False):
+    """Import a node tree file as a material
+
+    Args:
+        timer (PhaseTimer, optional): receives the time spent in each phase of the import
+        updateExisting (bool): update the existing material in place, see NodeTree.updateMaterial
+
+    Returns:
+        tuple: the parsed NodeTree, the material and the report for the operator
+    """
     node_tree: NodeTree = None
     newMaterial: bpy.data.materials
     materialname, _ = os.path.splitext(os.path.basename(filepath))
+    if timer is None:
+        timer = PhaseTimer()
 
     # parse the material file
-    node_tree = parse_node_file(filepath)
+    try:
+        node_tree = parse_node_file(filepath, lazy=reuseExistingGroups, timer=timer)
+    except READ_ERRORS as e:
+        report = ({"ERROR"}, f"Selected File is Invalid: {e}")
+        return (None, None, report)
 
-    # invalid file error
-    if node_tree is None:
-        report = ({"ERROR"}, "Selected File is Invalid")
+    # create material
+    context = ImportContext(timer=timer)
+    try:
+        if updateExisting:
+            newMaterial = node_tree.updateMaterial(reuseExistingGroups, context)
+        else:
+            newMaterial = node_tree.createMaterial(reuseExistingGroups, context)
+    except (NodeGroupCycleError, NodeFormatError) as e:
+        # groups that are read lazily are only checked when they are built
+        report = ({"ERROR"}, str(e))
         return (node_tree, None, report)
 
-    # create material
-    newMaterial = node_tree.createMaterial()
-    return node_tree, newMaterial, report
+    return node_tree, newMaterial, importReport(node_tree, context)
+
+
+def importNodeTrees(filepaths: list[str], reuseExistingGroups=False, timer: PhaseTimer = None,
+                    updateExisting=False, workers=4):
+    """Import several node tree files as materials
+
+    The files are read on a pool of threads, then built one after the other on this thread.
+    A file that can not be read or built does not stop the others.
+
+    Args:
+        timer (PhaseTimer, optional): receives the time spent in each phase of the import
+        updateExisting (bool): update the existing materials in place, see NodeTree.updateMaterial
+        workers (int): number of threads that read the files
+
+    Returns:
+        tuple: for each file its path, the material or None, and a message,
+            and the ImageCache shared by all files
+    """
+    if timer is None:
+        timer = PhaseTimer()
+    images = ImageCache()
+    with timer.phase("read"):
+        documents = readDocuments(filepaths, workers)
+        timer.count("files", len(filepaths))
+
+    results = []
+    for filepath, document in zip(filepaths, documents):
+        if isinstance(document, Exception):
+            results.append((filepath, None, f"Selected File is Invalid: {document}"))
+            continue
+        try:
+            node_tree = parse_node_document(document, filepath, lazy=reuseExistingGroups, timer=timer)
+        except READ_ERRORS as e:
+            results.append((filepath, None, f"Selected File is Invalid: {e}"))
+            continue
+
+        # images are loaded once for all files, node groups are built for each file like separate imports do
+        context = ImportContext(images=images, timer=timer)
+        try:
+            if updateExisting:
+                material = node_tree.updateMaterial(reuseExistingGroups, context)
+            else:
+                material = node_tree.createMaterial(reuseExistingGroups, context)
+        except (NodeGroupCycleError, NodeFormatError) as e:
+            results.append((filepath, None, str(e)))
+            continue
+        results.append((filepath, material, f"Imported {node_tree.name}"))
+    return results, images
+
+
+def importReport(node_tree: NodeTree, context: ImportContext):
+    """the operator report of a finished import, with one summary for all images that could not be found"""
+    missing = context.images.missing
+    if len(missing) > 0:
+        shown = ", ".join(os.path.basename(path) for path in missing[:3])
+        more = f" and {len(missing) - 3} more" if len(missing) > 3 else ""
+        return ({"WARNING"}, f"{len(missing)} images not found: {shown}{more}")
+    return ({"INFO"}, f"Imported {node_tree.name} in {context.timer.summary()}")
+
+
+def parse_node_file(filepath, lazy=False, timer: PhaseTimer = None) -> "NodeTree":
+    """ Read a node tree File of any format and Parse into a NodeTree object
+
+    Args:
+        lazy (bool): only materialize the node groups when they are used, see LazyNodeTree
+        timer (PhaseTimer, optional): receives the time spent reading and parsing
+
+    Raises:
+        NodeFormatError: when the file is malformed
+        VersionError: when the file was written by a newer version
+    """
+    if timer is None:
+        timer = PhaseTimer()
+    with timer.phase("read"):
+        jsonstring = readDocument(filepath)
+    return parse_node_document(jsonstring, filepath, lazy, timer)
+
 
+def parse_node_document(document: dict, filepath, lazy=False, timer: PhaseTimer = None) -> "NodeTree":
+    """ Parse a Node Tree document read from a file into a NodeTree object, named after the file
 
-def parse_node_file(filepath) -> "NodeTree":
-    """ Read Json File and Parse into a NodeTree object"""
-    with open(filepath, "r", encoding="utf8") as jsonfile:
-        jsonstring = json.load(jsonfile)
-        nodetree = NodeTree.de_Serialize_Json(jsonstring)
-        nodetree.name = os.path.splitext(os.path.basename(filepath))[0]
-        return nodetree
+    Raises:
+        NodeFormatError: when the document is malformed
+        VersionError: when the document was written by a newer version
+    """
+    if timer is None:
+        timer = PhaseTimer()
+    with timer.phase("parse"):
+        nodetree = NodeTree.de_Serialize_Json(document, lazy)
+    nodetree.name = os.path.splitext(os.path.basename(filepath))[0]
+    return nodetree
 
 
 def register():
     bpy.utils.register_class(ImporttMaterialNodes)
+    bpy.utils.register_class(ImportNodeBundle)
 
 
 def unregister():
+    bpy.utils.unregister_class(ImportNodeBundle)
     bpy.utils.unregister_class(ImporttMaterialNodes)
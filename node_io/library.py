@@ -0,0 +1,73 @@
+import os
+import bpy
+from bpy.props import IntProperty
+from .catalog import LibraryCatalog
+from .import_nodes import importNodeTree
+
+
+def fillCatalogCollection(scene: bpy.types.Scene, catalog: LibraryCatalog):
+    """Show the catalog entries in the library panel"""
+    scene.nodeio_catalog.clear()
+    for filename, entry in catalog.search():
+        item = scene.nodeio_catalog.add()
+        item.name = entry["name"]
+        item.filename = filename
+        item.node_count = entry["nodeCount"]
+        item.node_types = ", ".join(nodeType.replace("ShaderNode", "") for nodeType in entry["nodeTypes"])
+        item.groups = ", ".join(entry["groups"])
+        item.image_count = len(entry["images"])
+    scene.nodeio_catalog_index = min(scene.nodeio_catalog_index, max(0, len(scene.nodeio_catalog) - 1))
+
+
+class RefreshLibraryCatalog(bpy.types.Operator):
+    """Index new and changed node tree files of the library folder"""
+    bl_idname = "smitty.refresh_library_catalog"
+    bl_label = "Refresh Library"
+
+    def execute(self, context):
+        folder = bpy.path.abspath(context.scene.nodeio_library_path)
+        if not os.path.isdir(folder):
+            self.report({"ERROR"}, f"Library folder {folder} does not exist")
+            return {'CANCELLED'}
+
+        catalog = LibraryCatalog.load(folder)
+        indexed, removed = catalog.update()
+        catalog.save()
+        fillCatalogCollection(context.scene, catalog)
+        self.report({"INFO"}, f"{len(catalog.entries)} materials in library, {indexed} indexed, {removed} removed")
+        return {'FINISHED'}
+
+
+class ImportLibraryMaterial(bpy.types.Operator):
+    """Import the material selected in the library"""
+    bl_idname = "smitty.import_library_material"
+    bl_label = "Import Material"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    index: IntProperty(default=-1, options={'HIDDEN'})
+
+    @classmethod
+    def poll(cls, context):
+        return len(context.scene.nodeio_catalog) > 0
+
+    def execute(self, context):
+        scene = context.scene
+        index = self.index if self.index >= 0 else scene.nodeio_catalog_index
+        if index >= len(scene.nodeio_catalog):
+            return {'CANCELLED'}
+
+        item = scene.nodeio_catalog[index]
+        filepath = os.path.join(bpy.path.abspath(scene.nodeio_library_path), item.filename)
+        node_tree, material, report = importNodeTree(filepath)
+        self.report(report[0], report[1])
+        return {'FINISHED'} if material is not None else {'CANCELLED'}
+
+
+def register():
+    bpy.utils.register_class(RefreshLibraryCatalog)
+    bpy.utils.register_class(ImportLibraryMaterial)
+
+
+def unregister():
+    bpy.utils.unregister_class(ImportLibraryMaterial)
+    bpy.utils.unregister_class(RefreshLibraryCatalog)
@@ -1,38 +1,117 @@
+from array import array
 from dataclasses import dataclass
-import json
 import bpy
 from bpy.props import BoolProperty
 from bpy.types import Scene
 from mathutils import Vector
-from .nodeSocket import NodeSocket
+from .nodeSocket import NodeSocket, internString, packValue
+from .nodeSchema import NodeSchema
+from .formatSchema import FormatSchema, SCHEMAS, SOCKET_VALUE, describeNode, guessSocketType
+from .errors import NodeFormatError
 
 
-def getTypeFromBpyObject(object):
-    """
-    Get the Type as a string by checking the name between single quotes
-    """
-    quoteIndices = []
-    type_datavalue = str(type(object))
-    for i, c in enumerate(type_datavalue):
-        if c == "'":
-            quoteIndices.append(i)
-    return type_datavalue[quoteIndices[0] + 1:quoteIndices[1]]
+# converters for the default values of the socket types we store as json primitives
+SOCKET_VALUE_CONVERTERS = {
+    "VALUE": float,
+    "RGBA": list,
+    "VECTOR": list,
+}
+
+
+# node types whose sockets depend on the node group or the tree, not on the type
+DYNAMIC_SOCKET_TYPES = ["ShaderNodeGroup", "NodeGroupInput", "NodeGroupOutput"]
+
+# properties the importer sets on its own, so they are stored even when they are at their default
+KEPT_PROPERTIES = ["label"]
 
 
-def is_jsonable(x):
+def readSocketValue(socket):
+    """the default value of a blender socket as we store it"""
+    convert = SOCKET_VALUE_CONVERTERS.get(socket.type)
+    if convert is None:
+        return str(getattr(socket, "default_value", None))
+    return convert(socket.default_value)
+
+
+def serializeSockets(sockets, defaults: dict = None) -> list[NodeSocket]:
+    """Read the name, type and default value of blender sockets into NodeSockets
+
+    Args:
+        defaults (dict, optional): values by socket identifier, sockets still at these values are left out
     """
-    check if object is json serializable
-    from: https://stackoverflow.com/a/53112659
+    newSockets = []
+    for socket in sockets:
+        if socket.bl_idname == "NodeSocketVirtual":
+            # skip grey socket that is used for GUI Purposes only
+            continue
+        value = readSocketValue(socket)
+        if defaults is not None and socket.identifier in defaults and defaults[socket.identifier] == value:
+            continue
+        newSockets.append(NodeSocket(socket.bl_idname, socket.name, value, socket.identifier))
+    return newSockets
+
+
+class NodeDefaults:
+    """The socket values and properties of a freshly added node of one type
+
+    Read once from a scratch node for each bl_idname, sparse exports leave out
+    everything that still has these values, and imports treat missing values as these.
     """
-    try:
-        json.dumps(x)
-        return True
-    except (TypeError, OverflowError):
-        return False
+    _cache: dict = {}
+
+    def __init__(self, inputs: dict, outputs: dict, data: dict) -> None:
+        # socket values by identifier
+        self.inputs = inputs
+        self.outputs = outputs
+        # properties as NodeSchema.extract reads them
+        self.data = data
+
+    @classmethod
+    def get(cls, bl_idname: str) -> "NodeDefaults":
+        """Get the cached defaults for a node type, reading them on first use"""
+        key = (bl_idname, bpy.app.version)
+        defaults = cls._cache.get(key)
+        if defaults is None:
+            defaults = cls.fromScratchNode(bl_idname)
+            cls._cache[key] = defaults
+        return defaults
+
+    @classmethod
+    def fromScratchNode(cls, bl_idname: str) -> "NodeDefaults":
+        """Add a node of the type to a temporary node group and read its values
+
+        Types that can not be added get empty defaults, so nothing of them is left out.
+        """
+        if bl_idname in DYNAMIC_SOCKET_TYPES:
+            return NodeDefaults({}, {}, {})
+        scratchTree = bpy.data.node_groups.new(".NodeIO Defaults", "ShaderNodeTree")
+        try:
+            scratchNode = scratchTree.nodes.new(bl_idname)
+            # image nodes only store their image, see Node.setDataFromBpy
+            if bl_idname == "ShaderNodeTexImage":
+                data = {}
+            else:
+                data = NodeSchema.get(scratchNode).extract(scratchNode)
+            return NodeDefaults(
+                {socket.identifier: readSocketValue(socket) for socket in scratchNode.inputs},
+                {socket.identifier: readSocketValue(socket) for socket in scratchNode.outputs},
+                data,
+            )
+        except RuntimeError:
+            return NodeDefaults({}, {}, {})
+        finally:
+            bpy.data.node_groups.remove(scratchTree)
+
+    @classmethod
+    def clearCache(cls):
+        cls._cache.clear()
 
 
 class Node:
-    def __init__(self, shaderNode: bpy.types.ShaderNode = None) -> None:
+    # slots: parsed libraries hold millions of nodes
+    __slots__ = ("name", "type", "location", "inputs", "outputs", "data")
+
+    def __init__(self, shaderNode: bpy.types.ShaderNode = None, sparse=False) -> None:
         self.name = ""
         self.type = ""
         self.location = [0.0, 0.0]
@@ -43,50 +122,26 @@ class Node:
         if shaderNode is None:
             return
 
-        self.setDataFromBpy(shaderNode)
+        self.setDataFromBpy(shaderNode, sparse)
 
-    def setDataFromBpy(self, shaderNode: bpy.types.ShaderNode):
+    def setDataFromBpy(self, shaderNode: bpy.types.ShaderNode, sparse=False):
+        """Read a blender node
+
+        Args:
+            sparse (bool): leave out socket values and properties that are still at the defaults of the node type
+        """
         self.name = shaderNode.name
         self.type = shaderNode.bl_idname
         self.location = shaderNode.location
-        self.inputs = []
-        self.outputs = []
         self.data = {}
 
-        # input attributes
-        for socket in shaderNode.inputs:
-            sockettype = socket.type
-            if socket.bl_idname == "NodeSocketVirtual":
-                # skip grey socket that is used for GUI Purposes only
-                continue
-            elif sockettype == "VALUE":
-                value = float(socket.default_value)
-            elif sockettype == "RGBA":
-                value = list(socket.default_value)
-            elif sockettype == "VECTOR":
-                value = list(socket.default_value)
-            else:
-                value = str(getattr(socket, "default_value", None))
-            x = NodeSocket(socket.bl_idname, socket.name, value)
-            self.inputs.append(x)
-
-        # output attributes
-        for socket in shaderNode.outputs:
-            sockettype = socket.type
-
-            if socket.bl_idname == "NodeSocketVirtual":
-                # skip grey socket that is used for GUI Purposes only
-                continue
-            elif sockettype == "VALUE":
-                value = float(socket.default_value)
-            elif sockettype == "RGBA":
-                value = list(socket.default_value)
-            elif sockettype == "VECTOR":
-                value = list(socket.default_value)
-            else:
-                value = str(getattr(socket, "default_value", None))
-            x = NodeSocket(socket.bl_idname, socket.name, value)
-            self.outputs.append(x)
+        defaults = NodeDefaults.get(shaderNode.bl_idname) if sparse else None
+        if defaults is None:
+            self.inputs = serializeSockets(shaderNode.inputs)
+            self.outputs = serializeSockets(shaderNode.outputs)
+        else:
+            self.inputs = serializeSockets(shaderNode.inputs, defaults.inputs)
+            self.outputs = serializeSockets(shaderNode.outputs, defaults.outputs)
 
         # data
         # Image paths for image Nodes
@@ -103,28 +158,10 @@ class Node:
 
         # other Nodes data
         else:
-            for dataKey in dir(shaderNode):
-                # data to be skipped
-                datavalue = getattr(shaderNode, dataKey)
-                string_datavalue = str(getattr(shaderNode, dataKey))
-                type_datavalue = getTypeFromBpyObject(datavalue)
-
-                if dataKey in ["image", "node_tree", "inputs", "outputs"]:
-                    continue
-                if dataKey.startswith("__"):
-                    continue
-                if string_datavalue.startswith("<bpy_struct"):
-                    continue
-
-                # format the data correctly
-
-                # store colors and vectors as float arrays
-                if type_datavalue in ["Color", "Vector"]:
-                    datavalue = list(datavalue)
-
-                if not is_jsonable(datavalue):
-                    continue
-                self.data[dataKey] = datavalue
+            self.data = NodeSchema.get(shaderNode).extract(shaderNode)
+            if defaults is not None:
+                self.data = {key: value for key, value in self.data.items()
+                             if key in KEPT_PROPERTIES or key not in defaults.data or defaults.data[key] != value}
 
     def setData(self, id, data, shadernode: bpy.types.ShaderNode):
         if shadernode is None:
@@ -147,7 +184,7 @@ class Node:
         return {
             "name": self.getName(),
             "type": self.getType(),
-            "location": self.getLocation()[:],
+            "location": list(self.getLocation()),
             "inputs": self.getInputs(),
             "outputs": self.getOutputs(),
             "data": self.getData(),
@@ -163,85 +200,73 @@ class Node:
         return self.location
 
     def getInputs(self) -> list[NodeSocket]:
-        newSockets = []
-        for socket in self.inputs:
-
-            if isinstance(socket, NodeSocket):
-                newSockets.append(socket)
-            else:
-                value = socket["value"]
-                if isinstance(value, str):
-                    type = "NodeSocketShader"
-                elif isinstance(value, float):
-                    type = "NodeSocketFloat"
-                elif isinstance(value, list):
-                    type = "NodeSocketVector" if len(value) <= 3 else "NodeSocketColor"
-
-                if value in [None, "None", "null"]:
-                    if len(next(iter(socket.keys()))) == 0:
-                        continue
-
-                socket = NodeSocket(type, socket.name, value)
-                newSockets.append(socket)
-
-        # remove sockets without plausible values
-        finalSockets = []
-        for socket in newSockets.copy():
-            if socket.value not in [None, "None", "null"]:
-                finalSockets.append(socket)
-
-        return newSockets
+        return self.inputs
 
     def getOutputs(self) -> list[NodeSocket]:
-        newSockets = []
-        for output in self.outputs:
-
-            if isinstance(output, NodeSocket):
-                newSockets.append(output)
-            else:
-                # make Node Socket
-
-                # determine name
-                name = output.name
-                # determine value
-                value = list(output.values())[0]
-
-                # determine type
-                if isinstance(value, str):
-                    type = next(iter(output.keys()))
-                elif isinstance(value, float):
-                    type = "NodeSocketFloat"
-                elif isinstance(value, list):
-                    type = "NodeSocketVector" if len(value) <= 3 else "NodeSocketColor"
-
-                # skip invalid sockets
-                if value in [None, "None", "null"]:
-                    continue
-                newSockets.append(NodeSocket(type, name, value))
-
-        return newSockets
+        return self.outputs
 
     def getData(self):
         return self.data
 
     @classmethod
-    def fromJson(cls, jsonObject: dict):
+    def fromJson(cls, jsonObject: dict, schema: FormatSchema = None, tree="", index=0):
+        """Check and read a node record, its sockets get their final types and values here
+
+        Args:
+            schema (FormatSchema, optional): of the file version, the newest version if not given
+            tree (str): name of the tree the node is in, for errors
+            index (int): index of the node in its tree, for errors
+
+        Raises:
+            NodeFormatError: when the record or one of its sockets is malformed
+        """
+        if schema is None:
+            schema = SCHEMAS[-1]
+        schema.checkNode(jsonObject, tree, index)
         node = Node()
-        for key, value in jsonObject.items():
-            if key in ["inputs", "outputs"]:
-                for socket in value:
-                    newSocket = NodeSocket.fromJson(socket)
-                    if key == "inputs":
-                        node.inputs.append(newSocket)
-                    else:
-                        node.outputs.append(newSocket)
-            else:
-                setattr(node, key, value)
+        node.name = internString(jsonObject["name"])
+        node.type = internString(jsonObject["type"])
+        try:
+            node.location = array("d", jsonObject["location"])
+        except TypeError:
+            raise NodeFormatError(f"{describeNode(jsonObject, tree, index)}: location is not a list of numbers")
+        node.inputs = loadSockets(jsonObject["inputs"], jsonObject, schema, tree, index, "input")
+        node.outputs = loadSockets(jsonObject["outputs"], jsonObject, schema, tree, index, "output")
+        node.data = jsonObject.get("data", {})
         return node
 
     @classmethod
-    def fromJsonList(cls, list):
-        return [Node.fromJson(i) for i in list]
+    def fromJsonList(cls, list, schema: FormatSchema = None, tree=""):
+        return [Node.fromJson(record, schema, tree, index) for index, record in enumerate(list)]
+
+
+def loadSockets(records: list, node: dict, schema: FormatSchema, tree: str, index: int, side: str) -> list[NodeSocket]:
+    """Check and read the socket records of a node, guessing the types of files that did not store them"""
+    fields = schema.socketFields
+    sockets = []
+    for socketIndex, record in enumerate(records):
+        # the quick check runs for every socket, checkSocket only runs to describe what is wrong
+        valid = type(record) is dict and type(record.get("value")) in SOCKET_VALUE
+        if valid:
+            for key, types in fields:
+                if type(record.get(key)) not in types:
+                    valid = False
+                    break
+        if not valid:
+            schema.checkSocket(record, node, tree, index, side, socketIndex)
+
+        value = packValue(record.get("value"))
+        if type(value) is list:
+            # packValue keeps lists it can not store as numbers
+            raise NodeFormatError(f"{describeNode(node, tree, index)}, {side} {socketIndex}: value is not a list of numbers")
+        socketType = record.get("type")
+        if socketType is None:
+            socketType = guessSocketType(value)
+            if socketType is None:
+                raise NodeFormatError(f"{describeNode(node, tree, index)}, {side} {socketIndex}: unknown socket type")
+        sockets.append(NodeSocket(
+            internString(socketType), internString(record.get("name")), value, internString(record.get("identifier"))))
+    return sockets
 
 
 def register():
@@ -0,0 +1,108 @@
+from concurrent.futures import ThreadPoolExecutor
+import io
+import json
+import lzma
+import struct
+import zlib
+from . import binaryFormat
+from .nodePack import NodePack, isPack
+from .encoder import NodeTreeEncoder, NodeTreeWriter, compactDocument, columnarDocument
+
+# Reading and writing node tree files in any of our formats.
+# This module does not import bpy, so it can also run outside of blender.
+
+FILE_FORMATS = ["PRETTY", "COMPACT", "COLUMNAR", "BINARY"]
+
+# errors of reading a file that is not a node tree file, or is broken, NodeFormatError and VersionError included
+READ_ERRORS = (OSError, ValueError, KeyError, IndexError, TypeError, RuntimeError, struct.error, zlib.error, lzma.LZMAError)
+
+
+def readDocument(filepath) -> dict:
+    """Read a node tree file of any format into a Node Tree document, see NodeTree.de_Serialize_Json
+
+    Of a node pack only the node tree is read, and the textures it uses are extracted next to the pack.
+    """
+    with open(filepath, "rb") as f:
+        data = f.read(4)
+        if isPack(data):
+            return NodePack(filepath).readDocument()
+        return parseDocument(data + f.read())
+
+
+def parseDocument(data: bytes) -> dict:
+    """Parse the content of a node tree file of any format into a Node Tree document
+
+    The image paths of a node pack point at its members, its textures are not extracted.
+    """
+    if isPack(data):
+        return NodePack(io.BytesIO(data)).readDocument(extractTextures=False)
+    if binaryFormat.isBinary(data):
+        return binaryFormat.loads(data)
+    return json.loads(data)
+
+
+def readDocuments(filepaths: list[str], workers=4) -> list:
+    """Read several node tree files on a pool of threads
+
+    Only reading, decompressing and extracting textures release the GIL, so only they overlap
+    between files. Parsing json and decoding the binary format hold it, those run one file at a time
+    whichever thread they are on. Documents are not read in processes: unpickling a document sent
+    back costs about 60% of parsing its json, before starting the processes is paid.
+
+    Returns:
+        list: for each file its Node Tree document, or the error that kept it from being read
+    """
+    def read(filepath):
+        try:
+            return readDocument(filepath)
+        except READ_ERRORS as e:
+            return e
+
+    if workers <= 1 or len(filepaths) <= 1:
+        return [read(filepath) for filepath in filepaths]
+    with ThreadPoolExecutor(max_workers=min(workers, len(filepaths))) as executor:
+        return list(executor.map(read, filepaths))
+
+
+def writeNodeTree(filepath, tree, fileFormat="PRETTY", compression="NONE"):
+    """Write a NodeTree to a file
+
+    Args:
+        filepath (str): the file to write
+        tree (NodeTree): the tree to write
+        fileFormat (str): one of FILE_FORMATS
+        compression (str): compression of the binary format, one of "NONE", "ZLIB" or "LZMA"
+    """
+    if fileFormat == "BINARY":
+        data = binaryFormat.dumps(NodeTreeEncoder().encodeTree(tree), compression)
+        with open(filepath, "wb") as f:
+            f.write(data)
+    elif fileFormat == "COLUMNAR":
+        writeDocument(filepath, NodeTreeEncoder().encodeTree(tree), fileFormat)
+    else:
+        with open(filepath, "w") as f:
+            NodeTreeWriter(f, fileFormat == "COMPACT").write(tree)
+
+
+def writeDocument(filepath, document: dict, fileFormat="PRETTY", compression="NONE"):
+    """Write a Node Tree document, as made by NodeTreeEncoder.encodeTree, to a file
+
+    The file is the same as writeNodeTree writes for the tree of the document.
+    """
+    if fileFormat == "BINARY":
+        with open(filepath, "wb") as f:
+            f.write(binaryFormat.dumps(document, compression))
+    elif fileFormat == "COMPACT":
+        with open(filepath, "w") as f:
+            f.write(json.dumps(compactDocument(document), separators=(",", ":")))
+    elif fileFormat == "COLUMNAR":
+        with open(filepath, "w") as f:
+            f.write(json.dumps(columnarDocument(document), separators=(",", ":")))
+    else:
+        with open(filepath, "w") as f:
+            f.write(json.dumps(document, indent=2))
+
+
+def countTreeNodes(tree) -> int:
+    """number of nodes in a NodeTree, including its node group table"""
+    return len(tree.nodes) + sum(len(group.nodes) for group in tree.subtrees)
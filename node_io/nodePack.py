@@ -0,0 +1,191 @@
+import hashlib
+import json
+import os
+import shutil
+import zipfile
+import zlib
+from .encoder import columnarDocument
+from .errors import NodeFormatError, VersionError
+
+# Self contained archive of a node tree and the textures it uses
+#
+# A zip file, its central directory is the index of the members, so every member can be read on its own:
+#   index.json: pack version, the name of the tree member and the texture members
+#   <material>.nodetree: the Node Tree document in the columnar layout, image paths point at the texture members
+#   textures/<file>: the images, stored uncompressed since image files are compressed already
+#
+# This module does not import bpy, so it can also run outside of blender.
+
+PACK_EXTENSION = ".nodepack"
+PACK_VERSION = 1
+PACK_INDEX = "index.json"
+TEXTURE_FOLDER = "textures/"
+# suffix of the folder next to a pack that its textures are extracted to
+EXTRACT_SUFFIX = "_textures"
+
+COPY_BUFFER_SIZE = 1024 * 1024
+
+
+def isPack(data: bytes) -> bool:
+    """check if the start of a file is a zip archive"""
+    return data[:4] == b"PK\x03\x04"
+
+
+def fileCrc(filepath) -> int:
+    """the crc32 of a file, as the zip central directory stores it for each member"""
+    crc = 0
+    with open(filepath, "rb") as f:
+        for chunk in iter(lambda: f.read(COPY_BUFFER_SIZE), b""):
+            crc = zlib.crc32(chunk, crc)
+    return crc
+
+
+def hashTextures(textures: dict[str, str | bytes]) -> str:
+    """a hash of the textures of a pack, see writePack, from the crc32 and size of each like NodePack.contentHash"""
+    hasher = hashlib.sha1()
+    for path in sorted(textures):
+        texture = textures[path]
+        if type(texture) is bytes:
+            crc, size = zlib.crc32(texture), len(texture)
+        else:
+            crc, size = fileCrc(texture), os.path.getsize(texture)
+        hasher.update(f"{path}:{crc}:{size};".encode("utf8"))
+    return hasher.hexdigest()
+
+
+def documentImages(document: dict) -> list[dict]:
+    """the data of the image nodes in a Node Tree document and its node group table
+
+    Works on documents in the columnar layout too, their node data is not in the string table.
+    """
+    datas = []
+    for tree in [document] + document.get("groups", []):
+        if document.get("columnar", False):
+            nodeDatas = tree["nodes"]["data"]
+        else:
+            nodeDatas = [node.get("data") for node in tree["nodes"]]
+        for data in nodeDatas:
+            if type(data) is dict and type(data.get("image")) is str and data["image"]:
+                datas.append(data)
+    return datas
+
+
+def writePack(filepath, document: dict, textures: dict[str, str | bytes]):
+    """Write a Node Tree document and its textures into a pack
+
+    Args:
+        document (dict): as made by NodeTreeEncoder.encodeTree, its image paths are changed to the members
+        textures (dict[str, str | bytes]): image paths of the document, and the file or data of each image
+    """
+    members = {}
+    for path in textures:
+        filename = os.path.basename(path.replace("\\", "/")) or "image.png"
+        name, extension = os.path.splitext(filename)
+        member = TEXTURE_FOLDER + filename
+        number = 1
+        while member in members.values():
+            member = f"{TEXTURE_FOLDER}{name}.{number:03}{extension}"
+            number += 1
+        members[path] = member
+    for data in documentImages(document):
+        data["image"] = members.get(data["image"], data["image"])
+
+    treeMember = f"{document['node_tree']}.nodetree"
+    with zipfile.ZipFile(filepath, "w") as archive:
+        archive.writestr(PACK_INDEX, json.dumps({
+            "pack_version": PACK_VERSION,
+            "tree": treeMember,
+            "textures": sorted(members.values()),
+        }, indent=2))
+        archive.writestr(treeMember, json.dumps(columnarDocument(document), separators=(",", ":")),
+                         compress_type=zipfile.ZIP_DEFLATED)
+        for path, member in members.items():
+            texture = textures[path]
+            if type(texture) is bytes:
+                archive.writestr(member, texture)
+            else:
+                archive.write(texture, member)
+
+
+class NodePack:
+    """Reads the members of a pack, without unpacking the rest of it
+
+    Raises:
+        VersionError: when the pack was written by a newer version
+        NodeFormatError: when the file is not a pack
+    """
+
+    def __init__(self, filepath) -> None:
+        """
+        Args:
+            filepath (str): the pack, or a file object of it, whose textures can not be extracted
+        """
+        self.filepath = filepath
+        try:
+            with zipfile.ZipFile(filepath) as archive:
+                index = json.loads(archive.read(PACK_INDEX))
+        except (zipfile.BadZipFile, KeyError, ValueError) as e:
+            raise NodeFormatError(f"Not a node pack: {e}")
+        if type(index) is not dict or type(index.get("tree")) is not str:
+            raise NodeFormatError("The index of the node pack names no node tree")
+        if index.get("pack_version", PACK_VERSION) > PACK_VERSION:
+            raise VersionError(f"Pack version {index['pack_version']} is newer than the supported version {PACK_VERSION}")
+        self.index = index
+        self.textureFolder = os.path.splitext(filepath)[0] + EXTRACT_SUFFIX if type(filepath) is str else None
+
+    def readDocument(self, extractTextures=True) -> dict:
+        """Read the Node Tree document of the pack
+
+        Args:
+            extractTextures (bool): extract the textures the document uses, see extractTextures,
+                and point its image paths at them
+        """
+        with zipfile.ZipFile(self.filepath) as archive:
+            try:
+                document = json.loads(archive.read(self.index["tree"]))
+            except KeyError:
+                raise NodeFormatError(f"The node tree {self.index['tree']} is missing from the node pack")
+            except ValueError as e:
+                raise NodeFormatError(f"The node tree of the node pack is malformed: {e}")
+            if extractTextures:
+                try:
+                    self.extractTextures(archive, document)
+                except (KeyError, TypeError, AttributeError) as e:
+                    raise NodeFormatError(f"The node tree of the node pack is malformed: {e!r}")
+        return document
+
+    def contentHash(self) -> str:
+        """a hash of the members of the pack, from the crc32 and size in its central directory, no member is read"""
+        hasher = hashlib.sha1()
+        with zipfile.ZipFile(self.filepath) as archive:
+            for info in sorted(archive.infolist(), key=lambda info: info.filename):
+                hasher.update(f"{info.filename}:{info.CRC}:{info.file_size};".encode("utf8"))
+        return hasher.hexdigest()
+
+    def extractTextures(self, archive: zipfile.ZipFile, document: dict):
+        """Extract the textures used by a document to the folder next to the pack
+
+        Only the members of the document are read. Textures that were extracted before are kept
+        while their size and crc32 still match the member.
+        """
+        for data in documentImages(document):
+            path = self.extractTexture(archive, data["image"])
+            if path is not None:
+                data["image"] = path
+
+    def extractTexture(self, archive: zipfile.ZipFile, member: str) -> str:
+        """the path of an extracted texture member, or None if it is not in the pack"""
+        if not member.startswith(TEXTURE_FOLDER) or not os.path.basename(member):
+            return None
+        try:
+            info = archive.getinfo(member)
+        except KeyError:
+            return None
+        # only the file name, members must not write outside of the folder
+        target = os.path.join(self.textureFolder, os.path.basename(member))
+        if os.path.isfile(target) and os.path.getsize(target) == info.file_size and fileCrc(target) == info.CRC:
+            return target
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with archive.open(info) as source, open(target, "wb") as f:
+            shutil.copyfileobj(source, f, COPY_BUFFER_SIZE)
+        return target
@@ -0,0 +1,81 @@
+from operator import attrgetter
+import bpy
+
+# properties that are either stored elsewhere in our format or only describe the RNA struct itself
+SKIPPED_PROPERTIES = ["rna_type", "image", "node_tree", "inputs", "outputs"]
+
+# RNA property types that map directly onto json values
+SERIALIZABLE_TYPES = ["BOOLEAN", "INT", "FLOAT", "STRING", "ENUM"]
+
+
+def arrayToList(value):
+    """Convert a (possibly multi-dimensional) bpy_prop_array, Vector or Color to nested lists"""
+    return [arrayToList(v) if hasattr(v, "__len__") else v for v in value]
+
+
+class NodeSchema:
+    """The serializable properties of one node type
+
+    Worked out once from the RNA metadata of the first node of a type, and reused for
+    every later node with the same bl_idname, so exporting does not need to scan dir()
+    or probe values with a trial json encoding.
+    """
+    _cache: dict = {}
+
+    def __init__(self, bl_idname: str, identifiers: list[str], arrayIdentifiers: list[str]) -> None:
+        self.bl_idname = bl_idname
+        self.identifiers = identifiers
+        self.arrayIdentifiers = arrayIdentifiers
+
+        # attrgetter only returns a tuple when it is given more than one attribute
+        if len(identifiers) == 0:
+            self._getter = lambda shaderNode: ()
+        elif len(identifiers) == 1:
+            getter = attrgetter(identifiers[0])
+            self._getter = lambda shaderNode: (getter(shaderNode),)
+        else:
+            self._getter = attrgetter(*identifiers)
+
+    @classmethod
+    def get(cls, shaderNode: bpy.types.ShaderNode) -> "NodeSchema":
+        """Get the cached schema for the type of this node, building it on first use"""
+        key = (shaderNode.bl_idname, bpy.app.version)
+        schema = cls._cache.get(key)
+        if schema is None:
+            schema = cls.fromRna(shaderNode)
+            cls._cache[key] = schema
+        return schema
+
+    @classmethod
+    def fromRna(cls, shaderNode: bpy.types.ShaderNode) -> "NodeSchema":
+        """Build the schema of a node type from its RNA property definitions
+
+        Pointers, collections and read-only properties are skipped, as are enum flags,
+        which are python sets and cannot be stored as json.
+        """
+        identifiers = []
+        arrayIdentifiers = []
+        for prop in shaderNode.bl_rna.properties:
+            if prop.identifier in SKIPPED_PROPERTIES:
+                continue
+            if prop.type not in SERIALIZABLE_TYPES or prop.is_readonly:
+                continue
+            if prop.type == "ENUM" and prop.is_enum_flag:
+                continue
+
+            identifiers.append(prop.identifier)
+            if getattr(prop, "array_length", 0) > 0:
+                arrayIdentifiers.append(prop.identifier)
+
+        return NodeSchema(shaderNode.bl_idname, identifiers, arrayIdentifiers)
+
+    def extract(self, shaderNode: bpy.types.ShaderNode) -> dict:
+        """Read all serializable properties of the node into a json-ready dict"""
+        data = dict(zip(self.identifiers, self._getter(shaderNode)))
+        for identifier in self.arrayIdentifiers:
+            data[identifier] = arrayToList(data[identifier])
+        return data
+
+    @classmethod
+    def clearCache(cls):
+        cls._cache.clear()
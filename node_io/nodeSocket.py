@@ -1,33 +1,63 @@
+from array import array
 from dataclasses import dataclass
 import json
+import sys
 
 from mathutils import Vector
 
 
-@dataclass
+def internString(value):
+    """intern strings that repeat across a file, like types and socket names, so they are held once"""
+    return sys.intern(value) if type(value) is str else value
+
+
+def packValue(value):
+    """store lists of numbers, like colors and vectors, as arrays of doubles
+
+    Doubles keep the values exactly as they were read, so writing them again gives the same file.
+    """
+    if type(value) is list:
+        try:
+            return array("d", value)
+        except TypeError:
+            return value
+    return value
+
+
+# slots: parsed libraries hold millions of sockets
+@dataclass(slots=True)
 class NodeSocket:
     type: str
     name: str
     value: any
+    identifier: str = None
 
-    def __init__(self,type,name,value) -> None:
+    def __init__(self,type,name,value,identifier=None) -> None:
         self.type=type
         self.name=name
         self.value = None if value in["none","None","NONE","Null"] else value
+        self.identifier = identifier
 
     def toJson(self):
         return {
             "type": self.type,
             "name": self.name,
-            "value": self.value
+            "value": self.value.tolist() if type(self.value) is array else self.value,
+            "identifier": self.identifier
         }
 
     @classmethod
     def fromJson(cls, jsonString):
-        node = NodeSocket(None, None, None)
-        for key, value in jsonString.items():
-            setattr(node, key, value)
-        return node
+        return NodeSocket(
+            internString(jsonString.get("type")),
+            internString(jsonString.get("name")),
+            packValue(jsonString.get("value")),
+            internString(jsonString.get("identifier")),
+        )
+
+    @classmethod
+    def fromJsonList(cls, list):
+        return [NodeSocket.fromJson(i) for i in list]
 
     def getValue(self):
         if self.type == "NodeSocketColor":
@@ -1,11 +1,19 @@
+from array import array
 from queue import Queue
 import uuid
 import bpy
-from .node import Node
-from .nodelink import NodeLink
+from .node import Node, NodeDefaults
+from .nodeSocket import NodeSocket, packValue
+from .nodelink import NodeLink, getSocketIndices
 from .errors import *
-from dataclasses import dataclass
-VERSION = "0.0.1"
+from .encoder import NodeTreeEncoder, VERSION, expandCompactDocument, encodeValue
+from .formatSchema import FormatSchema, SCHEMAS, getSchema, checkColumnarTree
+from .imageCache import ImageCache
+from .profiling import PhaseTimer
+from dataclasses import dataclass, field
+
+# files written before the version was stored
+LEGACY_VERSION = "0.0.1"
 
 
 @dataclass
@@ -14,6 +22,21 @@ class Subtree:
     outputs: list[str]
 
 
+@dataclass
+class ImportContext:
+    """State shared by all steps of importing one file"""
+    # blender node groups built during this import, by name
+    nodeGroups: dict = field(default_factory=dict)
+    images: ImageCache = field(default_factory=ImageCache)
+    # image nodes and their image paths, bound once all nodes are created
+    pendingImages: list = field(default_factory=list)
+    timer: PhaseTimer = field(default_factory=PhaseTimer)
+    # datablocks built by createMaterialSteps: the name they replace, the datablock and its bpy.data collection
+    staged: list = field(default_factory=list)
+    # images loaded by this import that were not in the blend file before
+    stagedImages: list = field(default_factory=list)
+
+
 class NodeTree:
     def __init__(self) -> None:
         self.name: str = ""
@@ -22,46 +45,205 @@ class NodeTree:
         self.subtrees: list[NodeTree] = []
 
     @classmethod
-    def serialize_bpy_NodeTree(cls, node_tree: bpy.types.NodeTree, materialname=""):
-        """Serializes this Blender Node  tree (and nested nodeGroups) into our Node Tree Format"""
+    def serialize_bpy_NodeTree(cls, node_tree: bpy.types.NodeTree, materialname="", groupCache: dict = None, sparse=False):
+        """Serializes this Blender Node  tree (and nested nodeGroups) into our Node Tree Format
+
+        Every node group used in the tree, nested ones included, is serialized once into the
+        subtrees of the returned tree, which is the group table of the file.
+        Group nodes reference their entry by name.
+
+        Args:
+            node_tree (bpy.types.NodeTree): the node tree of a material
+            materialname (str): name of the new tree
+            groupCache (dict[str, NodeTree], optional): already serialized node groups by name.
+                pass the same dict for several materials to serialize shared groups only once
+            sparse (bool): leave out values that are still at their defaults, see NodeDefaults
+
+        Returns:
+            NodeTree: the serialized tree, with its node group table in subtrees
+        """
+        if groupCache is None:
+            groupCache = {}
+        newTree = NodeTree.serializeNodes(node_tree, materialname, sparse)
+        groups = {}
+        collectNodeGroups(node_tree, groupCache, groups, sparse)
+        newTree.subtrees = list(groups.values())
+        return newTree
+
+    @classmethod
+    def serializeNodes(cls, node_tree: bpy.types.NodeTree, name="", sparse=False):
+        """Serializes the nodes and links of a Blender Node tree, without looking into node groups"""
         newTree = NodeTree()
-        newTree.name = materialname
+        newTree.name = name
         for blenderNode in node_tree.nodes:
-            newTree.nodes.append(Node(blenderNode))
-            if blenderNode.bl_idname == "ShaderNodeGroup":
-                newTree.subtrees.append(
-                    NodeTree.serialize_bpy_NodeTree(
-                        blenderNode.node_tree,
-                        blenderNode.node_tree.name))
+            newTree.nodes.append(Node(blenderNode, sparse))
+        socketIndices = getSocketIndices(node_tree)
         for blenderLink in node_tree.links:
-            newTree.links.append(NodeLink(blenderLink))
-
+            newTree.links.append(NodeLink(blenderLink, socketIndices))
         return newTree
 
     @classmethod
-    def de_Serialize_Json(cls, jsonstring) -> "NodeTree":
+    def de_Serialize_Json(cls, jsonstring, lazy=False) -> "NodeTree":
         """deSerializes our Node Tree Format into a native Blender Node tree.
-        also deSerializes nested Node Groups into a native Blender Node Tree
+        also deSerializes the node group table into a list of Node trees
 
         Args:
             jsonstring (str): our Node Tree format as a json String
+            lazy (bool): keep the node group table entries as parsed records, see LazyNodeTree
+
+        Every record is checked against the schema of the file version while it is read,
+        so the Nodes and their sockets are final once this returns.
 
         Raises:
             VersionError: when the version from the json string is incompatible
+            NodeFormatError: when a record of the file is malformed
 
         Returns:
-            NodeTree (dict[NodeTree,list[NodeTree]) : a dict containing a materialNodeTree and a list of NodeGroupNodeTrees
+            NodeTree: the material Node tree, with the node group Node trees in subtrees
+        """
+        if type(jsonstring) is not dict:
+            raise NodeFormatError(f"The file holds a {type(jsonstring).__name__}, not a node tree")
+        version = checkFileVersion(jsonstring.get("file_version", LEGACY_VERSION))
+        if jsonstring.get("columnar", False):
+            return NodeTree.fromColumnarDocument(jsonstring, lazy)
+        if jsonstring.get("compact", False):
+            try:
+                jsonstring = expandCompactDocument(jsonstring)
+            except (KeyError, TypeError, AttributeError) as e:
+                raise NodeFormatError(f"The compact file is malformed: {e!r}")
+
+        schema = getSchema(version)
+        tmpNodeTree = NodeTree.fromJson(jsonstring, schema)
+        if "groups" in jsonstring:
+            groups = jsonstring["groups"]
+        else:
+            # before 0.1.0, every group node carried its own nested copy of the group
+            groups = flattenLegacySubtrees(jsonstring.get("subtrees", []))
+        if type(groups) is not list:
+            raise NodeFormatError("The node group table is not a list")
+        if lazy:
+            tmpNodeTree.subtrees = [LazyNodeTree(group, schema=schema, index=index) for index, group in enumerate(groups)]
+        else:
+            tmpNodeTree.subtrees = [NodeTree.fromJson(group, schema, index) for index, group in enumerate(groups)]
+        return tmpNodeTree
+
+    @classmethod
+    def fromBundle(cls, fileVersion: str, materials: list[tuple], groups: dict[str, dict], lazy=False) -> list["NodeTree"]:
+        """Read material records of a bundle, see bundle.BundleReader.read
+
+        Args:
+            fileVersion (str): of the bundle
+            materials (list[tuple[dict, list[str]]]): the material records and the names of the groups they use
+            groups (dict[str, dict]): the group records by name, groups that are missing here are left out
+            lazy (bool): keep the group records as they are until they are used, see LazyNodeTree
+
+        Each node group is read once, the materials that use it share the same subtree.
+
+        Raises:
+            VersionError: when the bundle was written by a newer version
+            NodeFormatError: when a record is malformed
+        """
+        schema = getSchema(checkFileVersion(fileVersion))
+        if lazy:
+            subtrees = {name: LazyNodeTree(group, schema=schema, index=index)
+                        for index, (name, group) in enumerate(groups.items())}
+        else:
+            subtrees = {name: NodeTree.fromJson(group, schema, index)
+                        for index, (name, group) in enumerate(groups.items())}
+
+        trees = []
+        for record, groupNames in materials:
+            tree = NodeTree.fromJson(record, schema)
+            # groups that were not read are expected to exist in the blend file already
+            tree.subtrees = [subtrees[name] for name in groupNames if name in subtrees]
+            trees.append(tree)
+        return trees
+
+    @classmethod
+    def fromJson(cls, jsonObject: dict, schema: FormatSchema = None, index: int = None) -> "NodeTree":
+        """Check and read the name, nodes and links of a tree or group table entry
+
+        Args:
+            schema (FormatSchema, optional): of the file version, the newest version if not given
+            index (int, optional): index of the entry in the node group table, for errors
+        """
+        if schema is None:
+            schema = SCHEMAS[-1]
+        schema.checkTree(jsonObject, index)
+        tmpNodeTree = NodeTree()
+        tmpNodeTree.name = jsonObject["node_tree"]
+        tmpNodeTree.nodes = Node.fromJsonList(jsonObject["nodes"], schema, tmpNodeTree.name)
+        tmpNodeTree.links = NodeLink.fromStringList(jsonObject["links"], schema, tmpNodeTree.name)
+        return tmpNodeTree
+
+    @classmethod
+    def fromColumnarDocument(cls, document: dict, lazy=False) -> "NodeTree":
+        """Read a file written in the columnar layout, see encoder.columnarDocument"""
+        strings = document.get("strings")
+        groups = document.get("groups")
+        if type(strings) is not list or type(groups) is not list:
+            raise NodeFormatError("The columnar file has no string table or node group table")
+        if not all(type(string) is str for string in strings):
+            raise NodeFormatError("The string table of the columnar file holds a value that is not a string")
+        tmpNodeTree = NodeTree.fromColumnar(document, strings)
+        if lazy:
+            tmpNodeTree.subtrees = [LazyNodeTree(group, strings, index=index) for index, group in enumerate(groups)]
+        else:
+            tmpNodeTree.subtrees = [NodeTree.fromColumnar(group, strings, index) for index, group in enumerate(groups)]
+        return tmpNodeTree
+
+    @classmethod
+    def fromColumnar(cls, table: dict, strings: list, index: int = None) -> "NodeTree":
+        """Check and read a tree or group table entry of the columnar layout
+
+        Nodes and sockets are built straight from the columns, strings are shared through the string table.
+
+        Args:
+            index (int, optional): index of the entry in the node group table, for errors
         """
+        checkColumnarTree(table, strings, index)
 
-        # if version2Tuple(jsonstring["file_version"]) < version2Tuple(VERSION):
-        #     raise VersionError
+        def lookup(column):
+            return [None if index is None else strings[index] for index in column]
 
+        socketColumns = table["sockets"]
+        sockets = [
+            NodeSocket(type, name, packValue(value), identifier)
+            for type, name, identifier, value in zip(
+                lookup(socketColumns["type"]), lookup(socketColumns["name"]),
+                lookup(socketColumns["identifier"]), socketColumns["value"])
+        ]
+
+        nodeColumns = table["nodes"]
+        names = lookup(nodeColumns["name"])
+        location = nodeColumns["location"]
         tmpNodeTree = NodeTree()
-        tmpNodeTree.nodes = Node.fromJsonList(jsonstring["nodes"])
-        tmpNodeTree.links = NodeLink.fromStringList(jsonstring["links"])
-        tmpNodeTree.name = jsonstring["node_tree"]
-        for subtree in jsonstring["subtrees"]:
-            tmpNodeTree.subtrees.append(NodeTree.de_Serialize_Json(subtree))
+        tmpNodeTree.name = strings[table["node_tree"]]
+        start = 0
+        for index, (name, type, inputCount, outputCount, data) in enumerate(zip(
+                names, lookup(nodeColumns["type"]), nodeColumns["inputs"], nodeColumns["outputs"], nodeColumns["data"])):
+            node = Node()
+            node.name = name
+            node.type = type
+            node.location = array("d", location[index * 2:index * 2 + 2])
+            node.inputs = sockets[start:start + inputCount]
+            node.outputs = sockets[start + inputCount:start + inputCount + outputCount]
+            node.data = data
+            start += inputCount + outputCount
+            tmpNodeTree.nodes.append(node)
+
+        linkColumns = table["links"]
+        for fromNode, fromSocket, toNode, toSocket, fromIndex, toIndex in zip(
+                linkColumns["from_node"], linkColumns["from_socket"], linkColumns["to_node"],
+                linkColumns["to_socket"], linkColumns["from_socket_index"], linkColumns["to_socket_index"]):
+            link = NodeLink()
+            link.from_node = names[fromNode]
+            link.from_socket = strings[fromSocket]
+            link.to_node = names[toNode]
+            link.to_socket = strings[toSocket]
+            link.from_socket_index = fromIndex
+            link.to_socket_index = toIndex
+            tmpNodeTree.links.append(link)
         return tmpNodeTree
 
     @classmethod
@@ -79,6 +261,16 @@ class NodeTree:
         """
         return [node for node in self.nodes if node.getType() == "ShaderNodeGroup"]
 
+    def getGroupDependencies(self) -> list[str]:
+        """returns the names of the node groups used directly by the group nodes in this tree
+        """
+        dependencies = []
+        for node in self.findNodeGroupsInTree_custom():
+            name = node.getData().get("subtree")
+            if name is not None and name not in dependencies:
+                dependencies.append(name)
+        return dependencies
+
     # def findNodeGroupsNested(self):
     #     if self.bl_idname == 'ShaderNodeTree':
     #         next = NodeTree.findNodeGroupsinBlenderNodeTree(self)
@@ -105,20 +297,38 @@ class NodeTree:
         # return allsubtrees
 
     def toJson(self):
-        return {
-            # "file_version": VERSION,
-            "node_tree": self.name,
-            "nodes": [n.toJson() for n in self.nodes],
-            "links": self.links,
-            "subtrees": [st.toJson() for st in self.subtrees]
-        }
-
-    def createMaterial(self):
+        return NodeTreeEncoder().encodeTree(self)
+
+    def materialize(self) -> "NodeTree":
+        return self
+
+    def createMaterial(self, reuseExistingGroups=False, context: ImportContext = None):
         """Create Material From this Node Tree
 
+        Args:
+            reuseExistingGroups (bool): keep node groups that already exist in the blend file,
+                instead of replacing them with the groups from this tree
+            context (ImportContext, optional): state of this import, afterwards
+                context.images.missing lists the images that could not be found
+
+        Raises:
+            NodeGroupCycleError: when the node groups of this tree contain themselves
+
         Returns:
             bpy.type.Material: the new or existing material
         """
+        if context is None:
+            context = ImportContext()
+        timer = context.timer
+
+        # check the node groups before touching any blender data
+        with timer.phase("sort groups"):
+            orderedGroups = sortNodeGroups(self.subtrees)
+            if reuseExistingGroups:
+                orderedGroups = self.findNodeGroupsToBuild(orderedGroups)
+            # groups shared with materials imported before with this context are already built
+            orderedGroups = [group for group in orderedGroups if group.name not in context.nodeGroups]
+
         # create new material
         suid = str(uuid.uuid4())
         newMaterial = bpy.data.materials.new(self.name + suid)
@@ -131,20 +341,158 @@ class NodeTree:
             bpy.data.materials.remove(bpy.data.materials[self.name])
         bpy.data.materials[self.name + suid].name = self.name
 
-        # import subTrees
-        for subtree in self.subtrees:
-            createNodeGroup(subtree)
+        # load every image used by this tree and its groups once
+        with timer.phase("images"):
+            context.images.preload(collectImagePaths([self] + orderedGroups))
+            timer.count("images", len(context.images.images))
+
+        # import subTrees, each one once and before the groups that use it
+        with timer.phase("groups"):
+            buildNodeGroups(orderedGroups, context)
 
         # load nodes and links
-        for node in self.nodes:
-            addNodeToTree(node, newMaterial.node_tree)
+        createdNodes = {}
+        with timer.phase("nodes"):
+            for node in self.nodes:
+                createdNodes[node.getName()] = addNodeToTree(node, newMaterial.node_tree, context)
 
         # make the links
-        for link in self.links:
-            addLinkToTree(link, newMaterial.node_tree)
+        with timer.phase("links"):
+            for link in self.links:
+                addLinkToTree(link, newMaterial.node_tree, createdNodes)
+            timer.count("links", len(self.links))
 
+        with timer.phase("images"):
+            bindImages(context)
         return newMaterial
 
+    def createMaterialSteps(self, reuseExistingGroups=False, context: ImportContext = None):
+        """Build this Node Tree a node or link at a time, for imports that must not block blender
+
+        Everything is built into new datablocks, existing materials and node groups are not
+        touched until commitStagedImport swaps the new ones in. rollbackStagedImport
+        removes them again instead.
+
+        Args:
+            reuseExistingGroups (bool): keep node groups that already exist in the blend file
+            context (ImportContext): receives the new datablocks in context.staged
+
+        Raises:
+            NodeGroupCycleError: when the node groups of this tree contain themselves
+
+        Yields:
+            tuple[int, int]: the nodes and links built so far, and the number to build
+        """
+        timer = context.timer
+        with timer.phase("sort groups"):
+            orderedGroups = sortNodeGroups(self.subtrees)
+            if reuseExistingGroups:
+                orderedGroups = self.findNodeGroupsToBuild(orderedGroups)
+
+        with timer.phase("images"):
+            imagesBefore = {image.name for image in bpy.data.images}
+            context.images.preload(collectImagePaths([self] + orderedGroups))
+            context.stagedImages = [image for image in context.images.images.values() if image.name not in imagesBefore]
+            timer.count("images", len(context.images.images))
+
+        trees = orderedGroups + [self]
+        total = sum(len(tree.nodes) + len(tree.links) for tree in trees)
+        done = 0
+        yield done, total
+
+        for tree in trees:
+            if tree is self:
+                material = bpy.data.materials.new(self.name)
+                material.use_nodes = True
+                material.node_tree.nodes.clear()
+                context.staged.append((self.name, material, bpy.data.materials))
+                blenderTree = material.node_tree
+            else:
+                # gets a unique name next to the existing group, the group nodes use it through the context
+                blenderTree = bpy.data.node_groups.new(tree.name, "ShaderNodeTree")
+                context.staged.append((tree.name, blenderTree, bpy.data.node_groups))
+                context.nodeGroups[tree.name] = blenderTree
+                timer.count("groups")
+
+            createdNodes = {}
+            for node in tree.nodes:
+                with timer.phase("nodes"):
+                    createdNodes[node.getName()] = addNodeToGroup(node, blenderTree, context)
+                done += 1
+                yield done, total
+            for link in tree.links:
+                with timer.phase("links"):
+                    addLinkToTree(link, blenderTree, createdNodes)
+                    timer.count("links")
+                done += 1
+                yield done, total
+
+        with timer.phase("images"):
+            bindImages(context)
+
+    def updateMaterial(self, reuseExistingGroups=False, context: ImportContext = None):
+        """Update the existing material of this Node Tree in place
+
+        Only the differences are applied: missing nodes and links are added, nodes and links
+        that are not in this tree are removed, and changed locations, socket values and
+        properties are set. Node groups are updated the same way, unless their inputs or
+        outputs changed, then they are rebuilt. Without an existing material, a new one is created.
+
+        Args:
+            reuseExistingGroups (bool): keep node groups that already exist in the blend file
+            context (ImportContext, optional): state of this import
+
+        Raises:
+            NodeGroupCycleError: when the node groups of this tree contain themselves
+
+        Returns:
+            bpy.type.Material: the updated or new material
+        """
+        material = bpy.data.materials.get(self.name)
+        if material is None or material.node_tree is None:
+            return self.createMaterial(reuseExistingGroups, context)
+
+        if context is None:
+            context = ImportContext()
+        timer = context.timer
+
+        with timer.phase("sort groups"):
+            orderedGroups = sortNodeGroups(self.subtrees)
+            if reuseExistingGroups:
+                orderedGroups = self.findNodeGroupsToBuild(orderedGroups)
+
+        with timer.phase("images"):
+            context.images.preload(collectImagePaths([self] + orderedGroups))
+            timer.count("images", len(context.images.images))
+
+        with timer.phase("groups"):
+            updateNodeGroups(orderedGroups, context)
+
+        updateNodeTree(self, material.node_tree, context)
+
+        with timer.phase("images"):
+            bindImages(context)
+        return material
+
+    def findNodeGroupsToBuild(self, orderedGroups: list) -> list:
+        """Keep only the groups this tree needs that do not exist in the blend file yet
+
+        Groups that are only used by an existing group are not needed either,
+        so their table entries are never materialized.
+        """
+        byName = {group.name: group for group in orderedGroups}
+        needed = set()
+        toCheck = self.getGroupDependencies()
+        while len(toCheck) > 0:
+            name = toCheck.pop()
+            if name in needed or name not in byName:
+                continue
+            if bpy.data.node_groups.find(name) != -1:
+                continue
+            needed.add(name)
+            toCheck.extend(byName[name].getGroupDependencies())
+        return [group for group in orderedGroups if group.name in needed]
+
     def getNodeGroupsNested(self):
         """Find All Node-groups in all nodes,
 
@@ -170,14 +518,221 @@ class NodeTree:
         return discovered
 
 
+class LazyNodeTree:
+    """A node group table entry that stays a parsed json record until it is needed
+
+    Knows its name and which groups it uses without creating any Node or NodeSocket.
+    Reading nodes, links or subtrees materializes the entry into a NodeTree.
+    """
+
+    def __init__(self, record: dict, strings: list = None, schema: FormatSchema = None, index: int = None) -> None:
+        """
+        Args:
+            record (dict): the group table entry
+            strings (list, optional): the string table of a file in the columnar layout
+            schema (FormatSchema, optional): of the file version, for the other layouts
+            index (int, optional): index of the entry in the node group table, for errors
+
+        Raises:
+            NodeFormatError: when the entry is malformed, the nodes and links are checked when they are read
+        """
+        self.strings = strings
+        self.schema = schema
+        self.index = index
+        if strings is None:
+            (schema or SCHEMAS[-1]).checkTree(record, index)
+            self.name: str = record["node_tree"]
+        else:
+            checkColumnarTree(record, strings, index)
+            self.name = strings[record["node_tree"]]
+        self.record = record
+        self.tree: NodeTree = None
+
+    def materialize(self) -> NodeTree:
+        if self.tree is None:
+            if self.strings is None:
+                self.tree = NodeTree.fromJson(self.record, self.schema, self.index)
+            else:
+                self.tree = NodeTree.fromColumnar(self.record, self.strings, self.index)
+            self.record = None
+        return self.tree
+
+    @property
+    def nodes(self):
+        return self.materialize().nodes
+
+    @property
+    def links(self):
+        return self.materialize().links
+
+    @property
+    def subtrees(self):
+        return self.materialize().subtrees
+
+    def getGroupDependencies(self) -> list[str]:
+        if self.tree is not None:
+            return self.tree.getGroupDependencies()
+        if self.strings is None:
+            # the nodes are not checked yet
+            nodes = [node for node in self.record["nodes"] if type(node) is dict]
+            types = (node.get("type") for node in nodes)
+            datas = (node.get("data", {}) for node in nodes)
+        else:
+            types = (self.strings[typeIndex] for typeIndex in self.record["nodes"]["type"])
+            datas = self.record["nodes"]["data"]
+        dependencies = []
+        for nodeType, data in zip(types, datas):
+            if nodeType != "ShaderNodeGroup" or type(data) is not dict:
+                continue
+            name = data.get("subtree")
+            if name is not None and name not in dependencies:
+                dependencies.append(name)
+        return dependencies
+
+
 def version2Tuple(versionStr):
     tpl = tuple(map(int, versionStr.split(".")))
     return tpl
 
 
-def createNodeGroup(nodegroupNodeTree: "NodeTree"):
-    """ create a nodeGroup from this NodeTree"""
+def checkFileVersion(fileVersion) -> tuple:
+    """the version of a file as a tuple
+
+    Raises:
+        NodeFormatError: when it is not a version
+        VersionError: when it is newer than the supported version
+    """
+    try:
+        version = version2Tuple(fileVersion)
+    except (AttributeError, ValueError):
+        raise NodeFormatError(f"'{fileVersion}' is not a file version")
+    if version > version2Tuple(VERSION):
+        raise VersionError(f"File version {fileVersion} is newer than the supported version {VERSION}")
+    return version
+
+
+def flattenLegacySubtrees(subtrees: list[dict]) -> list[dict]:
+    """Turn the nested subtrees of files before 0.1.0 into a group table
+
+    Each group is kept once, dependencies before the groups that use them.
+    """
+    groups = {}
+
+    def visit(subtree):
+        if type(subtree) is not dict or type(subtree.get("node_tree")) is not str:
+            raise NodeFormatError("A nested node group has no name")
+        if subtree["node_tree"] in groups:
+            return
+        for nested in subtree.get("subtrees", []):
+            visit(nested)
+        groups[subtree["node_tree"]] = subtree
+
+    for subtree in subtrees:
+        visit(subtree)
+    return list(groups.values())
+
+
+def collectNodeGroups(node_tree: bpy.types.NodeTree, groupCache: dict, groups: dict, sparse=False):
+    """Gather the serialized node groups used in a blender node tree, nested groups included
+
+    Args:
+        node_tree (bpy.types.NodeTree): the blender node tree to search
+        groupCache (dict[str, NodeTree]): serialized groups by name, a group is only serialized if it is missing here
+        groups (dict[str, NodeTree]): receives the groups, dependencies before the groups that use them
+        sparse (bool): leave out values that are still at their defaults
+    """
+    for groupNode in NodeTree.findNodeGroupsinBlenderNodeTree(node_tree):
+        group = groupNode.node_tree
+        if group is None or group.name in groups:
+            continue
+
+        # reserve the name first, so the group is not visited again while collecting its own groups
+        groups[group.name] = None
+        collectNodeGroups(group, groupCache, groups, sparse)
+        if group.name not in groupCache:
+            groupCache[group.name] = NodeTree.serializeNodes(group, group.name, sparse)
+
+        # re-insert to move the group behind its dependencies
+        del groups[group.name]
+        groups[group.name] = groupCache[group.name]
+
+
+def sortNodeGroups(subtrees: list["NodeTree"]) -> list["NodeTree"]:
+    """Order a node group table so every group comes after the groups it uses
+
+    Groups that are referenced but missing from the table are expected to exist in the blend file already.
+    A name that appears more than once in the table is only kept the first time.
+
+    Raises:
+        NodeGroupCycleError: when a group uses itself, directly or through other groups
+    """
+    byName = {}
+    for subtree in subtrees:
+        byName.setdefault(subtree.name, subtree)
+
+    ordered = []
+    done = set()
+    path = []
+
+    def visit(subtree):
+        if subtree.name in done:
+            return
+        if subtree.name in path:
+            cycle = path[path.index(subtree.name):] + [subtree.name]
+            raise NodeGroupCycleError(f"Node group uses itself: {' -> '.join(cycle)}")
+        path.append(subtree.name)
+        for dependency in subtree.getGroupDependencies():
+            if dependency in byName:
+                visit(byName[dependency])
+        path.pop()
+        done.add(subtree.name)
+        ordered.append(subtree)
+
+    for subtree in byName.values():
+        visit(subtree)
+    return ordered
+
+
+def collectImagePaths(trees: list) -> list[str]:
+    """The image paths of all image texture nodes in these trees, each path once"""
+    paths = {}
+    for tree in trees:
+        for node in tree.nodes:
+            if node.getType() == "ShaderNodeTexImage":
+                path = node.getData().get("image")
+                if path:
+                    paths[path] = None
+    return list(paths)
+
+
+def bindImages(context: ImportContext):
+    """Assign the cached images to the image nodes created during this import"""
+    for shaderNode, path in context.pendingImages:
+        image = context.images.get(path)
+        if image is not None:
+            shaderNode.image = image
+    context.pendingImages.clear()
+
+
+def buildNodeGroups(subtrees: list["NodeTree"], context: ImportContext):
+    """Create a blender node group for each Node Tree, in the given order
+
+    Args:
+        subtrees (list[NodeTree]): the groups, as ordered by sortNodeGroups
+        context (ImportContext): receives the created node groups
+    """
+    for subtree in subtrees:
+        context.nodeGroups[subtree.name] = createNodeGroup(subtree, context)
 
+
+def createNodeGroup(nodegroupNodeTree: "NodeTree", context: ImportContext = None):
+    """ create a nodeGroup from this NodeTree
+
+    The groups it uses must already be built, see buildNodeGroups.
+
+    Returns:
+        bpy.types.NodeTree: the new or cleared existing node group
+    """
     if bpy.data.node_groups.find(nodegroupNodeTree.name) != -1:
         newBlenderNodeTree = bpy.data.node_groups[nodegroupNodeTree.name]
         newBlenderNodeTree.nodes.clear()
@@ -186,33 +741,45 @@ def createNodeGroup(nodegroupNodeTree: "NodeTree"):
     else:
         newBlenderNodeTree = bpy.data.node_groups.new(nodegroupNodeTree.name, "ShaderNodeTree")
 
-    # import subTrees
-    for subtree in nodegroupNodeTree.subtrees:
-        createNodeGroup(subtree)
+    timer = context.timer if context is not None else PhaseTimer()
+    timer.count("groups")
 
     # add other Nodes
-    for node in nodegroupNodeTree.nodes:
-        # populate nodeTree Inputs
-        if node.getType() == "NodeGroupInput":
-            for socket in node.getOutputs():
-                newBlenderNodeTree.inputs.new(socket.type, socket.name)
-
-        # populate nodeTree Outputs
-        elif node.getType() == "NodeGroupOutput":
-            for socket in node.getInputs():
-                newBlenderNodeTree.outputs.new(socket.type, socket.name)
-        # add node to tree
-        addNodeToTree(node, newBlenderNodeTree)
+    createdNodes = {}
+    with timer.phase("nodes"):
+        for node in nodegroupNodeTree.nodes:
+            createdNodes[node.getName()] = addNodeToGroup(node, newBlenderNodeTree, context)
     # add links to nodes
-    for link in nodegroupNodeTree.links:
-        addLinkToTree(link, newBlenderNodeTree)
+    with timer.phase("links"):
+        for link in nodegroupNodeTree.links:
+            addLinkToTree(link, newBlenderNodeTree, createdNodes)
+        timer.count("links", len(nodegroupNodeTree.links))
+
+    return newBlenderNodeTree
+
 
+def addNodeToGroup(node: Node, node_tree: bpy.types.NodeTree, context: ImportContext = None):
+    """Add the Node to a node group, group input and output nodes also add their sockets to the group"""
+    # populate nodeTree Inputs
+    if node.getType() == "NodeGroupInput":
+        for socket in node.getOutputs():
+            node_tree.inputs.new(socket.type, socket.name)
 
-def addNodeToTree(node: Node, node_tree: bpy.types.NodeTree):
+    # populate nodeTree Outputs
+    elif node.getType() == "NodeGroupOutput":
+        for socket in node.getInputs():
+            node_tree.outputs.new(socket.type, socket.name)
+    return addNodeToTree(node, node_tree, context)
+
+
+def addNodeToTree(node: Node, node_tree: bpy.types.NodeTree, context: ImportContext = None):
     """
     Add the Node to the Node tree and assign recorded data
     In case of Node Groups, Create The NodeGroup Data block and add input/output Sockets
     """
+    timer = context.timer if context is not None else PhaseTimer()
+    timer.count("nodes")
+
     # add node to tree
     newNode = node_tree.nodes.new(node.getType())
     newNode.location = node.getLocation()
@@ -223,44 +790,289 @@ def addNodeToTree(node: Node, node_tree: bpy.types.NodeTree):
     is_InputOutputNode = node_type in ["NodeGroupInput", "NodeGroupOutput"]
 
     if node_type == "ShaderNodeGroup":
-        # add subtree to this node group
-        newNode.node_tree = bpy.data.node_groups[node.getData()["subtree"]]
+        # add subtree to this node group, preferring the group built by this import
+        groupName = node.getData()["subtree"]
+        if context is not None and groupName in context.nodeGroups:
+            newNode.node_tree = context.nodeGroups[groupName]
+        else:
+            newNode.node_tree = bpy.data.node_groups[groupName]
 
-    else:
-        inputSockets = node.getInputs()
-        outputSockets = node.getOutputs()
-
-        # set socket inputs&outputs values for this node
-        for socket in inputSockets:
-            if socket.value is not None:
-                # add missing Sockets to Node
-                if is_InputOutputNode:
-                    newNode.inputs.new(socket.type, socket.name)
-                # set Socket Value
-                val = socket.getValue()
-                if hasattr(newNode.inputs[socket.name], "default_value"):
-                    newNode.inputs[socket.name].default_value = val
-
-        for socket in outputSockets:
-            if socket.value is not None:
-                # add missing Sockets to Node
-                if is_InputOutputNode:
-                    newNode.outputs.new(socket.type, socket.name)
-
-                # set Socket Value
-                val = socket.getValue()
-                if hasattr(newNode.outputs[socket.name], "default_value"):
-                    newNode.outputs[socket.name].default_value = val
-
-        # set other node properties
-        ddata = node.getData()
-        for id, data in ddata.items():
-            node.setData(id, data, newNode)
+    # set socket inputs&outputs values for this node, group nodes have the sockets of their group by now
+    for blenderSockets, sockets in ((newNode.inputs, node.getInputs()), (newNode.outputs, node.getOutputs())):
+        start = 0
+        for socket in sockets:
+            if socket.value is None:
+                continue
+            # add missing Sockets to Node
+            if is_InputOutputNode:
+                blenderSocket = blenderSockets.new(socket.type, socket.name)
+            else:
+                blenderSocket, start = findNextSocket(blenderSockets, start, socket.name, socket.identifier)
+
+            # set Socket Value
+            if hasattr(blenderSocket, "default_value"):
+                blenderSocket.default_value = socket.getValue()
+                timer.count("sockets")
+
+    if node_type != "ShaderNodeGroup":
+        # set other node properties, the data of group nodes only names their group
+        with timer.phase("properties"):
+            ddata = node.getData()
+            for id, data in ddata.items():
+                if id == "image" and context is not None:
+                    # images are loaded once per import and bound after all nodes exist
+                    if data:
+                        context.pendingImages.append((newNode, data))
+                    continue
+                node.setData(id, data, newNode)
 
     return newNode
 
 
-def addLinkToTree(link: NodeLink, node_tree: bpy.types.NodeTree):
-    from_socket = node_tree.nodes[link.from_node].outputs[link.from_socket]
-    to_socket = node_tree.nodes[link.to_node].inputs[link.to_socket]
+def findSocket(sockets, index, name, identifier=None):
+    """Find a socket of a blender node
+
+    The socket at the recorded index is used when it still has the recorded identifier,
+    or name for files without identifiers. Otherwise the sockets are searched by identifier, then by name.
+    Names alone are ambiguous, the Mix node for example has several "A" and "B" sockets.
+
+    Returns:
+        bpy.types.NodeSocket: the socket, or None if the node has no such socket
+    """
+    if index is not None and index < len(sockets):
+        socket = sockets[index]
+        if (socket.identifier == identifier) if identifier else (socket.name == name):
+            return socket
+    if identifier:
+        for socket in sockets:
+            if socket.identifier == identifier:
+                return socket
+    return sockets.get(name)
+
+
+def findNextSocket(sockets, start, name, identifier=None):
+    """Find the next socket of a blender node while going through the sockets of a Node in order
+
+    Files list the sockets of a node in blender order, and sparse files leave some of them out,
+    so the socket is looked for from start on, at or shortly after the socket found before it.
+    The position in the file is not the blender index once sockets are left out.
+
+    Returns:
+        tuple: the socket, or None if the node has no such socket, and the start for the next socket
+    """
+    for index in range(start, len(sockets)):
+        socket = sockets[index]
+        if (socket.identifier == identifier) if identifier else (socket.name == name):
+            return socket, index + 1
+    return findSocket(sockets, None, name, identifier), start
+
+
+def addLinkToTree(link: NodeLink, node_tree: bpy.types.NodeTree, createdNodes: dict = None):
+    """
+    Link two nodes of the Node tree
+
+    Args:
+        createdNodes (dict, optional): the blender nodes created for this tree, by the node name in the file
+    """
+    if createdNodes is None:
+        createdNodes = {}
+    from_node = createdNodes.get(link.from_node) or node_tree.nodes[link.from_node]
+    to_node = createdNodes.get(link.to_node) or node_tree.nodes[link.to_node]
+    from_socket = findSocket(from_node.outputs, link.from_socket_index, link.from_socket)
+    to_socket = findSocket(to_node.inputs, link.to_socket_index, link.to_socket)
     node_tree.links.new(from_socket, to_socket)
+
+
+def updateNodeGroups(subtrees: list["NodeTree"], context: ImportContext):
+    """Update the existing node groups of these Node Trees in place, in the given order
+
+    Groups that do not exist yet, or whose inputs or outputs changed, are built from scratch.
+    """
+    for subtree in subtrees:
+        existing = bpy.data.node_groups.get(subtree.name)
+        if existing is not None and groupInterfaceMatches(subtree, existing):
+            updateNodeTree(subtree, existing, context)
+            context.nodeGroups[subtree.name] = existing
+        else:
+            context.nodeGroups[subtree.name] = createNodeGroup(subtree, context)
+
+
+def groupInterfaceMatches(tree: "NodeTree", blenderTree: bpy.types.NodeTree) -> bool:
+    """check if a blender node group has the input and output sockets of a Node Tree, by name and socket type"""
+    inputs = []
+    outputs = []
+    for node in tree.nodes:
+        if node.getType() == "NodeGroupInput" and len(inputs) == 0:
+            inputs = [(socket.name, socket.type) for socket in node.getOutputs()]
+        elif node.getType() == "NodeGroupOutput" and len(outputs) == 0:
+            outputs = [(socket.name, socket.type) for socket in node.getInputs()]
+    return (inputs == [(socket.name, socket.bl_socket_idname) for socket in blenderTree.inputs]
+            and outputs == [(socket.name, socket.bl_socket_idname) for socket in blenderTree.outputs])
+
+
+def updateNodeTree(tree: "NodeTree", blenderTree: bpy.types.NodeTree, context: ImportContext):
+    """Apply the differences between a Node Tree and an existing blender node tree"""
+    timer = context.timer
+
+    with timer.phase("nodes"):
+        # remove nodes that are gone, or whose type changed, before adding nodes with their names
+        recordedTypes = {node.getName(): node.getType() for node in tree.nodes}
+        for blenderNode in list(blenderTree.nodes):
+            if recordedTypes.get(blenderNode.name) != blenderNode.bl_idname:
+                blenderTree.nodes.remove(blenderNode)
+                timer.count("removed nodes")
+
+        createdNodes = {}
+        for node in tree.nodes:
+            blenderNode = blenderTree.nodes.get(node.getName())
+            if blenderNode is None:
+                createdNodes[node.getName()] = addNodeToTree(node, blenderTree, context)
+            else:
+                createdNodes[node.getName()] = blenderNode
+                if updateNode(node, blenderNode, context):
+                    timer.count("updated nodes")
+
+    with timer.phase("links"):
+        # links by the sockets they connect
+        wanted = {}
+        for link in tree.links:
+            fromNode = createdNodes.get(link.from_node)
+            toNode = createdNodes.get(link.to_node)
+            if fromNode is None or toNode is None:
+                continue
+            fromSocket = findSocket(fromNode.outputs, link.from_socket_index, link.from_socket)
+            toSocket = findSocket(toNode.inputs, link.to_socket_index, link.to_socket)
+            if fromSocket is not None and toSocket is not None:
+                wanted[(fromSocket.as_pointer(), toSocket.as_pointer())] = (fromSocket, toSocket)
+
+        for blenderLink in list(blenderTree.links):
+            key = (blenderLink.from_socket.as_pointer(), blenderLink.to_socket.as_pointer())
+            if wanted.pop(key, None) is None:
+                blenderTree.links.remove(blenderLink)
+                timer.count("removed links")
+
+        for fromSocket, toSocket in wanted.values():
+            blenderTree.links.new(fromSocket, toSocket)
+            timer.count("added links")
+
+
+def updateNode(node: Node, blenderNode: bpy.types.ShaderNode, context: ImportContext) -> bool:
+    """Set the location, socket values and properties of a blender node that differ from the Node
+
+    Returns:
+        bool: True if anything was changed
+    """
+    changed = False
+    location = [float(v) for v in node.getLocation()]
+    if [float(v) for v in blenderNode.location] != location:
+        blenderNode.location = location
+        changed = True
+
+    node_type = node.getType()
+    if node_type == "ShaderNodeGroup":
+        groupName = node.getData()["subtree"]
+        group = context.nodeGroups.get(groupName) or bpy.data.node_groups[groupName]
+        if blenderNode.node_tree != group:
+            blenderNode.node_tree = group
+            changed = True
+    elif node_type in ["NodeGroupInput", "NodeGroupOutput"]:
+        # their sockets follow the inputs and outputs of the group
+        return changed
+
+    # group nodes have no defaults, their sockets follow their group
+    defaults = NodeDefaults.get(node_type)
+    sides = ((blenderNode.inputs, node.getInputs(), defaults.inputs),
+             (blenderNode.outputs, node.getOutputs(), defaults.outputs))
+    for blenderSockets, sockets, socketDefaults in sides:
+        found = set()
+        start = 0
+        for socket in sockets:
+            blenderSocket, start = findNextSocket(blenderSockets, start, socket.name, socket.identifier)
+            if blenderSocket is None:
+                continue
+            found.add(blenderSocket.identifier)
+            if socket.value is None or not hasattr(blenderSocket, "default_value"):
+                continue
+            if not valueMatches(blenderSocket.default_value, socket.value):
+                blenderSocket.default_value = socket.getValue()
+                changed = True
+
+        # sparse files leave out the sockets that are at their default value
+        for blenderSocket in blenderSockets:
+            default = socketDefaults.get(blenderSocket.identifier)
+            if blenderSocket.identifier in found or default is None or not hasattr(blenderSocket, "default_value"):
+                continue
+            if not valueMatches(blenderSocket.default_value, default):
+                blenderSocket.default_value = default
+                changed = True
+
+    if node_type == "ShaderNodeGroup":
+        # the data of group nodes only names their group, which is set above
+        return changed
+
+    with context.timer.phase("properties"):
+        # properties left out of the file are at their default value
+        properties = {**defaults.data, **node.getData()}
+        for id, data in properties.items():
+            if id == "image":
+                image = blenderNode.image
+                currentPath = None if image is None else bpy.path.abspath(image.filepath)
+                if currentPath == data:
+                    continue
+                if data:
+                    context.pendingImages.append((blenderNode, data))
+                else:
+                    blenderNode.image = None
+                changed = True
+            elif not valueMatches(getattr(blenderNode, id, None), data):
+                node.setData(id, data, blenderNode)
+                changed = True
+    return changed
+
+
+def valueMatches(current, recorded) -> bool:
+    """check if a value read from blender is the same as a value read from a file"""
+    if type(recorded) is array:
+        recorded = recorded.tolist()
+    if type(recorded) is str and type(current) is not str:
+        # values without a json type are stored as their string
+        return str(current) == recorded
+    try:
+        return encodeValue(current) == recorded
+    except TypeError:
+        return False
+
+
+def commitStagedImport(context: ImportContext):
+    """Replace the existing materials and node groups with the ones built by createMaterialSteps
+
+    Users of the replaced datablocks are remapped to the new ones, which then take over their names.
+
+    Returns:
+        bpy.types.Material: the new material, or None if it was not built
+    """
+    material = None
+    for name, datablock, collection in context.staged:
+        existing = collection.get(name)
+        if existing is not None and existing != datablock:
+            existing.user_remap(datablock)
+            collection.remove(existing)
+        datablock.name = name
+        if collection == bpy.data.materials:
+            material = datablock
+    context.staged.clear()
+    context.stagedImages.clear()
+    return material
+
+
+def rollbackStagedImport(context: ImportContext):
+    """Remove everything createMaterialSteps built, the blend file is left as it was before the import"""
+    # the material first, it uses the groups
+    for name, datablock, collection in reversed(context.staged):
+        collection.remove(datablock)
+    for image in context.stagedImages:
+        bpy.data.images.remove(image)
+    context.staged.clear()
+    context.stagedImages.clear()
+    context.nodeGroups.clear()
+    context.pendingImages.clear()
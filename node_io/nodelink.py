@@ -1,47 +1,79 @@
 from dataclasses import dataclass
 import bpy
+from .nodeSocket import internString
+from .formatSchema import FormatSchema, SCHEMAS
+
+
+def getSocketIndices(node_tree: bpy.types.NodeTree) -> dict:
+    """Map every socket of a blender node tree to its index on its node, by socket pointer"""
+    socketIndices = {}
+    for node in node_tree.nodes:
+        for sockets in (node.inputs, node.outputs):
+            for index, socket in enumerate(sockets):
+                socketIndices[socket.as_pointer()] = index
+    return socketIndices
 
 
 class NodeLink:
-    def __init__(self, blenderNodeLink: bpy.types.NodeLink = None) -> None:
+    # slots: parsed libraries hold millions of links
+    __slots__ = ("from_node", "from_socket", "to_node", "to_socket", "from_socket_index", "to_socket_index")
+
+    def __init__(self, blenderNodeLink: bpy.types.NodeLink = None, socketIndices: dict = None) -> None:
+        """
+        Args:
+            blenderNodeLink (bpy.types.NodeLink, optional): the link to read
+            socketIndices (dict, optional): socket indices of the link's node tree, see getSocketIndices
+        """
         if blenderNodeLink is None:
             self.from_node = None
             self.from_socket = None
             self.to_node = None
             self.to_socket = None
+            self.from_socket_index = None
+            self.to_socket_index = None
             return
+        if socketIndices is None:
+            socketIndices = getSocketIndices(blenderNodeLink.id_data)
         self.from_node = blenderNodeLink.from_node.name
         self.from_socket = blenderNodeLink.from_socket.name
         self.to_node = blenderNodeLink.to_node.name
         self.to_socket = blenderNodeLink.to_socket.name
+        self.from_socket_index = socketIndices.get(blenderNodeLink.from_socket.as_pointer())
+        self.to_socket_index = socketIndices.get(blenderNodeLink.to_socket.as_pointer())
 
     def to_dict(self):
-        return {
-            "from_node": self.from_node,
-            "from_socket": self.from_socket,
-            "to_node": self.to_node,
-            "to_socket": self.to_socket
-        }
+        return self.toJson()
 
     @classmethod
-    def fromJson(cls, jsonDict: dict):
-        node = NodeLink()
-        for key, value in jsonDict.items():
-            setattr(node, key, value)
-        return node
+    def fromJson(cls, jsonDict: dict, schema: FormatSchema = None, tree="", index=0):
+        """Check and read a link record
+
+        Raises:
+            NodeFormatError: when the record is malformed
+        """
+        if schema is None:
+            schema = SCHEMAS[-1]
+        schema.checkLink(jsonDict, tree, index)
+        link = NodeLink()
+        link.from_node = internString(jsonDict["from_node"])
+        link.from_socket = internString(jsonDict["from_socket"])
+        link.to_node = internString(jsonDict["to_node"])
+        link.to_socket = internString(jsonDict["to_socket"])
+        # files before the socket indices were stored
+        link.from_socket_index = jsonDict.get("from_socket_index")
+        link.to_socket_index = jsonDict.get("to_socket_index")
+        return link
 
     def toJson(self):
         return {
             "from_node": self.from_node,
             "from_socket": self.from_socket,
             "to_node": self.to_node,
-            "to_socket": self.to_socket
+            "to_socket": self.to_socket,
+            "from_socket_index": self.from_socket_index,
+            "to_socket_index": self.to_socket_index
         }
 
     @classmethod
-    def fromStringList(cls, list):
-        newLinks = []
-        for item in list:
-            newLink = NodeLink.fromJson(item)
-            newLinks.append(newLink)
-        return newLinks
+    def fromStringList(cls, list, schema: FormatSchema = None, tree=""):
+        return [NodeLink.fromJson(item, schema, tree, index) for index, item in enumerate(list)]
@@ -0,0 +1,110 @@
+import json
+import time
+
+# Timing of the phases of an import or export.
+# This module does not import bpy, so it can also run outside of blender.
+
+
+class PhaseTimer:
+    """Adds up the time spent in each phase of an import or export, and counts what was processed
+
+    Phases can be nested, each phase only gets the time not spent in the phases inside it,
+    so the phase times add up to the total. Timing a phase costs two perf_counter calls,
+    cheap enough to leave on for every import and export.
+    """
+
+    def __init__(self, trace=False) -> None:
+        # seconds spent in each phase, in the order the phases first ran
+        self.phases: dict[str, float] = {}
+        # totals of everything counted, and what was counted in each phase, by the running phase
+        self.counts: dict[str, int] = {}
+        self.phaseCounts: dict[str, dict[str, int]] = {}
+        self.start = time.perf_counter()
+        # phases that are running: name, start time, time spent in nested phases
+        self.stack: list[list] = []
+        # every run of a phase, only kept for writeTrace
+        self.events: list[tuple[str, float, float]] = [] if trace else None
+
+    def phase(self, name: str) -> "Phase":
+        """time a phase, use as a context manager: with timer.phase("links"): ..."""
+        return Phase(self, name)
+
+    def begin(self, name: str):
+        self.stack.append([name, time.perf_counter(), 0.0])
+
+    def end(self):
+        end = time.perf_counter()
+        name, start, nested = self.stack.pop()
+        elapsed = end - start
+        self.phases[name] = self.phases.get(name, 0.0) + elapsed - nested
+        if len(self.stack) > 0:
+            self.stack[-1][2] += elapsed
+        if self.events is not None:
+            self.events.append((name, start, elapsed))
+
+    def count(self, name: str, amount: int = 1):
+        """count what was processed, in the totals and in the innermost running phase"""
+        self.counts[name] = self.counts.get(name, 0) + amount
+        if len(self.stack) > 0:
+            counts = self.phaseCounts.setdefault(self.stack[-1][0], {})
+            counts[name] = counts.get(name, 0) + amount
+
+    def getTotal(self) -> float:
+        return time.perf_counter() - self.start
+
+    def summary(self) -> str:
+        """one line of the phase times and counts, for operator reports"""
+        phases = ", ".join(f"{name} {seconds * 1000:.0f}ms" for name, seconds in self.phases.items())
+        counts = ", ".join(f"{amount} {name}" for name, amount in self.counts.items())
+        text = f"{self.getTotal():.2f}s"
+        if phases:
+            text += f" ({phases})"
+        if counts:
+            text += f", {counts}"
+        return text
+
+    def toJson(self):
+        return {
+            "total": self.getTotal(),
+            "phases": self.phases,
+            "counts": self.counts,
+            "phaseCounts": self.phaseCounts,
+        }
+
+    def writeTrace(self, filepath):
+        """Write the timings to a json file
+
+        Besides the totals, the file holds every run of a phase in the trace event format,
+        so it can be opened in chrome://tracing or https://ui.perfetto.dev
+        """
+        trace = self.toJson()
+        trace["traceEvents"] = [
+            {
+                "name": name,
+                "ph": "X",
+                "ts": (start - self.start) * 1e6,
+                "dur": duration * 1e6,
+                "pid": 0,
+                "tid": 0,
+            }
+            for name, start, duration in (self.events or [])
+        ]
+        with open(filepath, "w", encoding="utf8") as f:
+            json.dump(trace, f, indent=2)
+
+
+class Phase:
+    """context manager of PhaseTimer.phase, a plain class because it runs for every node"""
+    __slots__ = ("timer", "name")
+
+    def __init__(self, timer: PhaseTimer, name: str) -> None:
+        self.timer = timer
+        self.name = name
+
+    def __enter__(self):
+        self.timer.begin(self.name)
+        return self
+
+    def __exit__(self, *args):
+        self.timer.end()
+        return False
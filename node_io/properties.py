@@ -32,11 +32,35 @@ from bpy.props import StringProperty
 # Add additional functions or classes here
 #
 
+class NodeIOCatalogEntry(bpy.types.PropertyGroup):
+    """A node tree file of the library catalog, see catalog.LibraryCatalog"""
+    # the material name is the name of the PropertyGroup
+    filename: StringProperty()
+    node_count: IntProperty()
+    # comma separated, for display and filtering
+    node_types: StringProperty()
+    groups: StringProperty()
+    image_count: IntProperty()
+
+
 # This is where you assign any variables you need in your script. Note that they
 # won't always be assigned to the Scene object but it's a good place to start.
 def register():
     Scene.my_property = BoolProperty(default=True)
+    bpy.utils.register_class(NodeIOCatalogEntry)
+    Scene.nodeio_library_path = StringProperty(
+        name="Library",
+        description="Folder of node tree files to browse",
+        subtype='DIR_PATH',
+        default="//nodes/",
+    )
+    Scene.nodeio_catalog = CollectionProperty(type=NodeIOCatalogEntry)
+    Scene.nodeio_catalog_index = IntProperty(default=0)
 
 def unregister():
     try: del Scene.my_property
     except: pass
+    for name in ("nodeio_catalog_index", "nodeio_catalog", "nodeio_library_path"):
+        try: delattr(Scene, name)
+        except: pass
+    bpy.utils.unregister_class(NodeIOCatalogEntry)
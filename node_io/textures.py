@@ -0,0 +1,206 @@
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+import hashlib
+import os
+import shutil
+import tempfile
+import bpy
+from .nodeTree import NodeTree
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+@dataclass
+class TextureJob:
+    """One image to write, with everything the worker needs and no bpy data"""
+    name: str
+    target: str
+    # file to copy from, or image data to write
+    source: str = None
+    data: bytes = None
+
+
+def hashFile(filepath) -> str:
+    hasher = hashlib.sha1()
+    with open(filepath, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def writeTexture(job: TextureJob) -> bool:
+    """Write or copy the image of a job, unless the target already has the same content.
+    Runs on a worker thread, so it must not touch bpy.
+
+    Returns:
+        bool: True if the target was written
+    """
+    size = len(job.data) if job.data is not None else os.path.getsize(job.source)
+    if os.path.isfile(job.target) and os.path.getsize(job.target) == size:
+        if job.data is not None:
+            contentHash = hashlib.sha1(job.data).hexdigest()
+        else:
+            contentHash = hashFile(job.source)
+        if hashFile(job.target) == contentHash:
+            return False
+
+    if job.data is not None:
+        with open(job.target, "wb") as f:
+            f.write(job.data)
+    else:
+        shutil.copyfile(job.source, job.target)
+    return True
+
+
+def collectImages(materials: list[bpy.types.Material]) -> list[bpy.types.Image]:
+    """Find the images used by image texture nodes in these materials and their node groups, each image once"""
+    images = {}
+    visitedTrees = set()
+    toCheck = [material.node_tree for material in materials if material is not None and material.node_tree is not None]
+
+    while len(toCheck) > 0:
+        node_tree = toCheck.pop()
+        for node in node_tree.nodes:
+            if node.type == "TEX_IMAGE" and node.image is not None:
+                images.setdefault(node.image.name, node.image)
+        for groupNode in NodeTree.findNodeGroupsinBlenderNodeTree(node_tree):
+            if groupNode.node_tree is not None and groupNode.node_tree.name not in visitedTrees:
+                visitedTrees.add(groupNode.node_tree.name)
+                toCheck.append(groupNode.node_tree)
+
+    return list(images.values())
+
+
+# the formats blender can write, by file extension
+RENDER_FORMATS = {
+    ".png": "PNG",
+    ".jpg": "JPEG",
+    ".jpeg": "JPEG",
+    ".tif": "TIFF",
+    ".tiff": "TIFF",
+    ".tga": "TARGA",
+    ".bmp": "BMP",
+    ".exr": "OPEN_EXR",
+    ".hdr": "HDR",
+    ".webp": "WEBP",
+}
+
+
+def isRendered(image: bpy.types.Image) -> bool:
+    """check if an image only exists in memory, generated or edited, so blender has to write it"""
+    if image.packed_file is not None:
+        return False
+    sourcePath = bpy.path.abspath(image.filepath) if image.filepath else ""
+    return image.source != "FILE" or image.is_dirty or not os.path.isfile(sourcePath)
+
+
+def getTextureFilename(image: bpy.types.Image) -> str:
+    """The file name of an exported image: its datablock name, with the extension of its file if the name has none
+
+    Images blender has to write get a png extension, unless it can write the format of their extension.
+    """
+    filename = image.name.replace("/", "_").replace("\\", "_")
+    name, extension = os.path.splitext(filename)
+    if extension == "":
+        extension = os.path.splitext(image.filepath)[1] or ".png"
+        name = filename
+    if isRendered(image) and extension.lower() not in RENDER_FORMATS:
+        extension = ".png"
+    return name + extension
+
+
+def getTextureFilenames(images: list[bpy.types.Image]) -> dict[str, str]:
+    """The file names of exported images by image name, names that would collide get a number
+
+    Names are compared case insensitive, since they may be written to a case insensitive file system.
+    """
+    filenames = {}
+    used = set()
+    for image in images:
+        filename = getTextureFilename(image)
+        name, extension = os.path.splitext(filename)
+        number = 1
+        while filename.lower() in used:
+            filename = f"{name}.{number:03}{extension}"
+            number += 1
+        used.add(filename.lower())
+        filenames[image.name] = filename
+    return filenames
+
+
+def renderImage(image: bpy.types.Image, filepath):
+    """Write an image that only exists in memory, in the format of the file extension"""
+    # save_render writes in the output format of the scene, whatever the extension is
+    scene = bpy.context.scene
+    settings = scene.render.image_settings
+    previousFormat = settings.file_format
+    settings.file_format = RENDER_FORMATS[os.path.splitext(filepath)[1].lower()]
+    try:
+        image.save_render(filepath, scene=scene)
+    finally:
+        settings.file_format = previousFormat
+
+
+def textureJob(image: bpy.types.Image, target, filename, renderDir) -> TextureJob:
+    """The job that writes an image to the target: its file, its packed data, or a render of it into renderDir
+
+    Args:
+        filename (str): name of the render in renderDir, from getTextureFilenames
+    """
+    job = TextureJob(image.name, target)
+    if image.packed_file is not None:
+        job.data = bytes(image.packed_file.data)
+    elif not isRendered(image):
+        job.source = bpy.path.abspath(image.filepath)
+    else:
+        job.source = os.path.join(renderDir, filename)
+        renderImage(image, job.source)
+    return job
+
+
+def packTextures(material: bpy.types.Material, renderDir) -> dict:
+    """The images of a material for nodePack.writePack, by the path its image nodes store
+
+    Images without a file path can not be matched to their nodes and are left out.
+    """
+    textures = {}
+    images = [image for image in collectImages([material]) if image.filepath]
+    filenames = getTextureFilenames(images)
+    for image in images:
+        job = textureJob(image, "", filenames[image.name], renderDir)
+        textures[bpy.path.abspath(image.filepath)] = job.data if job.data is not None else job.source
+    return textures
+
+
+def exportTextures(materials: list[bpy.types.Material], exportDir, workers=4) -> tuple[int, int]:
+    """Write the images used by these materials to a folder
+
+    Every image is written once, even when several nodes or materials use it, and files that
+    already have the same content are skipped. Reading images from bpy, and rendering images
+    that only exist in memory, happens on this thread; hashing, copying and writing run
+    on a pool of worker threads.
+
+    Args:
+        materials (list[bpy.types.Material]): the exported materials
+        exportDir (str): folder to write the images to
+        workers (int): number of worker threads
+
+    Returns:
+        tuple[int, int]: number of images written, and number skipped because they were unchanged
+    """
+    if not os.path.exists(exportDir):
+        os.makedirs(exportDir)
+
+    with tempfile.TemporaryDirectory() as renderDir:
+        images = collectImages(materials)
+        filenames = getTextureFilenames(images)
+        jobs = [
+            textureJob(image, os.path.join(exportDir, filenames[image.name]), filenames[image.name], renderDir)
+            for image in images
+        ]
+
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            results = list(executor.map(writeTexture, jobs))
+
+    written = sum(1 for result in results if result)
+    return written, len(results) - written
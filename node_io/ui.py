@@ -55,6 +55,8 @@ class NODEIO_PT_Import(NODEIO_MainPanel, Panel):
         row.label(text="Nodes Import", icon='IMPORT')
         row = box.row()
         row.operator("smitty.import_material_nodes")
+        row = box.row()
+        row.operator("smitty.import_node_bundle")
 
 
 class NODEIO_PT_Export(NODEIO_MainPanel, bpy.types.Panel):
@@ -93,13 +95,68 @@ class NODEIO_PT_Export(NODEIO_MainPanel, bpy.types.Panel):
         row.operator("smitty.export_material_nodes")
 
 
+class NODEIO_UL_Catalog(bpy.types.UIList):
+    """Materials of the library catalog, the filter also matches node types"""
+
+    def draw_item(self, context, layout, data, item, icon, active_data, active_propname, index):
+        row = layout.row()
+        row.label(text=item.name, icon='MATERIAL')
+        row.label(text=f"{item.node_count} nodes")
+
+    def filter_items(self, context, data, propname):
+        items = getattr(data, propname)
+        text = self.filter_name.lower()
+        flags = [
+            self.bitflag_filter_item
+            if text in item.name.lower() or text in item.node_types.lower() else 0
+            for item in items
+        ]
+        order = []
+        if self.use_filter_sort_alpha:
+            order = bpy.types.UI_UL_list.sort_items_by_name(items, "name")
+        return flags, order
+
+
+class NODEIO_PT_Library(NODEIO_MainPanel, Panel):
+    """Creates a Panel in the Material properties window"""
+    bl_idname = "NODEIO_PT_library"
+    bl_label = 'NodeIO: Library'
+    bl_parent_id = IDNAME_MAIN
+
+    def draw(self, context):
+        layout = self.layout
+        scene = context.scene
+
+        box = layout.box()
+        row = box.row()
+        row.prop(scene, "nodeio_library_path")
+        row.operator("smitty.refresh_library_catalog", text="", icon='FILE_REFRESH')
+
+        box.template_list("NODEIO_UL_Catalog", "", scene, "nodeio_catalog", scene, "nodeio_catalog_index")
+
+        if 0 <= scene.nodeio_catalog_index < len(scene.nodeio_catalog):
+            item = scene.nodeio_catalog[scene.nodeio_catalog_index]
+            col = box.column(align=True)
+            col.label(text=f"{item.node_count} nodes, {item.image_count} images")
+            col.label(text=f"Nodes: {item.node_types}")
+            if item.groups:
+                col.label(text=f"Groups: {item.groups}")
+
+        row = box.row()
+        row.operator("smitty.import_library_material")
+
+
 def register():
     bpy.utils.register_class(NODEIO_PT_Default)
     bpy.utils.register_class(NODEIO_PT_Import)
     bpy.utils.register_class(NODEIO_PT_Export)
+    bpy.utils.register_class(NODEIO_UL_Catalog)
+    bpy.utils.register_class(NODEIO_PT_Library)
 
 
 def unregister():
+    bpy.utils.unregister_class(NODEIO_PT_Library)
+    bpy.utils.unregister_class(NODEIO_UL_Catalog)
     bpy.utils.unregister_class(NODEIO_PT_Export)
     bpy.utils.unregister_class(NODEIO_PT_Import)
     bpy.utils.unregister_class(NODEIO_PT_Default)
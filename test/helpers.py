@@ -0,0 +1,72 @@
+"""Shared setup of the tests: the bpy stand-in, and small node trees built through it
+
+The tests run with plain python, from the root of the repository:
+    python -m pytest -q test
+    python -m unittest discover test
+"""
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+import fake_bpy
+fake_bpy.install()
+
+import bpy
+from generator import GraphSpec, buildMaterial
+from node_io.encoder import NodeTreeEncoder
+from node_io.nodeTree import NodeTree
+
+TEXTURE_DIR = os.path.join(ROOT, "test", "textures")
+
+# two levels of two node groups, the groups of the upper level use both groups of the lower one
+SPEC = GraphSpec(nodes=20, depth=2, groups=2, groupNodes=5)
+
+
+def makeTrees(names: list[str], imagePaths: list[str] = ()) -> list[NodeTree]:
+    """Serialize a generated material once for each name, all of them share the same node groups
+
+    Args:
+        imagePaths (list[str]): an image texture node is added for each of these files
+    """
+    fake_bpy.reset()
+    material = buildMaterial(SPEC, "Generated")
+    for path in imagePaths:
+        node = material.node_tree.nodes.new("ShaderNodeTexImage")
+        node.image = bpy.data.images.load(path)
+    groupCache = {}
+    return [NodeTree.serialize_bpy_NodeTree(material.node_tree, name, groupCache) for name in names]
+
+
+def makeDocument(name="Generated", imagePaths: list[str] = ()) -> dict:
+    """the Node Tree document of a generated material, as writeNodeTree would write it"""
+    return NodeTreeEncoder().encodeTree(makeTrees([name], imagePaths)[0])
+
+
+def encode(tree: NodeTree) -> dict:
+    return NodeTreeEncoder().encodeTree(tree)
+
+
+def roundFloats(value, digits=5):
+    """a copy of a document with its floats rounded, the binary format stores them as float32"""
+    if type(value) is float:
+        return round(value, digits)
+    if type(value) is list:
+        return [roundFloats(item, digits) for item in value]
+    if type(value) is dict:
+        return {key: roundFloats(item, digits) for key, item in value.items()}
+    return value
+
+
+def makeOperator(operatorClass, **values):
+    """an operator with the defaults of its properties, and these values"""
+    operator = operatorClass()
+    for cls in reversed(operatorClass.__mro__):
+        for name, annotation in getattr(cls, "__annotations__", {}).items():
+            if type(annotation) is tuple and annotation[0] == "_PropertyDeferred":
+                setattr(operator, name, annotation[1].get("default", [] if name == "files" else ""))
+    for name, value in values.items():
+        setattr(operator, name, value)
+    return operator
@@ -0,0 +1,93 @@
+import os
+import struct
+import tempfile
+import unittest
+
+from helpers import encode, makeDocument, roundFloats
+from node_io import binaryFormat
+from node_io.errors import VersionError
+from node_io.nodeFile import readDocument, writeDocument
+from node_io.nodeTree import NodeTree
+
+
+class TestRoundTrip(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.document = makeDocument()
+
+    def test_compressions(self):
+        for compression in binaryFormat.COMPRESSIONS:
+            with self.subTest(compression=compression):
+                data = binaryFormat.dumps(self.document, compression)
+                self.assertTrue(binaryFormat.isBinary(data))
+                self.assertEqual(roundFloats(binaryFormat.loads(data)), roundFloats(self.document))
+
+    def test_compression_shrinks(self):
+        uncompressed = len(binaryFormat.dumps(self.document, "NONE"))
+        self.assertLess(len(binaryFormat.dumps(self.document, "ZLIB")), uncompressed)
+        self.assertLess(len(binaryFormat.dumps(self.document, "LZMA")), uncompressed)
+
+    def test_tree(self):
+        tree = NodeTree.de_Serialize_Json(binaryFormat.loads(binaryFormat.dumps(self.document)))
+        self.assertEqual(roundFloats(encode(tree)), roundFloats(self.document))
+
+    def test_file(self):
+        with tempfile.TemporaryDirectory() as folder:
+            filepath = os.path.join(folder, "Generated.nodetree")
+            writeDocument(filepath, self.document, "BINARY", "ZLIB")
+            self.assertEqual(roundFloats(readDocument(filepath)), roundFloats(self.document))
+
+    def test_empty_values(self):
+        node = self.document["nodes"][0]
+        document = dict(self.document, nodes=[dict(node, data={"none": None, "empty": [], "nested": {"a": [1, "b"]}})],
+                        links=[], groups=[])
+        self.assertEqual(binaryFormat.loads(binaryFormat.dumps(document))["nodes"][0]["data"],
+                         {"none": None, "empty": [], "nested": {"a": [1, "b"]}})
+
+
+class TestMalformed(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.data = binaryFormat.dumps(makeDocument(), "ZLIB")
+
+    def test_magic(self):
+        self.assertFalse(binaryFormat.isBinary(b'{"nodes": []}'))
+        with self.assertRaisesRegex(ValueError, "Not a binary node tree file"):
+            binaryFormat.loads(b"NIOX" + self.data[4:])
+
+    def test_newer_container(self):
+        data = binaryFormat.HEADER.pack(binaryFormat.MAGIC, binaryFormat.CONTAINER_VERSION + 1,
+                                        binaryFormat.COMPRESSION_NONE) + self.data[binaryFormat.HEADER.size:]
+        with self.assertRaises(VersionError):
+            binaryFormat.loads(data)
+
+    def test_unknown_compression(self):
+        data = binaryFormat.HEADER.pack(binaryFormat.MAGIC, binaryFormat.CONTAINER_VERSION, 9)
+        with self.assertRaisesRegex(ValueError, "Unknown compression 9"):
+            binaryFormat.loads(data + self.data[binaryFormat.HEADER.size:])
+
+    def test_short_header(self):
+        with self.assertRaises(struct.error):
+            binaryFormat.loads(b"NIO")
+
+    def test_truncated_payload(self):
+        payload = binaryFormat.dumps(makeDocument(), "NONE")
+        with self.assertRaises((struct.error, IndexError, ValueError)):
+            binaryFormat.loads(payload[:len(payload) // 2])
+
+    def test_unsupported_value(self):
+        with self.assertRaisesRegex(TypeError, "Object of type set can not be stored"):
+            binaryFormat.BinaryWriter().writeValue({1})
+
+    def test_unknown_value_tag(self):
+        writer = binaryFormat.BinaryWriter()
+        writer.buffer += bytes([99])
+        reader = binaryFormat.BinaryReader(writer.buffer)
+        with self.assertRaisesRegex(ValueError, "Unknown value tag 99 at offset 0"):
+            reader.readValue()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,162 @@
+import json
+import os
+import tempfile
+import unittest
+
+from helpers import encode, makeTrees
+from node_io.bundle import BUNDLE_HEADER, BUNDLE_MAGIC, BUNDLE_VERSION, BundleReader, writeBundle
+from node_io.errors import NodeFormatError, VersionError
+from node_io.nodeTree import NodeTree
+
+# the groups of the generated materials, the upper level uses both groups of the lower one
+LOWER = ["Generated.L0.G0", "Generated.L0.G1"]
+UPPER = ["Generated.L1.G0", "Generated.L1.G1"]
+
+
+class BundleTestCase(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.folder = tempfile.TemporaryDirectory()
+        cls.trees = makeTrees(["A", "B"])
+        cls.filepath = os.path.join(cls.folder.name, "materials.nodebundle")
+        cls.groupCount = writeBundle(cls.filepath, cls.trees)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.folder.cleanup()
+
+    def writeFile(self, data: bytes) -> str:
+        filepath = os.path.join(self.folder.name, f"{self.id()}.nodebundle")
+        with open(filepath, "wb") as f:
+            f.write(data)
+        return filepath
+
+    def readBytes(self) -> bytes:
+        with open(self.filepath, "rb") as f:
+            return f.read()
+
+
+class TestRoundTrip(BundleTestCase):
+
+    def test_shared_groups_are_written_once(self):
+        self.assertEqual(self.groupCount, 4)
+        reader = BundleReader(self.filepath)
+        self.assertEqual(list(reader.groups), LOWER + UPPER)
+        self.assertEqual(reader.materials["A"]["dependencies"], UPPER)
+        self.assertEqual(reader.groups[UPPER[0]]["dependencies"], LOWER)
+
+    def test_compressions(self):
+        for compression in ("NONE", "ZLIB", "LZMA"):
+            with self.subTest(compression=compression):
+                filepath = os.path.join(self.folder.name, f"{compression}.nodebundle")
+                writeBundle(filepath, self.trees, compression)
+                reader = BundleReader(filepath)
+                materials, groups = reader.read(["A", "B"])
+                trees = NodeTree.fromBundle(reader.fileVersion, materials, groups)
+                self.assertEqual([encode(tree) for tree in trees], [encode(tree) for tree in self.trees])
+
+    def test_materials_share_subtrees(self):
+        reader = BundleReader(self.filepath)
+        a, b = NodeTree.fromBundle(reader.fileVersion, *reader.read(["A", "B"]))
+        self.assertEqual([group.name for group in a.subtrees], LOWER + UPPER)
+        self.assertTrue(all(x is y for x, y in zip(a.subtrees, b.subtrees)))
+
+    def test_lazy(self):
+        reader = BundleReader(self.filepath)
+        tree, = NodeTree.fromBundle(reader.fileVersion, *reader.read(["B"]), lazy=True)
+        self.assertEqual([encode(group.materialize()) for group in tree.subtrees],
+                         [encode(group) for group in self.trees[1].subtrees])
+
+    def test_materialNames(self):
+        reader = BundleReader(self.filepath)
+        self.assertEqual(reader.materialNames(), ["A", "B"])
+        self.assertEqual(reader.materialNames("B*"), ["B"])
+        self.assertEqual(reader.materialNames("C*"), [])
+
+
+class TestExistingGroups(BundleTestCase):
+
+    def readGroups(self, existingGroups) -> list[str]:
+        _, groups = BundleReader(self.filepath).read(["A"], existingGroups)
+        return list(groups)
+
+    def test_all_groups_are_read(self):
+        self.assertEqual(self.readGroups(frozenset()), LOWER + UPPER)
+
+    def test_groups_only_used_by_existing_groups_are_not_read(self):
+        self.assertEqual(self.readGroups(set(UPPER)), [])
+
+    def test_groups_used_by_a_missing_group_are_read(self):
+        self.assertEqual(self.readGroups({UPPER[0]}), LOWER + [UPPER[1]])
+
+    def test_without_dependencies(self):
+        # bundles written before the dependencies were stored read every group that does not exist
+        reader = BundleReader(self.filepath)
+        for entry in list(reader.materials.values()) + list(reader.groups.values()):
+            del entry["dependencies"]
+        _, groups = reader.read(["A"], set(UPPER))
+        self.assertEqual(list(groups), LOWER)
+
+    def test_existing_groups_are_left_out_of_the_tree(self):
+        reader = BundleReader(self.filepath)
+        tree, = NodeTree.fromBundle(reader.fileVersion, *reader.read(["A"], {UPPER[0]}))
+        self.assertEqual([group.name for group in tree.subtrees], LOWER + [UPPER[1]])
+
+
+class TestMalformed(BundleTestCase):
+
+    def test_short_file(self):
+        with self.assertRaisesRegex(NodeFormatError, "too short"):
+            BundleReader(self.writeFile(b"NIOK"))
+
+    def test_magic(self):
+        with self.assertRaisesRegex(NodeFormatError, "Not a node bundle file"):
+            BundleReader(self.writeFile(b"NIOB" + self.readBytes()[4:]))
+
+    def test_newer_version(self):
+        data = self.readBytes()
+        _, _, compression, indexSize = BUNDLE_HEADER.unpack_from(data)
+        header = BUNDLE_HEADER.pack(BUNDLE_MAGIC, BUNDLE_VERSION + 1, compression, indexSize)
+        with self.assertRaises(VersionError):
+            BundleReader(self.writeFile(header + data[BUNDLE_HEADER.size:]))
+
+    def test_index_json(self):
+        index = b"{not json"
+        data = BUNDLE_HEADER.pack(BUNDLE_MAGIC, BUNDLE_VERSION, 0, len(index)) + index
+        with self.assertRaisesRegex(NodeFormatError, "The index of the bundle is malformed"):
+            BundleReader(self.writeFile(data))
+
+    def test_index_fields(self):
+        index = json.dumps({"file_version": "0.3.0", "materials": [{"offset": 0}], "groups": []}).encode("utf8")
+        data = BUNDLE_HEADER.pack(BUNDLE_MAGIC, BUNDLE_VERSION, 0, len(index)) + index
+        with self.assertRaisesRegex(NodeFormatError, "The index of the bundle is malformed: KeyError"):
+            BundleReader(self.writeFile(data))
+
+    def test_broken_entry(self):
+        data = bytearray(self.readBytes())
+        reader = BundleReader(self.filepath)
+        start = reader.dataStart + reader.materials["B"]["offset"]
+        data[start:start + 8] = b"\xff" * 8
+        reader = BundleReader(self.writeFile(bytes(data)))
+        with self.assertRaisesRegex(NodeFormatError, "The bundle entry of 'B' is malformed"):
+            reader.read(["B"])
+
+    def test_missing_group(self):
+        reader = BundleReader(self.filepath)
+        del reader.groups[LOWER[0]]
+        with self.assertRaisesRegex(NodeFormatError, f"Node group '{LOWER[0]}' is missing from the bundle"):
+            reader.read(["A"])
+
+    def test_unknown_material(self):
+        with self.assertRaises(KeyError):
+            BundleReader(self.filepath).read(["C"])
+
+    def test_newer_file_version(self):
+        reader = BundleReader(self.filepath)
+        with self.assertRaises(VersionError):
+            NodeTree.fromBundle("99.0.0", *reader.read(["A"]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,105 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from helpers import TEXTURE_DIR, makeDocument, makeTrees
+from node_io import binaryFormat
+from node_io.catalog import CATALOG_FILENAME, LibraryCatalog
+from node_io.nodeFile import writeNodeTree
+from node_io.nodePack import writePack
+
+PNG = os.path.join(TEXTURE_DIR, "image.png")
+
+
+class TestLibraryCatalog(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.folder)
+        for tree, fileFormat in zip(makeTrees(["Wood", "Stone"]), ("PRETTY", "BINARY")):
+            writeNodeTree(self.getPath(f"{tree.name}.nodetree"), tree, fileFormat, "ZLIB")
+        writePack(self.getPath("Packed.nodepack"), makeDocument("Packed", [PNG]), {PNG: PNG})
+
+    def getPath(self, filename) -> str:
+        return os.path.join(self.folder, filename)
+
+    def writeFile(self, filename, data: bytes):
+        with open(self.getPath(filename), "wb") as f:
+            f.write(data)
+
+    def test_index(self):
+        catalog = LibraryCatalog(self.folder)
+        self.assertEqual(catalog.update(), (3, 0))
+        self.assertEqual(sorted(catalog.entries), ["Packed.nodepack", "Stone.nodetree", "Wood.nodetree"])
+        wood = catalog.entries["Wood.nodetree"]
+        self.assertEqual(wood["name"], "Wood")
+        self.assertEqual(wood["groups"], ["Generated.L0.G0", "Generated.L0.G1", "Generated.L1.G0", "Generated.L1.G1"])
+        self.assertIn("ShaderNodeGroup", wood["nodeTypes"])
+        # the binary file holds the same tree
+        self.assertEqual({key: value for key, value in catalog.entries["Stone.nodetree"].items()
+                          if key in ("nodeCount", "nodeTypes", "groups")},
+                         {key: value for key, value in wood.items() if key in ("nodeCount", "nodeTypes", "groups")})
+        self.assertEqual(catalog.entries["Packed.nodepack"]["images"], ["textures/image.png"])
+        self.assertEqual([filename for filename, _ in catalog.search("stone")], ["Stone.nodetree"])
+
+    def test_unchanged_files_are_not_read_again(self):
+        catalog = LibraryCatalog(self.folder)
+        catalog.update()
+        catalog.save()
+        catalog = LibraryCatalog.load(self.folder)
+        with mock.patch.object(LibraryCatalog, "indexFile") as indexFile:
+            self.assertEqual(catalog.update(), (0, 0))
+        indexFile.assert_not_called()
+        self.assertFalse(catalog.modified)
+
+    def test_changed_and_deleted_files(self):
+        catalog = LibraryCatalog(self.folder)
+        catalog.update()
+        writeNodeTree(self.getPath("Wood.nodetree"), makeTrees(["Wood"])[0], "COLUMNAR")
+        os.remove(self.getPath("Stone.nodetree"))
+        self.assertEqual(catalog.update(), (1, 1))
+        self.assertEqual(sorted(catalog.entries), ["Packed.nodepack", "Wood.nodetree"])
+
+    def test_bad_files_are_skipped(self):
+        binary = binaryFormat.dumps(makeDocument(), "ZLIB")
+        badFiles = {
+            "json.nodetree": b"{not json",
+            "list.nodetree": b"[1, 2]",
+            "empty.nodetree": b"{}",
+            "truncated.nodetree": binary[:len(binary) // 2],
+            "zlib.nodetree": binary[:binaryFormat.HEADER.size] + b"\x00" * 64,
+            "lzma.nodetree": binary[:4] + bytes([binaryFormat.CONTAINER_VERSION, binaryFormat.COMPRESSION_LZMA])
+                             + b"\x00" * 64,
+            "newer.nodetree": binary[:4] + bytes([binaryFormat.CONTAINER_VERSION + 1]) + binary[5:],
+            "broken.nodepack": b"PK\x03\x04" + b"\x00" * 64,
+        }
+        for filename, data in badFiles.items():
+            self.writeFile(filename, data)
+        catalog = LibraryCatalog(self.folder)
+        self.assertEqual(catalog.update(), (3, 0))
+        self.assertEqual(sorted(catalog.unreadable), sorted(badFiles))
+        self.assertNotIn("json.nodetree", catalog.entries)
+
+        # they are only read again once they change
+        with mock.patch.object(LibraryCatalog, "indexFile") as indexFile:
+            catalog.update()
+        indexFile.assert_not_called()
+        self.writeFile("json.nodetree", json.dumps(makeDocument("Json")).encode("utf8"))
+        self.assertEqual(catalog.update(), (1, 0))
+        self.assertNotIn("json.nodetree", catalog.unreadable)
+
+    def test_save_and_load(self):
+        catalog = LibraryCatalog(self.folder)
+        catalog.update()
+        catalog.save()
+        self.assertEqual(LibraryCatalog.load(self.folder).entries, catalog.entries)
+        with open(self.getPath(CATALOG_FILENAME), "w") as f:
+            f.write("{not json")
+        self.assertEqual(LibraryCatalog.load(self.folder).entries, {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,112 @@
+import copy
+import os
+import shutil
+import tempfile
+import unittest
+
+from helpers import encode, makeTrees
+from node_io.exportManifest import MANIFEST_FILENAME, ExportManifest
+
+
+class TestExportManifest(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.folder)
+        self.trees = makeTrees(["A", "B"])
+        self.documents = [encode(tree) for tree in self.trees]
+
+    def hashes(self, documents=None, settings="PRETTY", groupHashes=None) -> list[str]:
+        manifest = ExportManifest(self.folder)
+        groupHashes = {} if groupHashes is None else groupHashes
+        return [manifest.hashDocument(document, groupHashes, settings) for document in documents or self.documents]
+
+    def writeExport(self) -> list[str]:
+        """record both materials as written, and write their files"""
+        manifest = ExportManifest.load(self.folder)
+        groupHashes = {}
+        hashes = [manifest.hashDocument(document, groupHashes, "PRETTY") for document in self.documents]
+        for tree, contentHash in zip(self.trees, hashes):
+            with open(os.path.join(self.folder, f"{tree.name}.nodetree"), "w") as f:
+                f.write("{}")
+            manifest.record(f"{tree.name}.nodetree", contentHash, tree, groupHashes)
+        manifest.save()
+        return hashes
+
+    def test_unchanged_is_skipped(self):
+        hashes = self.writeExport()
+        manifest = ExportManifest.load(self.folder)
+        self.assertEqual(self.hashes(), hashes)
+        self.assertTrue(manifest.isUnchanged("A.nodetree", hashes[0]))
+        self.assertTrue(manifest.isUnchanged("B.nodetree", hashes[1]))
+        self.assertFalse(manifest.isUnchanged("C.nodetree", hashes[0]))
+
+    def test_deleted_file_is_written_again(self):
+        hashes = self.writeExport()
+        os.remove(os.path.join(self.folder, "A.nodetree"))
+        self.assertFalse(ExportManifest.load(self.folder).isUnchanged("A.nodetree", hashes[0]))
+
+    def test_hashNodeTree(self):
+        self.assertEqual([ExportManifest(self.folder).hashNodeTree(tree, {}, "PRETTY") for tree in self.trees],
+                         self.hashes())
+
+    def test_changed_settings(self):
+        hashes = self.hashes()
+        self.assertNotEqual(self.hashes(settings="BINARY/ZLIB"), hashes)
+        self.assertNotEqual(self.hashes(settings="PRETTY/sparse"), hashes)
+
+    def test_changed_material(self):
+        hashes = self.hashes()
+        documents = copy.deepcopy(self.documents)
+        documents[0]["nodes"][0]["location"] = [1.0, 2.0]
+        changed = self.hashes(documents)
+        self.assertNotEqual(changed[0], hashes[0])
+        self.assertEqual(changed[1], hashes[1])
+
+    def test_group_change_reaches_every_material(self):
+        hashes = self.writeExport()
+        documents = copy.deepcopy(self.documents)
+        for document in documents:
+            document["groups"][0]["nodes"][2]["inputs"][0]["value"] = 0.75
+        groupHashes = {}
+        changed = self.hashes(documents, groupHashes=groupHashes)
+        self.assertNotEqual(changed[0], hashes[0])
+        self.assertNotEqual(changed[1], hashes[1])
+
+        manifest = ExportManifest.load(self.folder)
+        group = documents[0]["groups"][0]["node_tree"]
+        self.assertNotEqual(groupHashes[group], manifest.groups[group])
+        self.assertEqual({name: groupHashes[name] for name in groupHashes if name != group},
+                         {name: manifest.groups[name] for name in groupHashes if name != group})
+        manifest.record("A.nodetree", changed[0], self.trees[0], groupHashes)
+        self.assertTrue(manifest.modified)
+        self.assertEqual(manifest.groups[group], groupHashes[group])
+
+    def test_groups_are_hashed_once_per_export(self):
+        groupHashes = {}
+        hashes = self.hashes(groupHashes=groupHashes)
+        self.assertEqual(sorted(groupHashes), sorted(group.name for group in self.trees[0].subtrees))
+        # the second material takes the hashes of the groups from the first one
+        groupHashes[self.trees[0].subtrees[0].name] = "changed"
+        manifest = ExportManifest(self.folder)
+        self.assertNotEqual(manifest.hashDocument(self.documents[1], groupHashes, "PRETTY"), hashes[1])
+
+    def test_unreadable_manifest(self):
+        with open(os.path.join(self.folder, MANIFEST_FILENAME), "w") as f:
+            f.write("{not json")
+        self.assertEqual(ExportManifest.load(self.folder).materials, {})
+
+    def test_save_only_when_modified(self):
+        self.writeExport()
+        path = os.path.join(self.folder, MANIFEST_FILENAME)
+        os.utime(path, ns=(0, 0))
+        manifest = ExportManifest.load(self.folder)
+        groupHashes = {}
+        for tree, document in zip(self.trees, self.documents):
+            manifest.record(f"{tree.name}.nodetree", manifest.hashDocument(document, groupHashes, "PRETTY"), tree, groupHashes)
+        manifest.save()
+        self.assertEqual(os.stat(path).st_mtime_ns, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
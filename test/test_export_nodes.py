@@ -0,0 +1,74 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from helpers import TEXTURE_DIR, makeOperator, makeTrees
+from node_io.encoder import NodeTreeEncoder
+from node_io.export_nodes import ExportJob, ExportMaterialNode
+from node_io.nodeFile import FILE_FORMATS, writeNodeTree
+from node_io.profiling import PhaseTimer
+
+
+def readFile(filepath) -> bytes:
+    with open(filepath, "rb") as f:
+        return f.read()
+
+
+class ExportTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.folder)
+        self.jobs = [ExportJob(tree.name, tree, "material") for tree in makeTrees(["A", "B"])]
+
+    def export(self, jobs=None, **values) -> str:
+        operator = makeOperator(ExportMaterialNode, **values)
+        return operator.writeFiles(self.folder, jobs or self.jobs, PhaseTimer())
+
+
+class TestWriteFiles(ExportTestCase):
+
+    def test_files_match_writeNodeTree(self):
+        expected = os.path.join(self.folder, "expected")
+        os.mkdir(expected)
+        for fileFormat in FILE_FORMATS:
+            self.export(file_format=fileFormat, skip_unchanged=False)
+            for job in self.jobs:
+                path = os.path.join(expected, f"{job.name}.nodetree")
+                writeNodeTree(path, job.nodetree, fileFormat, "ZLIB")
+                self.assertEqual(readFile(os.path.join(self.folder, f"{job.name}.nodetree")), readFile(path), fileFormat)
+
+    def test_each_tree_is_encoded_once(self):
+        for fileFormat in FILE_FORMATS:
+            with mock.patch.object(NodeTreeEncoder, "encodeTree", autospec=True,
+                                   side_effect=NodeTreeEncoder.encodeTree) as encodeTree:
+                self.export(file_format=fileFormat, skip_unchanged=False)
+            self.assertEqual(encodeTree.call_count, len(self.jobs), fileFormat)
+
+
+class TestSkipUnchanged(ExportTestCase):
+
+    def test_unchanged_files_are_skipped(self):
+        self.assertTrue(self.export().endswith("skipped 0 unchanged"))
+        self.assertTrue(self.export().endswith("skipped 2 unchanged"))
+
+    def test_changed_format_is_written(self):
+        self.export()
+        self.assertTrue(self.export(file_format="BINARY").endswith("skipped 0 unchanged"))
+
+    def test_changed_texture_of_a_pack_is_written(self):
+        texture = os.path.join(self.folder, "texture.png")
+        shutil.copyfile(os.path.join(TEXTURE_DIR, "image.png"), texture)
+        # the material of makeTrees is called Generated
+        jobs = [ExportJob(tree.name, tree, "material") for tree in makeTrees(["Generated"], [texture])]
+        self.assertTrue(self.export(jobs, file_format="PACK").endswith("skipped 0 unchanged"))
+        self.assertTrue(self.export(jobs, file_format="PACK").endswith("skipped 1 unchanged"))
+        with open(texture, "ab") as f:
+            f.write(b"changed")
+        self.assertTrue(self.export(jobs, file_format="PACK").endswith("skipped 0 unchanged"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,186 @@
+import copy
+import json
+import unittest
+
+from helpers import encode, makeDocument
+from node_io.encoder import VERSION, columnarDocument, compactDocument
+from node_io.errors import NodeFormatError, VersionError
+from node_io.formatSchema import SCHEMAS, getSchema, recordProblem, STRING, OPTIONAL_STRING
+from node_io.nodeTree import NodeTree
+
+
+class TestRoundTrip(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.document = makeDocument()
+
+    def roundTrip(self, document: dict) -> dict:
+        # through json, like the file would be
+        return encode(NodeTree.de_Serialize_Json(json.loads(json.dumps(document))))
+
+    def test_pretty(self):
+        self.assertEqual(self.roundTrip(self.document), self.document)
+
+    def test_compact(self):
+        self.assertEqual(self.roundTrip(compactDocument(self.document)), self.document)
+
+    def test_columnar(self):
+        self.assertEqual(self.roundTrip(columnarDocument(self.document)), self.document)
+
+    def test_lazy_groups_read_the_same(self):
+        for document in (self.document, columnarDocument(self.document)):
+            tree = NodeTree.de_Serialize_Json(document, lazy=True)
+            self.assertEqual([encode(subtree.materialize()) for subtree in tree.subtrees],
+                             [encode(NodeTree.fromJson(group)) for group in self.document["groups"]])
+
+
+class TestMalformed(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.document = makeDocument()
+
+    def assertMalformed(self, change, message: str, lazy=False):
+        document = copy.deepcopy(self.document)
+        change(document)
+        with self.assertRaises(NodeFormatError) as raised:
+            tree = NodeTree.de_Serialize_Json(document, lazy)
+            # lazy groups are checked when they are built
+            for subtree in tree.subtrees:
+                subtree.materialize()
+        self.assertIn(message, str(raised.exception))
+
+    def test_not_an_object(self):
+        with self.assertRaisesRegex(NodeFormatError, "holds a list"):
+            NodeTree.de_Serialize_Json([1, 2])
+
+    def test_missing_node_field(self):
+        self.assertMalformed(lambda d: d["nodes"][1].pop("type"), "Node 1 'OutputMaterial' of 'Generated': missing 'type'")
+
+    def test_socket_value(self):
+        self.assertMalformed(lambda d: d["nodes"][0]["inputs"][0].update(value={"x": 1}),
+                             "input 0: value is a dict")
+
+    def test_link_socket_index(self):
+        self.assertMalformed(lambda d: d["links"][0].update(from_socket_index="3"),
+                             "Link 0 of 'Generated': 'from_socket_index' is a str")
+
+    def test_group_socket(self):
+        for lazy in (False, True):
+            self.assertMalformed(lambda d: d["groups"][0]["nodes"][0]["outputs"].append(5),
+                                 "expected an object, found int", lazy)
+
+    def test_group_table(self):
+        self.assertMalformed(lambda d: d.update(groups={}), "The node group table is not a list")
+
+    def test_missing_nodes(self):
+        self.assertMalformed(lambda d: d.pop("nodes"), "The node tree: missing 'nodes'")
+
+    def test_version_string(self):
+        self.assertMalformed(lambda d: d.update(file_version="x.y"), "'x.y' is not a file version")
+
+    def test_newer_version(self):
+        document = dict(self.document, file_version="99.0.0")
+        with self.assertRaises(VersionError):
+            NodeTree.de_Serialize_Json(document)
+
+    def test_compact(self):
+        document = compactDocument(self.document)
+        del document["n"][0]["i"]
+        with self.assertRaisesRegex(NodeFormatError, "The compact file is malformed"):
+            NodeTree.de_Serialize_Json(document)
+
+    def test_columnar_link(self):
+        document = columnarDocument(self.document)
+        document["links"]["from_node"][0] = 999
+        with self.assertRaisesRegex(NodeFormatError, "a link points to a node that does not exist"):
+            NodeTree.de_Serialize_Json(document)
+
+    def test_columnar_socket_count(self):
+        document = columnarDocument(self.document)
+        document["nodes"]["inputs"][0] += 1
+        with self.assertRaisesRegex(NodeFormatError, "do not add up"):
+            NodeTree.de_Serialize_Json(document)
+
+    def test_columnar_string_index(self):
+        document = columnarDocument(self.document)
+        document["groups"][0]["sockets"]["name"][0] = 10 ** 6
+        for lazy in (False, True):
+            with self.assertRaisesRegex(NodeFormatError, "Node group 0: a socket string index"):
+                NodeTree.de_Serialize_Json(document, lazy)
+
+    def assertColumnarMalformed(self, change, message: str):
+        document = columnarDocument(self.document)
+        change(document)
+        for lazy in (False, True):
+            with self.assertRaises(NodeFormatError) as raised:
+                tree = NodeTree.de_Serialize_Json(document, lazy)
+                for subtree in tree.subtrees:
+                    subtree.materialize()
+            self.assertIn(message, str(raised.exception))
+
+    def test_columnar_socket_count_type(self):
+        self.assertColumnarMalformed(lambda d: d["nodes"]["inputs"].__setitem__(0, "3"),
+                                     "The node tree: a socket count is not a whole number")
+
+    def test_columnar_location(self):
+        self.assertColumnarMalformed(lambda d: d["nodes"]["location"].__setitem__(0, "a"),
+                                     "The node tree: the location column holds a value that is not a number")
+
+    def test_columnar_link_socket_index(self):
+        self.assertColumnarMalformed(lambda d: d["links"]["to_socket_index"].__setitem__(0, "1"),
+                                     "The node tree: a link socket index is not a whole number")
+
+    def test_columnar_node_data(self):
+        self.assertColumnarMalformed(lambda d: d["nodes"]["data"].__setitem__(1, 5),
+                                     "Node 1 'OutputMaterial' of 'Generated': data is not an object")
+        self.assertColumnarMalformed(lambda d: d["nodes"]["data"].__setitem__(1, None), "data is not an object")
+
+    def test_columnar_socket_value(self):
+        def change(document):
+            # the second input of the first node
+            document["sockets"]["value"][1] = {"x": 1}
+        self.assertColumnarMalformed(change, "Node 0 'BsdfPrincipled' of 'Generated', input 1: value is a dict")
+
+    def test_columnar_socket_list(self):
+        def change(document):
+            document["groups"][0]["sockets"]["value"][0] = ["a", 1]
+        self.assertColumnarMalformed(change, "value is not a list of numbers")
+
+    def test_columnar_socket_type(self):
+        self.assertColumnarMalformed(lambda d: d["sockets"]["type"].__setitem__(0, None),
+                                     "The node tree: a socket has no type")
+
+    def test_columnar_string_table(self):
+        self.assertColumnarMalformed(lambda d: d["strings"].append(5), "holds a value that is not a string")
+
+
+class TestSchemas(unittest.TestCase):
+
+    def test_newest_schema_is_current_version(self):
+        self.assertEqual(SCHEMAS[-1].version, tuple(int(part) for part in VERSION.split(".")))
+
+    def test_getSchema(self):
+        self.assertIs(getSchema((0, 0, 1)), SCHEMAS[0])
+        self.assertIs(getSchema((0, 0, 0)), SCHEMAS[0])
+        self.assertIs(getSchema((0, 1, 5)), SCHEMAS[1])
+        self.assertIs(getSchema((9, 0, 0)), SCHEMAS[-1])
+
+    def test_legacy_sockets_need_no_type(self):
+        socket = {"name": "Fac", "value": 0.5}
+        SCHEMAS[0].checkSocket(socket, {"name": "Mix"}, "Material", 0, "input", 0)
+        with self.assertRaisesRegex(NodeFormatError, "Node 0 'Mix' of 'Material', input 0: missing 'type'"):
+            SCHEMAS[-1].checkSocket(socket, {"name": "Mix"}, "Material", 0, "input", 0)
+
+    def test_recordProblem(self):
+        fields = {"name": STRING, "identifier": OPTIONAL_STRING}
+        self.assertIsNone(recordProblem({"name": "a"}, fields))
+        self.assertEqual(recordProblem({}, fields), "missing 'name'")
+        self.assertEqual(recordProblem({"name": 1}, fields), "'name' is a int")
+        self.assertEqual(recordProblem({"name": "a", "identifier": 2}, fields), "'identifier' is a int")
+        self.assertEqual(recordProblem("a", fields), "expected an object, found str")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,112 @@
+import contextlib
+import io
+import os
+import shutil
+import tempfile
+import types
+import unittest
+
+from helpers import bpy, makeDocument, makeTrees, makeOperator
+from node_io import binaryFormat
+from node_io.import_nodes import ImportNodeBundle, ImporttMaterialNodes, importNodeTree
+from node_io.nodeFile import writeNodeTree
+
+CONTEXT = types.SimpleNamespace(object=None, active_object=None, window_manager=None)
+
+
+class TestImportOperator(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.folder)
+
+    def writeFiles(self, names: list[str]):
+        for tree in makeTrees(names):
+            writeNodeTree(os.path.join(self.folder, f"{tree.name}.nodetree"), tree)
+
+    def test_folder_with_one_file(self):
+        self.writeFiles(["A"])
+        operator = makeOperator(ImporttMaterialNodes, filepath=self.folder + os.sep, directory=self.folder)
+        self.assertEqual(operator.execute(CONTEXT), {'FINISHED'})
+        self.assertIn("A", bpy.data.materials)
+
+    def test_folder_with_one_file_in_background(self):
+        self.writeFiles(["A"])
+        operator = makeOperator(ImporttMaterialNodes, filepath=self.folder + os.sep, directory=self.folder,
+                                background_import=True)
+        parsed = []
+        operator.startBackgroundImport = lambda context, filepath, timer: parsed.append(filepath) or {'RUNNING_MODAL'}
+        operator.execute(CONTEXT)
+        self.assertEqual(parsed, [os.path.join(self.folder, "A.nodetree")])
+
+    def test_folder(self):
+        self.writeFiles(["A", "B"])
+        operator = makeOperator(ImporttMaterialNodes, filepath=self.folder + os.sep, directory=self.folder)
+        self.assertEqual(operator.execute(CONTEXT), {'FINISHED'})
+        self.assertIn("A", bpy.data.materials)
+        self.assertIn("B", bpy.data.materials)
+
+    def test_failed_files_are_reported_not_printed(self):
+        self.writeFiles(["A"])
+        with open(os.path.join(self.folder, "broken.nodetree"), "w") as f:
+            f.write("{not json")
+        operator = makeOperator(ImporttMaterialNodes, filepath=self.folder + os.sep, directory=self.folder)
+        reports = []
+        operator.report = lambda type, message: reports.append((type, message))
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            self.assertEqual(operator.execute(CONTEXT), {'FINISHED'})
+        self.assertEqual(output.getvalue(), "")
+        self.assertEqual([type for type, _ in reports], [{"ERROR"}, {"WARNING"}])
+        self.assertTrue(reports[0][1].startswith("broken.nodetree: Selected File is Invalid"))
+        self.assertIn("Imported 1 of 2 files", reports[1][1])
+
+
+class TestMalformedFiles(unittest.TestCase):
+    """a malformed file is reported, not raised"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.folder = tempfile.TemporaryDirectory()
+        binary = binaryFormat.dumps(makeDocument(), "ZLIB")
+        cls.files = {}
+        for name, data in (("json", b"{not json"), ("list", b"[1, 2]"), ("truncated", binary[:len(binary) // 2]),
+                           ("zlib", binary[:binaryFormat.HEADER.size] + b"\x00" * 64),
+                           ("lzma", binary[:4] + bytes([binaryFormat.CONTAINER_VERSION, binaryFormat.COMPRESSION_LZMA])
+                            + b"\x00" * 64)):
+            cls.files[name] = os.path.join(cls.folder.name, f"{name}.nodetree")
+            with open(cls.files[name], "wb") as f:
+                f.write(data)
+        cls.files["missing"] = os.path.join(cls.folder.name, "missing.nodetree")
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.folder.cleanup()
+
+    def test_importNodeTree(self):
+        for name, filepath in self.files.items():
+            with self.subTest(name):
+                node_tree, material, report = importNodeTree(filepath)
+                self.assertIsNone(material)
+                self.assertEqual(report[0], {"ERROR"})
+                self.assertTrue(report[1].startswith("Selected File is Invalid"))
+
+    def test_background_import(self):
+        for name, filepath in self.files.items():
+            with self.subTest(name):
+                operator = makeOperator(ImporttMaterialNodes, filepath=filepath, background_import=True)
+                self.assertEqual(operator.execute(CONTEXT), {'CANCELLED'})
+
+    def test_several_files(self):
+        operator = makeOperator(ImporttMaterialNodes, filepath=self.folder.name + os.sep, directory=self.folder.name)
+        self.assertEqual(operator.execute(CONTEXT), {'CANCELLED'})
+
+    def test_bundle(self):
+        for name, filepath in self.files.items():
+            with self.subTest(name):
+                operator = makeOperator(ImportNodeBundle, filepath=filepath)
+                self.assertEqual(operator.execute(CONTEXT), {'CANCELLED'})
+
+
+if __name__ == "__main__":
+    unittest.main()
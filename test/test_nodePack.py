@@ -0,0 +1,183 @@
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+import zipfile
+
+from helpers import TEXTURE_DIR, encode, makeDocument
+from node_io.errors import NodeFormatError, VersionError
+from node_io.nodeFile import parseDocument, readDocument
+from node_io.nodePack import (EXTRACT_SUFFIX, PACK_INDEX, PACK_VERSION, TEXTURE_FOLDER, NodePack,
+                              documentImages, writePack)
+from node_io.nodeTree import NodeTree
+
+PNG = os.path.join(TEXTURE_DIR, "image.png")
+JPG = os.path.join(TEXTURE_DIR, "image.jpg")
+
+
+class PackTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.folder)
+        self.document = makeDocument("Packed", [PNG, JPG])
+        self.filepath = os.path.join(self.folder, "Packed.nodepack")
+        writePack(self.filepath, json.loads(json.dumps(self.document)), {PNG: PNG, JPG: readFile(JPG)})
+        self.textureFolder = os.path.join(self.folder, "Packed" + EXTRACT_SUFFIX)
+
+    def writeArchive(self, members: dict[str, str | bytes]) -> str:
+        filepath = os.path.join(self.folder, "broken.nodepack")
+        with zipfile.ZipFile(filepath, "w") as archive:
+            for name, data in members.items():
+                archive.writestr(name, data)
+        return filepath
+
+
+def readFile(filepath) -> bytes:
+    with open(filepath, "rb") as f:
+        return f.read()
+
+
+class TestRoundTrip(PackTestCase):
+
+    def test_index(self):
+        with zipfile.ZipFile(self.filepath) as archive:
+            index = json.loads(archive.read(PACK_INDEX))
+        self.assertEqual(index, {
+            "pack_version": PACK_VERSION,
+            "tree": "Packed.nodetree",
+            "textures": [TEXTURE_FOLDER + "image.jpg", TEXTURE_FOLDER + "image.png"],
+        })
+
+    def test_extracted_textures(self):
+        document = NodePack(self.filepath).readDocument()
+        paths = [data["image"] for data in documentImages(document)]
+        self.assertEqual(paths, [os.path.join(self.textureFolder, "image.png"), os.path.join(self.textureFolder, "image.jpg")])
+        self.assertEqual(readFile(paths[0]), readFile(PNG))
+        self.assertEqual(readFile(paths[1]), readFile(JPG))
+
+    def test_tree(self):
+        # the tree is stored in the columnar layout
+        tree = encode(NodeTree.de_Serialize_Json(NodePack(self.filepath).readDocument()))
+        for data in documentImages(tree):
+            data["image"] = os.path.join(TEXTURE_DIR, os.path.basename(data["image"]))
+        self.assertEqual(tree, self.document)
+
+    def test_without_extracting(self):
+        document = NodePack(self.filepath).readDocument(extractTextures=False)
+        self.assertEqual([data["image"] for data in documentImages(document)],
+                         [TEXTURE_FOLDER + "image.png", TEXTURE_FOLDER + "image.jpg"])
+        self.assertFalse(os.path.exists(self.textureFolder))
+
+    def test_nodeFile(self):
+        self.assertEqual(readDocument(self.filepath), NodePack(self.filepath).readDocument())
+        self.assertEqual(parseDocument(readFile(self.filepath)), NodePack(self.filepath).readDocument(extractTextures=False))
+
+    def test_same_file_names(self):
+        other = os.path.join(self.folder, "other", "image.png")
+        os.makedirs(os.path.dirname(other))
+        shutil.copyfile(JPG, other)
+        document = makeDocument("Packed", [PNG, other])
+        writePack(self.filepath, document, {PNG: PNG, other: other})
+        self.assertEqual([data["image"] for data in documentImages(document)],
+                         [TEXTURE_FOLDER + "image.png", TEXTURE_FOLDER + "image.001.png"])
+        document = NodePack(self.filepath).readDocument()
+        self.assertEqual([readFile(data["image"]) for data in documentImages(document)], [readFile(PNG), readFile(JPG)])
+
+    def test_contentHash(self):
+        contentHash = NodePack(self.filepath).contentHash()
+        writePack(self.filepath, json.loads(json.dumps(self.document)), {PNG: PNG, JPG: readFile(JPG)})
+        self.assertEqual(NodePack(self.filepath).contentHash(), contentHash)
+        writePack(self.filepath, json.loads(json.dumps(self.document)), {PNG: PNG, JPG: readFile(PNG)})
+        self.assertNotEqual(NodePack(self.filepath).contentHash(), contentHash)
+
+
+class TestExtract(PackTestCase):
+
+    def extractedPath(self) -> str:
+        NodePack(self.filepath).readDocument()
+        return os.path.join(self.textureFolder, "image.png")
+
+    def test_unchanged_textures_are_kept(self):
+        path = self.extractedPath()
+        os.utime(path, ns=(0, 0))
+        self.extractedPath()
+        self.assertEqual(os.stat(path).st_mtime_ns, 0)
+
+    def test_changed_textures_of_the_same_size_are_extracted_again(self):
+        path = self.extractedPath()
+        data = bytearray(readFile(path))
+        data[-1] ^= 0xFF
+        with open(path, "wb") as f:
+            f.write(data)
+        self.extractedPath()
+        self.assertEqual(readFile(path), readFile(PNG))
+
+    def test_members_stay_in_the_texture_folder(self):
+        pack = NodePack(self.filepath)
+        with zipfile.ZipFile(self.filepath) as archive:
+            self.assertIsNone(pack.extractTexture(archive, "Packed.nodetree"))
+            self.assertIsNone(pack.extractTexture(archive, TEXTURE_FOLDER))
+            self.assertIsNone(pack.extractTexture(archive, TEXTURE_FOLDER + "missing.png"))
+        document = {"node_tree": "Packed", "nodes": [{"data": {"image": TEXTURE_FOLDER + "../../image.png"}}]}
+        filepath = self.writeArchive({
+            PACK_INDEX: json.dumps({"tree": "Packed.nodetree"}),
+            "Packed.nodetree": json.dumps(document),
+            TEXTURE_FOLDER + "../../image.png": b"png",
+        })
+        document = NodePack(filepath).readDocument()
+        self.assertEqual(document["nodes"][0]["data"]["image"],
+                         os.path.join(self.folder, "broken" + EXTRACT_SUFFIX, "image.png"))
+        self.assertFalse(os.path.exists(os.path.join(os.path.dirname(self.folder), "image.png")))
+
+    def test_file_objects_are_not_extracted(self):
+        pack = NodePack(io.BytesIO(readFile(self.filepath)))
+        self.assertIsNone(pack.textureFolder)
+        self.assertEqual(pack.readDocument(extractTextures=False), NodePack(self.filepath).readDocument(extractTextures=False))
+
+
+class TestMalformed(PackTestCase):
+
+    def test_not_a_zip(self):
+        filepath = os.path.join(self.folder, "text.nodepack")
+        with open(filepath, "w") as f:
+            f.write("{}")
+        with self.assertRaisesRegex(NodeFormatError, "Not a node pack"):
+            NodePack(filepath)
+
+    def test_no_index(self):
+        with self.assertRaisesRegex(NodeFormatError, "Not a node pack"):
+            NodePack(self.writeArchive({"Packed.nodetree": "{}"}))
+
+    def test_index_json(self):
+        with self.assertRaisesRegex(NodeFormatError, "Not a node pack"):
+            NodePack(self.writeArchive({PACK_INDEX: "{not json"}))
+
+    def test_index_without_tree(self):
+        with self.assertRaisesRegex(NodeFormatError, "names no node tree"):
+            NodePack(self.writeArchive({PACK_INDEX: json.dumps({"pack_version": PACK_VERSION})}))
+
+    def test_newer_version(self):
+        with self.assertRaises(VersionError):
+            NodePack(self.writeArchive({PACK_INDEX: json.dumps({"pack_version": PACK_VERSION + 1, "tree": "a"})}))
+
+    def test_missing_tree(self):
+        pack = NodePack(self.writeArchive({PACK_INDEX: json.dumps({"tree": "Packed.nodetree"})}))
+        with self.assertRaisesRegex(NodeFormatError, "The node tree Packed.nodetree is missing"):
+            pack.readDocument()
+
+    def test_tree_json(self):
+        pack = NodePack(self.writeArchive({PACK_INDEX: json.dumps({"tree": "Packed.nodetree"}), "Packed.nodetree": "{"}))
+        with self.assertRaisesRegex(NodeFormatError, "The node tree of the node pack is malformed"):
+            pack.readDocument()
+
+    def test_tree_records(self):
+        pack = NodePack(self.writeArchive({PACK_INDEX: json.dumps({"tree": "Packed.nodetree"}), "Packed.nodetree": "[]"}))
+        with self.assertRaisesRegex(NodeFormatError, "The node tree of the node pack is malformed"):
+            pack.readDocument()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,139 @@
+import os
+import tempfile
+import unittest
+
+from helpers import SPEC, bpy, encode, fake_bpy, makeDocument, roundFloats
+from generator import buildMaterial
+from node_io.encoder import VERSION
+from node_io.errors import NodeGroupCycleError
+from node_io.nodeFile import FILE_FORMATS, readDocument, writeNodeTree
+from node_io.nodeTree import NodeTree, sortNodeGroups
+from node_io.nodelink import getSocketIndices
+
+
+def groupRecord(name: str, *uses: str) -> dict:
+    """a node group with a group node for each of the groups it uses"""
+    nodes = [{"name": f"Group.{index}", "type": "ShaderNodeGroup", "location": [0.0, 0.0],
+              "inputs": [], "outputs": [], "data": {"subtree": use}} for index, use in enumerate(uses)]
+    return {"node_tree": name, "nodes": nodes, "links": []}
+
+
+class TestSortNodeGroups(unittest.TestCase):
+
+    def sortedNames(self, *groups: dict) -> list[list[str]]:
+        """the sorted group names, of the built and of the lazy node group table"""
+        document = {"file_version": VERSION, "node_tree": "Material", "nodes": [], "links": [], "groups": list(groups)}
+        return [[subtree.name for subtree in sortNodeGroups(NodeTree.de_Serialize_Json(document, lazy).subtrees)]
+                for lazy in (False, True)]
+
+    def assertSorted(self, expected: list[str], *groups: dict):
+        for names in self.sortedNames(*groups):
+            self.assertEqual(names, expected)
+
+    def test_groups_come_after_the_groups_they_use(self):
+        self.assertSorted(["C", "B", "A"], groupRecord("A", "B", "C"), groupRecord("B", "C"), groupRecord("C"))
+
+    def test_table_order_is_kept_between_independent_groups(self):
+        self.assertSorted(["B", "A", "D", "C"], groupRecord("A", "B"), groupRecord("B"), groupRecord("C", "D"),
+                          groupRecord("D"))
+
+    def test_generated_table(self):
+        document = makeDocument()
+        document["groups"].reverse()
+        tree = NodeTree.de_Serialize_Json(document)
+        order = [subtree.name for subtree in sortNodeGroups(tree.subtrees)]
+        for subtree in tree.subtrees:
+            for dependency in subtree.getGroupDependencies():
+                self.assertLess(order.index(dependency), order.index(subtree.name))
+
+    def test_missing_groups_are_left_out(self):
+        self.assertSorted(["A"], groupRecord("A", "InBlendFile"))
+
+    def test_duplicate_names_are_kept_once(self):
+        for names in self.sortedNames(groupRecord("A"), groupRecord("A", "B"), groupRecord("B")):
+            self.assertEqual(names, ["A", "B"])
+
+    def test_group_that_uses_itself(self):
+        for lazy in (False, True):
+            document = {"file_version": VERSION, "node_tree": "Material", "nodes": [], "links": [],
+                        "groups": [groupRecord("A", "A")]}
+            with self.assertRaisesRegex(NodeGroupCycleError, "Node group uses itself: A -> A"):
+                sortNodeGroups(NodeTree.de_Serialize_Json(document, lazy).subtrees)
+
+    def test_cycle_through_other_groups(self):
+        document = {"file_version": VERSION, "node_tree": "Material", "nodes": [], "links": [],
+                    "groups": [groupRecord("Top", "A"), groupRecord("A", "B"), groupRecord("B", "C"),
+                               groupRecord("C", "A")]}
+        with self.assertRaisesRegex(NodeGroupCycleError, "A -> B -> C -> A"):
+            sortNodeGroups(NodeTree.de_Serialize_Json(document).subtrees)
+
+
+class TestSparseRoundTrip(unittest.TestCase):
+    """a sparse export imports as the same material as a full one"""
+
+    def test_import_of_sparse_files(self):
+        fake_bpy.reset()
+        material = buildMaterial(SPEC, "Generated")
+        full = encode(NodeTree.serialize_bpy_NodeTree(material.node_tree, "Generated"))
+        sparseTree = NodeTree.serialize_bpy_NodeTree(material.node_tree, "Generated", sparse=True)
+        self.assertLess(len(str(encode(sparseTree))), len(str(full)))
+
+        with tempfile.TemporaryDirectory() as folder:
+            for fileFormat in FILE_FORMATS:
+                filepath = os.path.join(folder, f"{fileFormat}.nodetree")
+                writeNodeTree(filepath, sparseTree, fileFormat, "ZLIB")
+                fake_bpy.reset()
+                imported = NodeTree.de_Serialize_Json(readDocument(filepath)).updateMaterial()
+                exported = encode(NodeTree.serialize_bpy_NodeTree(imported.node_tree, "Generated"))
+                # the binary format stores floats as float32
+                self.assertEqual(roundFloats(exported), roundFloats(full), fileFormat)
+
+
+class TestLinksBetweenSocketsOfTheSameName(unittest.TestCase):
+    """the Mix node has three "Result" outputs and several "A" and "B" inputs"""
+
+    def setUp(self):
+        fake_bpy.reset()
+        self.material = bpy.data.materials.new("Mat")
+        self.material.use_nodes = True
+        nodes = self.material.node_tree.nodes
+        links = self.material.node_tree.links
+        first = nodes.new("ShaderNodeMix")
+        second = nodes.new("ShaderNodeMix")
+        # Result_Color into A_Color, and Result_Vector into the normal
+        links.new(first.outputs[2], second.inputs[5])
+        links.new(second.outputs[1], nodes["BsdfPrincipled"].inputs["Normal"])
+        self.document = encode(NodeTree.serialize_bpy_NodeTree(self.material.node_tree, "Mat"))
+
+    def linkSockets(self, material) -> list[tuple]:
+        return sorted((link.from_node.name, link.from_socket.identifier, link.to_node.name, link.to_socket.identifier)
+                      for link in material.node_tree.links)
+
+    def test_getSocketIndices(self):
+        mix = self.material.node_tree.nodes["Mix"]
+        indices = getSocketIndices(self.material.node_tree)
+        self.assertEqual([indices[socket.as_pointer()] for socket in mix.outputs], [0, 1, 2])
+        self.assertEqual([indices[socket.as_pointer()] for socket in mix.inputs if socket.name == "A"], [1, 3, 5])
+
+    def test_links_store_the_socket_index(self):
+        self.assertEqual(sorted((link["from_socket"], link["from_socket_index"], link["to_socket"], link["to_socket_index"])
+                                for link in self.document["links"]),
+                         [("Result", 1, "Normal", 5), ("Result", 2, "A", 5)])
+
+    def test_import(self):
+        expected = self.linkSockets(self.material)
+        bpy.data.materials.remove(self.material)
+        material = NodeTree.de_Serialize_Json(self.document).updateMaterial()
+        self.assertEqual(self.linkSockets(material), expected)
+        self.assertIn(("Mix", "Result_Color", "Mix.001", "A_Color"), expected)
+
+    def test_files_without_socket_indices_link_by_name(self):
+        for link in self.document["links"]:
+            link["from_socket_index"] = link["to_socket_index"] = None
+        bpy.data.materials.remove(self.material)
+        material = NodeTree.de_Serialize_Json(self.document).updateMaterial()
+        self.assertIn(("Mix", "Result_Float", "Mix.001", "A_Float"), self.linkSockets(material))
+
+
+if __name__ == "__main__":
+    unittest.main()
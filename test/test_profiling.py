@@ -0,0 +1,57 @@
+import json
+import os
+import tempfile
+import unittest
+
+import helpers  # noqa: F401, puts the repository on the path
+from node_io.profiling import PhaseTimer
+
+
+class TestPhaseTimer(unittest.TestCase):
+
+    def test_counts_are_kept_by_phase(self):
+        timer = PhaseTimer()
+        with timer.phase("nodes"):
+            timer.count("nodes", 3)
+        with timer.phase("links"):
+            timer.count("links", 2)
+            with timer.phase("nodes"):
+                timer.count("nodes")
+        with timer.phase("nodes"):
+            timer.count("nodes")
+        self.assertEqual(timer.phaseCounts, {"nodes": {"nodes": 5}, "links": {"links": 2}})
+        self.assertEqual(timer.counts, {"nodes": 5, "links": 2})
+
+    def test_counts_outside_of_phases_are_only_totals(self):
+        timer = PhaseTimer()
+        timer.count("files")
+        with timer.phase("read"):
+            timer.count("files")
+        self.assertEqual(timer.counts, {"files": 2})
+        self.assertEqual(timer.phaseCounts, {"read": {"files": 1}})
+
+    def test_nested_phase_times_add_up(self):
+        timer = PhaseTimer()
+        with timer.phase("outer"):
+            with timer.phase("inner"):
+                sum(range(10000))
+        total = timer.getTotal()
+        self.assertEqual(list(timer.phases), ["inner", "outer"])
+        self.assertLessEqual(sum(timer.phases.values()), total)
+
+    def test_writeTrace(self):
+        timer = PhaseTimer(trace=True)
+        with timer.phase("read"):
+            timer.count("files", 2)
+        with tempfile.TemporaryDirectory() as folder:
+            filepath = os.path.join(folder, "trace.json")
+            timer.writeTrace(filepath)
+            with open(filepath, encoding="utf8") as f:
+                trace = json.load(f)
+        self.assertEqual(trace["counts"], {"files": 2})
+        self.assertEqual(trace["phaseCounts"], {"read": {"files": 2}})
+        self.assertEqual([event["name"] for event in trace["traceEvents"]], ["read"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,150 @@
+import copy
+import unittest
+
+from helpers import bpy, encode, fake_bpy
+from node_io.nodeTree import ImportContext, NodeTree
+
+
+def buildScene():
+    """a material with a principled bsdf, a mix node and a group node of a small node group"""
+    fake_bpy.reset()
+    group = bpy.data.node_groups.new("Inner", "ShaderNodeTree")
+    group.inputs.new("NodeSocketFloat", "In")
+    group.outputs.new("NodeSocketFloat", "Out")
+    groupInput = group.nodes.new("NodeGroupInput")
+    groupInput.outputs.new("NodeSocketFloat", "In")
+    groupOutput = group.nodes.new("NodeGroupOutput")
+    groupOutput.inputs.new("NodeSocketFloat", "Out")
+    math = group.nodes.new("ShaderNodeMath")
+    group.links.new(groupInput.outputs[0], math.inputs[0])
+    group.links.new(math.outputs[0], groupOutput.inputs[0])
+
+    material = bpy.data.materials.new("Mat")
+    material.use_nodes = True
+    nodes = material.node_tree.nodes
+    links = material.node_tree.links
+    bsdf = nodes["BsdfPrincipled"]
+    links.new(bsdf.outputs[0], nodes["OutputMaterial"].inputs[0])
+    mix = nodes.new("ShaderNodeMix")
+    mix.data_type = "RGBA"
+    links.new(mix.outputs[2], bsdf.inputs["Base Color"])
+    groupNode = nodes.new("ShaderNodeGroup")
+    groupNode.node_tree = group
+    links.new(groupNode.outputs[0], bsdf.inputs["Metallic"])
+    return material
+
+
+def findSocket(document: dict, nodeName: str, socketName: str, side="inputs") -> dict:
+    node = next(node for node in document["nodes"] if node["name"] == nodeName)
+    return next(socket for socket in node[side] if socket["name"] == socketName)
+
+
+def sortRecords(document: dict) -> dict:
+    """a document with its nodes and links sorted, the ones that are added again come last in blender"""
+    return dict(document, nodes=sorted(document["nodes"], key=lambda node: node["name"]),
+                links=sorted(document["links"], key=lambda link: (link["to_node"], link["to_socket"])))
+
+
+class TestUpdateMaterial(unittest.TestCase):
+
+    def setUp(self):
+        self.material = buildScene()
+        self.document = encode(NodeTree.serialize_bpy_NodeTree(self.material.node_tree, "Mat"))
+
+    def assertMaterialMatches(self, document: dict):
+        exported = encode(NodeTree.serialize_bpy_NodeTree(self.material.node_tree, "Mat"))
+        self.assertEqual(sortRecords(exported), sortRecords(document))
+
+    def update(self, document: dict = None) -> dict:
+        """update the material from a document, returns the counts of the import"""
+        tree = NodeTree.de_Serialize_Json(copy.deepcopy(document or self.document))
+        context = ImportContext()
+        self.assertIs(tree.updateMaterial(context=context), self.material)
+        return context.timer.counts
+
+    def test_unchanged(self):
+        counts = self.update()
+        for name in ("updated nodes", "removed nodes", "nodes", "added links", "removed links", "groups"):
+            self.assertNotIn(name, counts)
+
+    def test_socket_value(self):
+        findSocket(self.document, "BsdfPrincipled", "Roughness")["value"] = 0.9
+        counts = self.update()
+        self.assertAlmostEqual(self.material.node_tree.nodes["BsdfPrincipled"].inputs["Roughness"].default_value, 0.9)
+        self.assertEqual(counts["updated nodes"], 1)
+
+    def test_group_node_input_value(self):
+        findSocket(self.document, "Group", "In")["value"] = 0.777
+        counts = self.update()
+        self.assertAlmostEqual(self.material.node_tree.nodes["Group"].inputs["In"].default_value, 0.777)
+        self.assertEqual(counts["updated nodes"], 1)
+
+    def test_new_material_gets_group_node_input_values(self):
+        findSocket(self.document, "Group", "In")["value"] = 0.777
+        bpy.data.materials.remove(self.material)
+        tree = NodeTree.de_Serialize_Json(self.document)
+        self.material = tree.updateMaterial()
+        self.assertAlmostEqual(self.material.node_tree.nodes["Group"].inputs["In"].default_value, 0.777)
+
+    def test_property(self):
+        next(node for node in self.document["nodes"] if node["name"] == "Mix")["data"]["blend_type"] = "MULTIPLY"
+        self.update()
+        self.assertEqual(self.material.node_tree.nodes["Mix"].blend_type, "MULTIPLY")
+
+    def test_missing_node_and_links_are_added(self):
+        node_tree = self.material.node_tree
+        node_tree.nodes.remove(node_tree.nodes["Mix"])
+        counts = self.update()
+        self.assertIn("Mix", node_tree.nodes)
+        self.assertEqual(counts["nodes"], 1)
+        self.assertEqual(counts["added links"], 1)
+        self.assertMaterialMatches(self.document)
+
+    def test_extra_node_and_links_are_removed(self):
+        node_tree = self.material.node_tree
+        extra = node_tree.nodes.new("ShaderNodeMath")
+        node_tree.links.new(extra.outputs[0], node_tree.nodes["BsdfPrincipled"].inputs["Roughness"])
+        node_tree.links.new(node_tree.nodes["Group"].outputs[0], node_tree.nodes["Mix"].inputs[0])
+        counts = self.update()
+        self.assertNotIn(extra.name, node_tree.nodes)
+        self.assertEqual(counts["removed nodes"], 1)
+        self.assertEqual(counts["removed links"], 1)
+        self.assertMaterialMatches(self.document)
+
+    def test_changed_type_is_replaced(self):
+        node_tree = self.material.node_tree
+        node_tree.nodes.remove(node_tree.nodes["Mix"])
+        node_tree.nodes.new("ShaderNodeMath").name = "Mix"
+        self.update()
+        self.assertEqual(node_tree.nodes["Mix"].bl_idname, "ShaderNodeMix")
+
+    def test_sparse_defaults(self):
+        sparse = encode(NodeTree.serialize_bpy_NodeTree(self.material.node_tree, "Mat", sparse=True))
+        self.assertNotIn("Roughness", [socket["name"] for socket in
+                                       next(node for node in sparse["nodes"] if node["name"] == "BsdfPrincipled")["inputs"]])
+        roughness = self.material.node_tree.nodes["BsdfPrincipled"].inputs["Roughness"]
+        default = roughness.default_value
+        roughness.default_value = 0.9
+        counts = self.update(sparse)
+        self.assertAlmostEqual(roughness.default_value, default)
+        self.assertEqual(counts["updated nodes"], 1)
+
+    def test_group_is_updated_in_place(self):
+        group = bpy.data.node_groups["Inner"]
+        findSocket(self.document["groups"][0], "Math", "Value")["value"] = 0.25
+        counts = self.update()
+        self.assertIs(bpy.data.node_groups["Inner"], group)
+        self.assertAlmostEqual(group.nodes["Math"].inputs[0].default_value, 0.25)
+        self.assertNotIn("groups", counts)
+
+    def test_group_with_changed_sockets_is_rebuilt(self):
+        group = bpy.data.node_groups["Inner"]
+        group.outputs.new("NodeSocketColor", "Extra")
+        counts = self.update()
+        self.assertEqual(counts["groups"], 1)
+        self.assertEqual([socket.name for socket in group.outputs], ["Out"])
+        self.assertMaterialMatches(self.document)
+
+
+if __name__ == "__main__":
+    unittest.main()